@@ -5,37 +5,73 @@ import random
 import asyncio
 import logging
 import atexit
-import edge_tts
+import bisect
+import contextlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import dedup
+import ducking
+import irc_parser
+import loop_watchdog
+import mp3_frames
+import playback
+import pronunciations
+import rate_control
+import segmenter
+import tts_cache
+import tts_engines
+import tts_metrics
+import tts_queue
 from unidecode import unidecode
 try:
     import pykakasi
     HAS_PYKAKASI = True
 except Exception:
     HAS_PYKAKASI = False
-try:
-    from pycaw.pycaw import AudioUtilities, ISimpleAudioVolume
-    HAS_PYCAW = True
-except Exception:
-    HAS_PYCAW = False
 
 # === CONFIG FROM FILE ===
-def read_config(path="config.txt"):
+def _read_config_file(path="config.txt"):
+    # Keys before the first [section] are global; keys under [channel] override
+    # them for that channel only.
     if not os.path.exists(path):
         raise FileNotFoundError(f"Config file '{path}' not found.")
     config = {}
+    sections = {}
+    current = config
     with open(path, encoding="utf-8") as f:
         for line in f:
             line = line.strip()
+            if line.startswith("[") and line.endswith("]"):
+                name = line[1:-1].strip().lstrip("#").lower()
+                current = sections.setdefault(name, {})
+                continue
             if line and not line.startswith("#") and "=" in line:
                 k, v = line.split("=", 1)
-                config[k.strip()] = v.strip()
-    return config
+                current[k.strip()] = v.strip()
+    return config, sections
+
+def read_config(path="config.txt"):
+    return _read_config_file(path)[0]
 
-_cfg = read_config()
+_cfg, _channel_sections = _read_config_file()
+# Placeholders from the default config.txt; [channel] sections can name the channels instead.
+_PLACEHOLDER_CHANNELS = ("your_channel_here", "your_channel_name")
 CHANNEL_NAME = _cfg.get("CHANNEL_NAME", "your_channel_here")
 CHANNEL_NAME_LOWER = CHANNEL_NAME.lower()
+CHANNEL_NAMES = [c.strip().lstrip("#").lower() for c in CHANNEL_NAME.split(",")
+                 if c.strip() and c.strip().lower() not in _PLACEHOLDER_CHANNELS]
+for _section in _channel_sections:
+    if _section not in CHANNEL_NAMES:
+        CHANNEL_NAMES.append(_section)
 TTS_VOICE_ENGLISH = (_cfg.get("TTS_VOICE_ENGLISH", "en-US-AvaMultilingualNeural") or "en-US-AvaMultilingualNeural").strip()
 TTS_VOICE_JAPANESE = (_cfg.get("TTS_VOICE_JAPANESE", "ja-JP-NanamiNeural") or "ja-JP-NanamiNeural").strip()
+try:
+    TTS_VOICE_MAP = segmenter.parse_voice_map(_cfg.get("TTS_VOICE_MAP", ""))
+except ValueError as e:
+    TTS_VOICE_MAP = {}
+    logging.warning(f"Invalid TTS_VOICE_MAP in config ({e}), using default: none")
+TTS_RATE = (_cfg.get("TTS_RATE", "+0%") or "+0%").strip()
+TTS_PITCH = (_cfg.get("TTS_PITCH", "+0Hz") or "+0Hz").strip()
 
 try:
     TTS_VOLUME = float(_cfg.get("TTS_VOLUME", "1.0"))
@@ -88,11 +124,9 @@ def _filter_emotes_from_message(message_text: str, emotes_tag: str) -> str:
     
     return filtered_message
 
-def _apply_custom_pronunciations(text: str) -> str:
-    import re
-    text = re.sub(r'\bnya\b', 'ニャ', text, flags=re.IGNORECASE)
-    text = re.sub(r'\bnani\b', '何', text, flags=re.IGNORECASE)
-    return text
+# Used when PRONUNCIATIONS_FILE doesn't exist.
+_DEFAULT_PRONUNCIATIONS = {"nya": "ニャ", "nani": "何"}
+PRONUNCIATIONS_FILE = (_cfg.get("PRONUNCIATIONS_FILE", "pronunciations.txt") or "pronunciations.txt").strip()
 
 _EXCLUDE_FROM_CONFIG = _parse_exclude_processes(_cfg.get("ATTENUATION_EXCLUDE_PROCESSES", ""))
 
@@ -116,308 +150,1104 @@ except ValueError:
     NAME_REPEAT_COOLDOWN = 15
     logging.warning("Invalid NAME_REPEAT_COOLDOWN in config, using default: 15")
 
+try:
+    TTS_WORKERS = int(_cfg.get("TTS_WORKERS", "3"))
+    if TTS_WORKERS < 1:
+        TTS_WORKERS = 1
+except ValueError:
+    TTS_WORKERS = 3
+    logging.warning("Invalid TTS_WORKERS in config, using default: 3")
+
+try:
+    TTS_SYNTH_TIMEOUT = float(_cfg.get("TTS_SYNTH_TIMEOUT", "30"))
+    if TTS_SYNTH_TIMEOUT <= 0:
+        TTS_SYNTH_TIMEOUT = None
+except ValueError:
+    TTS_SYNTH_TIMEOUT = 30.0
+    logging.warning("Invalid TTS_SYNTH_TIMEOUT in config, using default: 30")
+
+TTS_CACHE_DIR = (_cfg.get("TTS_CACHE_DIR", "tts_cache") or "tts_cache").strip()
+try:
+    TTS_CACHE_MB = float(_cfg.get("TTS_CACHE_MB", "64"))
+    if TTS_CACHE_MB < 0:
+        TTS_CACHE_MB = 0
+except ValueError:
+    TTS_CACHE_MB = 64
+    logging.warning("Invalid TTS_CACHE_MB in config, using default: 64")
+
+try:
+    NAME_CLIP_CACHE_SIZE = int(_cfg.get("NAME_CLIP_CACHE_SIZE", "500"))
+    if NAME_CLIP_CACHE_SIZE < 0:
+        NAME_CLIP_CACHE_SIZE = 0
+except ValueError:
+    NAME_CLIP_CACHE_SIZE = 500
+    logging.warning("Invalid NAME_CLIP_CACHE_SIZE in config, using default: 500")
+
+TTS_STREAMING = _cfg.get("TTS_STREAMING", "false").strip().lower() in ("1", "true", "yes", "on")
+
+AUDIO_IN_MEMORY = _cfg.get("AUDIO_IN_MEMORY", "true").strip().lower() in ("1", "true", "yes", "on")
+try:
+    AUDIO_MEMORY_LIMIT = int(float(_cfg.get("AUDIO_MEMORY_LIMIT_MB", "32")) * 1024 * 1024)
+    if AUDIO_MEMORY_LIMIT < 0:
+        AUDIO_MEMORY_LIMIT = 0
+except ValueError:
+    AUDIO_MEMORY_LIMIT = 32 * 1024 * 1024
+    logging.warning("Invalid AUDIO_MEMORY_LIMIT_MB in config, using default: 32")
+
+try:
+    TEXT_QUEUE_SIZE = int(_cfg.get("TEXT_QUEUE_SIZE", "50"))
+    if TEXT_QUEUE_SIZE < 0:
+        TEXT_QUEUE_SIZE = 0
+except ValueError:
+    TEXT_QUEUE_SIZE = 50
+    logging.warning("Invalid TEXT_QUEUE_SIZE in config, using default: 50")
+
+try:
+    AUDIO_QUEUE_SIZE = int(_cfg.get("AUDIO_QUEUE_SIZE", "10"))
+    if AUDIO_QUEUE_SIZE < 0:
+        AUDIO_QUEUE_SIZE = 0
+except ValueError:
+    AUDIO_QUEUE_SIZE = 10
+    logging.warning("Invalid AUDIO_QUEUE_SIZE in config, using default: 10")
+
+QUEUE_OVERFLOW_POLICY = (_cfg.get("QUEUE_OVERFLOW_POLICY", "drop-oldest") or "drop-oldest").strip().lower()
+if QUEUE_OVERFLOW_POLICY not in tts_queue.OVERFLOW_POLICIES:
+    logging.warning(f"Invalid QUEUE_OVERFLOW_POLICY '{QUEUE_OVERFLOW_POLICY}' in config, using default: drop-oldest")
+    QUEUE_OVERFLOW_POLICY = "drop-oldest"
+
+try:
+    MAX_MESSAGE_AGE = float(_cfg.get("MAX_MESSAGE_AGE", "60"))
+    if MAX_MESSAGE_AGE < 0:
+        MAX_MESSAGE_AGE = 0
+except ValueError:
+    MAX_MESSAGE_AGE = 60
+    logging.warning("Invalid MAX_MESSAGE_AGE in config, using default: 60")
+
+try:
+    DEDUP_WINDOW_SEC = float(_cfg.get("DEDUP_WINDOW_SEC", "30"))
+    if DEDUP_WINDOW_SEC < 0:
+        DEDUP_WINDOW_SEC = 0
+except ValueError:
+    DEDUP_WINDOW_SEC = 30
+    logging.warning("Invalid DEDUP_WINDOW_SEC in config, using default: 30")
+
+try:
+    PRIORITY_CLASSES = tts_queue.parse_priority_classes(_cfg.get("PRIORITY_CLASSES", "bits,mod,vip,sub"))
+except ValueError as e:
+    PRIORITY_CLASSES = tts_queue.PRIORITY_CLASSES
+    logging.warning(f"Invalid PRIORITY_CLASSES in config ({e}), using default: {','.join(PRIORITY_CLASSES)}")
+
+try:
+    PRIORITY_MAX_WAIT_SEC = float(_cfg.get("PRIORITY_MAX_WAIT_SEC", "20"))
+    if PRIORITY_MAX_WAIT_SEC < 0:
+        PRIORITY_MAX_WAIT_SEC = 0
+except ValueError:
+    PRIORITY_MAX_WAIT_SEC = 20
+    logging.warning("Invalid PRIORITY_MAX_WAIT_SEC in config, using default: 20")
+
+DEDUP_MODES = ("collapse", "drop")
+DEDUP_MODE = (_cfg.get("DEDUP_MODE", "collapse") or "collapse").strip().lower()
+if DEDUP_MODE not in DEDUP_MODES:
+    logging.warning(f"Invalid DEDUP_MODE '{DEDUP_MODE}' in config, using default: collapse")
+    DEDUP_MODE = "collapse"
+
+ADAPTIVE_RATE = _cfg.get("ADAPTIVE_RATE", "false").strip().lower() in ("1", "true", "yes", "on")
+try:
+    ADAPTIVE_RATE_MAX = int(_cfg.get("ADAPTIVE_RATE_MAX", "50").strip().rstrip("%"))
+    ADAPTIVE_RATE_STEP = int(_cfg.get("ADAPTIVE_RATE_STEP", "10").strip().rstrip("%"))
+except ValueError:
+    ADAPTIVE_RATE_MAX, ADAPTIVE_RATE_STEP = 50, 10
+    logging.warning("Invalid ADAPTIVE_RATE_MAX/ADAPTIVE_RATE_STEP in config, using defaults: 50/10")
+try:
+    ADAPTIVE_RATE_HIGH_SEC = float(_cfg.get("ADAPTIVE_RATE_HIGH_SEC", "20"))
+    ADAPTIVE_RATE_LOW_SEC = float(_cfg.get("ADAPTIVE_RATE_LOW_SEC", "5"))
+except ValueError:
+    ADAPTIVE_RATE_HIGH_SEC, ADAPTIVE_RATE_LOW_SEC = 20.0, 5.0
+    logging.warning("Invalid ADAPTIVE_RATE_HIGH_SEC/ADAPTIVE_RATE_LOW_SEC in config, using defaults: 20/5")
+
+try:
+    TTS_BATCH_SIZE = int(_cfg.get("TTS_BATCH_SIZE", "1"))
+    if TTS_BATCH_SIZE < 1:
+        TTS_BATCH_SIZE = 1
+except ValueError:
+    TTS_BATCH_SIZE = 1
+    logging.warning("Invalid TTS_BATCH_SIZE in config, using default: 1")
+
+try:
+    TTS_BATCH_WINDOW_MS = max(0, int(_cfg.get("TTS_BATCH_WINDOW_MS", "150")))
+except ValueError:
+    TTS_BATCH_WINDOW_MS = 150
+    logging.warning("Invalid TTS_BATCH_WINDOW_MS in config, using default: 150")
+
+PLAYBACK_SINK = (_cfg.get("PLAYBACK_SINK", "ffplay") or "ffplay").strip()
+
+PREWARM_NAMES = [n.strip() for n in _cfg.get("PREWARM_NAMES", "").split(",") if n.strip()]
+
+try:
+    TTS_MAX_CONCURRENT = max(0, int(_cfg.get("TTS_MAX_CONCURRENT", "0")))
+except ValueError:
+    TTS_MAX_CONCURRENT = 0
+    logging.warning("Invalid TTS_MAX_CONCURRENT in config, using default: 0")
+
+try:
+    IRC_CHANNELS_PER_CONNECTION = max(1, int(_cfg.get("IRC_CHANNELS_PER_CONNECTION", "100")))
+except ValueError:
+    IRC_CHANNELS_PER_CONNECTION = 100
+    logging.warning("Invalid IRC_CHANNELS_PER_CONNECTION in config, using default: 100")
+
+try:
+    METRICS_PORT = max(0, int(_cfg.get("METRICS_PORT", "0")))
+except ValueError:
+    METRICS_PORT = 0
+    logging.warning("Invalid METRICS_PORT in config, using default: 0")
+METRICS_HOST = (_cfg.get("METRICS_HOST", "127.0.0.1") or "127.0.0.1").strip()
+METRICS_JSONL = _cfg.get("METRICS_JSONL", "").strip()
+try:
+    METRICS_INTERVAL = float(_cfg.get("METRICS_INTERVAL", "60"))
+    if METRICS_INTERVAL <= 0:
+        METRICS_INTERVAL = 60.0
+except ValueError:
+    METRICS_INTERVAL = 60.0
+    logging.warning("Invalid METRICS_INTERVAL in config, using default: 60")
+
+try:
+    LOOP_LAG_WARN_MS = int(_cfg.get("LOOP_LAG_WARN_MS", "250"))
+    if LOOP_LAG_WARN_MS < 0:
+        LOOP_LAG_WARN_MS = 0
+except ValueError:
+    LOOP_LAG_WARN_MS = 250
+    logging.warning("Invalid LOOP_LAG_WARN_MS in config, using default: 250")
+
+try:
+    PROFILE_SECONDS = float(_cfg.get("PROFILE_SECONDS", "10"))
+    if PROFILE_SECONDS <= 0:
+        PROFILE_SECONDS = 10.0
+except ValueError:
+    PROFILE_SECONDS = 10.0
+    logging.warning("Invalid PROFILE_SECONDS in config, using default: 10")
+
+TTS_ENGINE = (_cfg.get("TTS_ENGINE", "edge") or "edge").strip().lower()
+if TTS_ENGINE not in tts_engines.ENGINES:
+    logging.warning(f"Invalid TTS_ENGINE '{TTS_ENGINE}' in config, using default: edge")
+    TTS_ENGINE = "edge"
+LOCAL_TTS_MODEL = _cfg.get("LOCAL_TTS_MODEL", "").strip()
+try:
+    LOCAL_TTS_WORKERS = max(1, int(_cfg.get("LOCAL_TTS_WORKERS", "2")))
+except ValueError:
+    LOCAL_TTS_WORKERS = 2
+    logging.warning("Invalid LOCAL_TTS_WORKERS in config, using default: 2")
+try:
+    TTS_FAILOVER_MS = max(0, int(_cfg.get("TTS_FAILOVER_MS", "0")))
+except ValueError:
+    TTS_FAILOVER_MS = 0
+    logging.warning("Invalid TTS_FAILOVER_MS in config, using default: 0")
+try:
+    TTS_FAILOVER_RETRY_SEC = max(0.0, float(_cfg.get("TTS_FAILOVER_RETRY_SEC", "60")))
+except ValueError:
+    TTS_FAILOVER_RETRY_SEC = 60.0
+    logging.warning("Invalid TTS_FAILOVER_RETRY_SEC in config, using default: 60")
+# Defaults to one per worker, so every worker finds a warm session.
+try:
+    EDGE_SESSIONS_PER_VOICE = max(0, int(_cfg.get("EDGE_SESSIONS_PER_VOICE", str(TTS_WORKERS))))
+except ValueError:
+    EDGE_SESSIONS_PER_VOICE = TTS_WORKERS
+    logging.warning(f"Invalid EDGE_SESSIONS_PER_VOICE in config, using default: {TTS_WORKERS}")
+
+# === PER-CHANNEL SETTINGS ===
+def _parse_bool(val: str) -> bool:
+    return str(val).strip().lower() in ("1", "true", "yes", "on")
+
+def _section_value(section: dict, key: str, default, cast=str, minimum=None, channel=""):
+    if key not in section or section[key] == "":
+        return default
+    try:
+        value = cast(section[key])
+    except ValueError:
+        logging.warning(f"Invalid {key} for #{channel} in config, using default: {default}")
+        return default
+    if minimum is not None and value < minimum:
+        value = minimum
+    return value
+
+class ChannelConfig:
+    # Settings that may differ per channel. Everything defaults to the global
+    # values above and can be overridden in a [channel] section of config.txt.
+    def __init__(self, channel: str, section: dict = None):
+        section = section or {}
+        v = lambda key, default, cast=str, minimum=None: _section_value(section, key, default, cast, minimum, channel)
+        self.channel = channel.lower()
+        self.voice_english = v("TTS_VOICE_ENGLISH", TTS_VOICE_ENGLISH)
+        self.voice_japanese = v("TTS_VOICE_JAPANESE", TTS_VOICE_JAPANESE)
+        self.voice_map = v("TTS_VOICE_MAP", TTS_VOICE_MAP, segmenter.parse_voice_map)
+        # Han text is read with the Japanese voice unless a Chinese one is mapped.
+        self.router = segmenter.VoiceRouter(
+            self.voice_english, {"kana": self.voice_japanese, "han": self.voice_japanese, **self.voice_map}
+        )
+        self.rate = v("TTS_RATE", TTS_RATE)
+        self.pitch = v("TTS_PITCH", TTS_PITCH)
+        self.volume = max(0.0, min(1.0, v("TTS_VOLUME", TTS_VOLUME, float)))
+        self.ignore_users = v("IGNORE_USERS", IGNORE_USERS, _parse_user_list)
+        self.name_repeat_cooldown = v("NAME_REPEAT_COOLDOWN", NAME_REPEAT_COOLDOWN, float, 0)
+        self.workers = v("TTS_WORKERS", TTS_WORKERS, int, 1)
+        self.streaming = v("TTS_STREAMING", TTS_STREAMING, _parse_bool)
+        self.batch_size = v("TTS_BATCH_SIZE", TTS_BATCH_SIZE, int, 1)
+        self.batch_window_ms = v("TTS_BATCH_WINDOW_MS", TTS_BATCH_WINDOW_MS, int, 0)
+        self.text_queue_size = v("TEXT_QUEUE_SIZE", TEXT_QUEUE_SIZE, int, 0)
+        self.audio_queue_size = v("AUDIO_QUEUE_SIZE", AUDIO_QUEUE_SIZE, int, 0)
+        self.overflow_policy = v("QUEUE_OVERFLOW_POLICY", QUEUE_OVERFLOW_POLICY).lower()
+        if self.overflow_policy not in tts_queue.OVERFLOW_POLICIES:
+            logging.warning(f"Invalid QUEUE_OVERFLOW_POLICY for #{channel} in config, using default: {QUEUE_OVERFLOW_POLICY}")
+            self.overflow_policy = QUEUE_OVERFLOW_POLICY
+        self.max_message_age = v("MAX_MESSAGE_AGE", MAX_MESSAGE_AGE, float, 0)
+        self.priority_classes = v("PRIORITY_CLASSES", PRIORITY_CLASSES, tts_queue.parse_priority_classes)
+        self.priority_max_wait = v("PRIORITY_MAX_WAIT_SEC", PRIORITY_MAX_WAIT_SEC, float, 0)
+        self.dedup_window = v("DEDUP_WINDOW_SEC", DEDUP_WINDOW_SEC, float, 0)
+        self.dedup_mode = v("DEDUP_MODE", DEDUP_MODE).lower()
+        if self.dedup_mode not in DEDUP_MODES:
+            logging.warning(f"Invalid DEDUP_MODE for #{channel} in config, using default: {DEDUP_MODE}")
+            self.dedup_mode = DEDUP_MODE
+        self.adaptive_rate = v("ADAPTIVE_RATE", ADAPTIVE_RATE, _parse_bool)
+        self.adaptive_rate_max = v("ADAPTIVE_RATE_MAX", ADAPTIVE_RATE_MAX, lambda x: int(x.strip().rstrip("%")))
+        self.adaptive_rate_step = v("ADAPTIVE_RATE_STEP", ADAPTIVE_RATE_STEP, lambda x: int(x.strip().rstrip("%")))
+        self.adaptive_rate_high_sec = v("ADAPTIVE_RATE_HIGH_SEC", ADAPTIVE_RATE_HIGH_SEC, float)
+        self.adaptive_rate_low_sec = v("ADAPTIVE_RATE_LOW_SEC", ADAPTIVE_RATE_LOW_SEC, float)
+        self.playback_sink = v("PLAYBACK_SINK", PLAYBACK_SINK)
+        self.prewarm_names = v("PREWARM_NAMES", PREWARM_NAMES, lambda x: [n.strip() for n in x.split(",") if n.strip()])
+
+def load_channel_configs(channels=None) -> list:
+    return [ChannelConfig(c, _channel_sections.get(c.lower())) for c in (channels or CHANNEL_NAMES)]
+
+DEFAULT_CHANNEL_CONFIG = ChannelConfig(CHANNEL_NAMES[0] if CHANNEL_NAMES else CHANNEL_NAME_LOWER)
+
 # === LOGGING ===
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 
+# === PRONUNCIATIONS ===
+_pronunciations = pronunciations.PronunciationDict(PRONUNCIATIONS_FILE, defaults=_DEFAULT_PRONUNCIATIONS)
+
 # === TEMP FOLDER SETUP ===
+_TEMP_DIR = None
+
 def _ensure_temp_folder():
-    temp_dir = os.path.join(os.getcwd(), "tts_temp")
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
-    return temp_dir
-
-# === ATTENUATION SAVING ===
-_ACTIVE_ATTENUATION = {}
-FADE_MS = 100
-
-# === ROMANIZATION ===
-def _is_japanese_text(text: str) -> bool:
-    return any(0x3040 <= ord(ch) <= 0x309F or 0x30A0 <= ord(ch) <= 0x30FF or 
-               0x31F0 <= ord(ch) <= 0x31FF or 0xFF66 <= ord(ch) <= 0xFF9D or
-               0x4E00 <= ord(ch) <= 0x9FFF for ch in text)
-
-def _detect_language_and_get_voice(text: str) -> str:
-    return TTS_VOICE_JAPANESE if _is_japanese_text(text) else TTS_VOICE_ENGLISH
-
-async def _generate_word_audio(word: str, voice: str) -> str:
-    communicate = edge_tts.Communicate(word, voice=voice)
-    temp_dir = _ensure_temp_folder()
-    temp_path = os.path.join(temp_dir, f"tts_word_{int(time.time()*1000)}_{random.randint(1000,9999)}.mp3")
-    await communicate.save(temp_path)
-    if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-        raise Exception(f"Failed to create audio file for word: {word}")
-    return temp_path
-
-async def _combine_audio_files(audio_files: list, output_path: str):
-    if len(audio_files) == 1:
-        import shutil
-        shutil.move(audio_files[0], output_path)
-        return
-    
-    temp_dir = _ensure_temp_folder()
-    concat_file = os.path.join(temp_dir, f"concat_{int(time.time()*1000)}.txt")
+    global _TEMP_DIR
+    if _TEMP_DIR is None:
+        temp_dir = os.path.join(os.getcwd(), "tts_temp")
+        os.makedirs(temp_dir, exist_ok=True)
+        _TEMP_DIR = temp_dir
+    return _TEMP_DIR
+
+# === BACKGROUND THREADS ===
+# Disk I/O (audio cache, spilled clips) runs on one thread, so it stays in
+# order and never holds up IRC reading. Ducking runs on its own thread inside
+# ducking.Ducker.
+_io_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-io")
+
+async def _run_io(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_io_pool, fn, *args)
+
+# === AUDIO CACHE ===
+_audio_cache = tts_cache.AudioCache(os.path.join(os.getcwd(), TTS_CACHE_DIR), int(TTS_CACHE_MB * 1024 * 1024))
+_inflight_synth = {}
+
+async def _cache_get(key: str):
+    if not _audio_cache.enabled:
+        return None
+    return await _run_io(_audio_cache.get, key)
+
+async def _cache_get_many(keys: list) -> list:
+    if not _audio_cache.enabled:
+        return [None] * len(keys)
+    return await _run_io(lambda: [_audio_cache.get(k) for k in keys])
+
+def _cache_put(key: str, audio: bytes):
+    if _audio_cache.enabled:
+        _io_pool.submit(_audio_cache.put, key, audio)
+
+# === TTS ENGINE ===
+def _build_engine(sessions_per_voice: int = EDGE_SESSIONS_PER_VOICE):
     try:
-        with open(concat_file, 'w', encoding='utf-8') as f:
-            for audio_file in audio_files:
-                f.write(f"file '{audio_file}'\n")
-        
-        process = await asyncio.create_subprocess_exec(
-            "ffmpeg", "-f", "concat", "-safe", "0", "-i", concat_file,
-            "-c", "copy", output_path, "-y",
-            stdout=asyncio.subprocess.DEVNULL,
-            stderr=asyncio.subprocess.DEVNULL
+        return tts_engines.make_engine(
+            TTS_ENGINE, LOCAL_TTS_MODEL, LOCAL_TTS_WORKERS, TTS_FAILOVER_MS / 1000.0, TTS_FAILOVER_RETRY_SEC,
+            sessions_per_voice
         )
-        await process.communicate()
-        
-        if process.returncode != 0:
-            raise Exception("Failed to combine audio files")
-            
-    finally:
-        try:
-            os.remove(concat_file)
-        except Exception:
-            pass
-        for audio_file in audio_files:
-            try:
-                os.remove(audio_file)
-            except Exception:
-                pass
+    except (FileNotFoundError, RuntimeError) as e:
+        logging.error(f"TTS engine '{TTS_ENGINE}' unavailable ({e}), using edge")
+        return tts_engines.EdgeEngine(sessions_per_voice)
+
+# Built by init_tts_engine() before anything is synthesized.
+_tts_engine = None
+
+def init_tts_engine(sessions_per_voice: int = EDGE_SESSIONS_PER_VOICE):
+    global _tts_engine
+    _tts_engine = _build_engine(sessions_per_voice)
+    return _tts_engine
+
+def _cache_key(text: str, voice: str, rate: str, pitch: str, tag: str = None) -> str:
+    return tts_cache.cache_key(text, voice, rate, pitch, _tts_engine.cache_tag if tag is None else tag)
+
+# Caps TTS requests in flight across all channels (TTS_MAX_CONCURRENT, 0 = no cap).
+_synth_semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENT) if TTS_MAX_CONCURRENT else None
+
+def _synth_slot():
+    return _synth_semaphore or contextlib.nullcontext()
+
+def _log_queue_stats(pipelines):
+    for pipeline in pipelines:
+        dropped = pipeline.text_queue.dropped
+        if dropped:
+            reasons = ", ".join(f"{n} {reason}" for reason, n in dropped.most_common())
+            logging.info(f"{pipeline.log_prefix}Skipped TTS messages: {reasons}")
 
-def _restore_other_app_volumes(original: dict):
-    if not (HAS_PYCAW and sys.platform.startswith("win")):
-        logging.debug("Audio restoration not available on this platform (Windows only)")
+# === METRICS ===
+_metrics = tts_metrics.Metrics()
+
+def _log_latency_stats():
+    for (interval, channel), hist in sorted(_metrics.histograms.items()):
+        if interval not in ("first_audio", "end_to_end") or not hist.count:
+            continue
+        p50, p90, p99 = (hist.quantile(q) for q in tts_metrics.QUANTILES)
+        logging.info(
+            f"Latency {interval.replace('_', ' ')} #{channel}: p50 {p50:.2f}s, p90 {p90:.2f}s, p99 {p99:.2f}s "
+            f"over the last {len(hist.recent)} of {hist.count} messages"
+        )
+    lag = _metrics.histograms.get(("event_loop_lag", ""))
+    if lag is not None and lag.count:
+        logging.info(f"Event loop lag: p99 {lag.quantile(0.99) * 1000:.0f} ms over the last {len(lag.recent)} checks")
+
+def _log_cache_stats():
+    if not _audio_cache.enabled:
         return
+    st = _audio_cache.stats()
+    logging.info(
+        f"Audio cache: {st['hits']} hits, {st['misses']} misses ({st['hit_rate']:.0%} hit rate), "
+        f"{st['evictions']} evictions, {st['entries']} clips / {st['bytes'] / 1e6:.1f} of {st['max_bytes'] / 1e6:.0f} MB"
+    )
+
+# === SYNTHESIS ===
+async def _synthesize_audio(word: str, voice: str, rate: str, pitch: str):
+    # Returns (audio, cache tag of the engine that actually produced it).
+    async with _synth_slot():
+        audio, tag = await _tts_engine.synthesize(word, voice, rate, pitch)
+    if not audio:
+        raise Exception(f"Failed to create audio for word: {word}")
+    return audio, tag
+
+async def _generate_word_audio(word: str, voice: str, rate: str = None, pitch: str = None) -> bytes:
+    rate = rate or TTS_RATE
+    pitch = pitch or TTS_PITCH
+    key = _cache_key(word, voice, rate, pitch)
+    audio = await _cache_get(key)
+    if audio is not None:
+        logging.debug(f"Audio cache hit for: {word[:50]}")
+        return audio
+    # Identical phrases requested by several workers at once share one synthesis,
+    # and the result is cached even if the worker that started it gave up.
+    pending = _inflight_synth.get(key)
+    if pending is None:
+        pending = asyncio.ensure_future(_synthesize_audio(word, voice, rate, pitch))
+        _inflight_synth[key] = pending
+
+        def _done(fut, key=key):
+            _inflight_synth.pop(key, None)
+            if not fut.cancelled() and fut.exception() is None:
+                audio, tag = fut.result()
+                _cache_put(_cache_key(word, voice, rate, pitch, tag), audio)
+        pending.add_done_callback(_done)
+    return (await asyncio.shield(pending))[0]
+
+
+# === TTS PIPELINE ===
+def _new_temp_path(prefix: str = "tts") -> str:
+    temp_dir = _ensure_temp_folder()
+    return os.path.join(temp_dir, f"{prefix}_{int(time.time()*1000)}_{random.randint(1000,9999)}.mp3")
+
+def _split_voice_runs(text: str, conf: ChannelConfig = None) -> list:
+    return (conf or DEFAULT_CHANNEL_CONFIG).router.segments(text)
+
+async def _render_text_clips(text: str, rate: str = None, conf: ChannelConfig = None, runs: list = None) -> list:
+    conf = conf or DEFAULT_CHANNEL_CONFIG
+    rate = rate or conf.rate
+    runs = runs if runs is not None else _split_voice_runs(text, conf)
+    if len(runs) == 1:
+        voice = runs[0][1]
+        logging.debug(f"Using single voice '{voice}' for text: {text[:50]}...")
+        return [await _generate_word_audio(text, voice, rate=rate, pitch=conf.pitch)]
+    # All voice runs are synthesized concurrently and their frames spliced in
+    # memory, so a mixed message costs about as long as its slowest run.
+    logging.debug(f"Processing mixed-language text as {len(runs)} concurrent runs: {text[:50]}...")
+    return list(await asyncio.gather(
+        *(_generate_word_audio(phrase, voice, rate=rate, pitch=conf.pitch) for phrase, voice in runs)
+    ))
+
+# === NAME PREFIX CLIPS ===
+# "<name> says" is rendered once per user and voice settings and spliced in
+# front of message audio instead of being re-synthesized with every message.
+_name_clips = OrderedDict()
+_name_clip_tasks = {}
+
+async def _get_name_clip(display_name: str, rate: str = None, conf: ChannelConfig = None) -> bytes:
+    conf = conf or DEFAULT_CHANNEL_CONFIG
+    rate = rate or conf.rate
+    key = (display_name, conf.router.signature, rate, conf.pitch, _tts_engine.current_tag)
+    clip = _name_clips.get(key)
+    if clip is not None:
+        _name_clips.move_to_end(key)
+        return clip
+    task = _name_clip_tasks.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_render_text_clips(f"{display_name} says", rate=rate, conf=conf))
+        _name_clip_tasks[key] = task
+        task.add_done_callback(lambda _t, key=key: _name_clip_tasks.pop(key, None))
+    clip = mp3_frames.splice(await asyncio.shield(task))
+    if NAME_CLIP_CACHE_SIZE > 0:
+        _name_clips[key] = clip
+        _name_clips.move_to_end(key)
+        while len(_name_clips) > NAME_CLIP_CACHE_SIZE:
+            _name_clips.popitem(last=False)
+    return clip
+
+async def prewarm_name_clips(names, conf: ChannelConfig = None):
+    names = [n for n in names if n]
+    if not names:
+        return
+    results = await asyncio.gather(*(_get_name_clip(n, conf=conf) for n in names), return_exceptions=True)
+    failed = sum(1 for r in results if isinstance(r, Exception))
+    logging.info(f"Pre-warmed name clips for {len(names) - failed}/{len(names)} users")
+
+async def render_tts_audio(text: str, display_name: str = None, rate: str = None, conf: ChannelConfig = None,
+                           runs: list = None) -> bytes:
+    if not text or not text.strip():
+        raise ValueError("Empty text")
+
+    if display_name:
+        name_clip, clips = await asyncio.gather(
+            _get_name_clip(display_name, rate=rate, conf=conf), _render_text_clips(text, rate=rate, conf=conf, runs=runs)
+        )
+        clips = [name_clip] + clips
+    else:
+        clips = await _render_text_clips(text, rate=rate, conf=conf, runs=runs)
+
+    if not clips:
+        raise Exception("No audio generated")
+    return mp3_frames.splice(clips)
+
+async def generate_tts_file(text: str, display_name: str = None, conf: ChannelConfig = None) -> str:
+    audio = await render_tts_audio(text, display_name=display_name, conf=conf)
+    return await _run_io(_write_temp_clip, audio)
+
+def _write_temp_clip(audio: bytes) -> str:
+    final_path = _new_temp_path()
+    with open(final_path, "wb") as f:
+        f.write(audio)
+    return final_path
+
+# Clips waiting for playback stay in memory up to AUDIO_MEMORY_LIMIT_MB; beyond
+# that new clips spill to tts_temp so a long backlog can't exhaust RAM.
+_queued_audio_bytes = 0
+
+async def _hold_clip(audio: bytes):
+    global _queued_audio_bytes
+    if AUDIO_IN_MEMORY and _queued_audio_bytes + len(audio) <= AUDIO_MEMORY_LIMIT:
+        _queued_audio_bytes += len(audio)
+        return audio
+    return await _run_io(_write_temp_clip, audio)
+
+def _remove_file(path: str):
     try:
-        sessions = AudioUtilities.GetAllSessions()
-        by_pid = {s.Process.pid: s for s in sessions if s.Process}
-        for pid, vol in original.items():
-            try:
-                s = by_pid.get(pid)
-                if not s:
-                    continue
-                volume = s._ctl.QueryInterface(ISimpleAudioVolume)
-                volume.SetMasterVolume(float(vol), None)
-            except Exception:
-                continue
-    except Exception:
+        os.remove(path)
+    except OSError:
         pass
-async def _ramp_duck_other_app_volumes(factor: float, exclude_pids=None, exclude_names=None, duration_ms: int = FADE_MS):
-    if not (HAS_PYCAW and sys.platform.startswith("win")):
-        logging.debug("Audio ducking not available on this platform (Windows only)")
-        return {}
-    if exclude_pids is None:
-        exclude_pids = set()
-    if exclude_names is None:
-        exclude_names = set()
-    exclude_names_lower = {n.lower() for n in exclude_names}
-    sessions_info = []
-    original = {}
+
+def _release_clip(clip):
+    global _queued_audio_bytes
+    if isinstance(clip, bytes):
+        _queued_audio_bytes = max(0, _queued_audio_bytes - len(clip))
+    elif isinstance(clip, str):
+        _io_pool.submit(_remove_file, clip)
+
+# === STREAMING MODE ===
+# Chunks are handed to the player as Edge-TTS delivers them, so playback of a
+# long message starts after its first chunk rather than after its last one.
+class _AudioStream:
+    def __init__(self):
+        self._chunks = asyncio.Queue()
+        self._closed = False
+        self.error = None
+
+    def feed(self, data: bytes):
+        if data and not self._closed:
+            self._chunks.put_nowait(data)
+
+    def close(self, error: Exception = None):
+        if self._closed:
+            return
+        self._closed = True
+        self.error = error
+        self._chunks.put_nowait(None)
+
+    async def __aiter__(self):
+        while True:
+            chunk = await self._chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+async def _stream_word_audio(word: str, voice: str, out: _AudioStream, rate: str = None, pitch: str = None):
+    rate = rate or TTS_RATE
+    pitch = pitch or TTS_PITCH
     try:
-        for session in AudioUtilities.GetAllSessions():
-            try:
-                process = session.Process
-                if not process:
-                    continue
-                name = (process.name() or "").lower()
-                if process.pid in exclude_pids:
-                    continue
-                if name in exclude_names_lower:
-                    continue
-                vol = session._ctl.QueryInterface(ISimpleAudioVolume)
-                prev = float(vol.GetMasterVolume())
-                target = max(0.0, min(1.0, prev * float(factor)))
-                original[process.pid] = prev
-                sessions_info.append((process.pid, vol, prev, target))
-            except Exception:
-                continue
-    except Exception:
-        pass
-    global _ACTIVE_ATTENUATION
-    _ACTIVE_ATTENUATION = original.copy()
-    steps = max(1, int(duration_ms // 10))
-    for i in range(1, steps + 1):
-        t = i / steps
-        for pid, vol, prev, target in sessions_info:
-            try:
-                val = prev + (target - prev) * t
-                vol.SetMasterVolume(float(val), None)
-            except Exception:
-                continue
-        await asyncio.sleep(duration_ms / steps / 1000.0)
-    for pid, vol, prev, target in sessions_info:
-        try:
-            vol.SetMasterVolume(float(target), None)
-        except Exception:
-            continue
-    return original
+        key = _cache_key(word, voice, rate, pitch)
+        audio = await _cache_get(key)
+        if audio is None and key in _inflight_synth:
+            audio = (await asyncio.shield(_inflight_synth[key]))[0]
+        if audio is not None:
+            out.feed(audio)
+            return
+        chunks = []
+        tag = None
+        async with _synth_slot():
+            async for chunk in _tts_engine.stream(word, voice, rate, pitch):
+                if chunk["type"] == "audio":
+                    chunks.append(chunk["data"])
+                    out.feed(chunk["data"])
+                elif chunk["type"] == "engine":
+                    tag = chunk["cache_tag"]
+        if not chunks:
+            raise Exception(f"Failed to create audio for word: {word}")
+        _cache_put(_cache_key(word, voice, rate, pitch, tag), b"".join(chunks))
+    except Exception as e:
+        out.close(e)
+        raise
+    finally:
+        out.close()
 
-async def _ramp_restore_app_volumes(original: dict, duration_ms: int = FADE_MS):
-    if not (HAS_PYCAW and sys.platform.startswith("win")):
-        logging.debug("Audio restoration not available on this platform (Windows only)")
-        return
-    info = []
+async def _stream_name_clip(display_name: str, out: _AudioStream, rate: str = None, conf: ChannelConfig = None):
+    try:
+        out.feed(await _get_name_clip(display_name, rate=rate, conf=conf))
+    except Exception as e:
+        out.close(e)
+        raise
+    finally:
+        out.close()
+
+async def stream_tts(text: str, out: _AudioStream, display_name: str = None, rate: str = None, conf: ChannelConfig = None,
+                     runs: list = None):
+    if not text or not text.strip():
+        out.close(ValueError("Empty text"))
+        raise ValueError("Empty text")
+
+    conf = conf or DEFAULT_CHANNEL_CONFIG
+    rate = rate or conf.rate
+    runs = runs if runs is not None else _split_voice_runs(text, conf)
+    if len(runs) == 1:
+        runs = [(text, runs[0][1])]
+
+    # Every part starts synthesizing at once into its own buffer; parts are
+    # forwarded strictly in order, so the first one plays live while the rest fill.
+    parts = []
+    tasks = []
+    if display_name:
+        part = _AudioStream()
+        parts.append(part)
+        tasks.append(asyncio.ensure_future(_stream_name_clip(display_name, part, rate=rate, conf=conf)))
+    for phrase, voice in runs:
+        part = _AudioStream()
+        parts.append(part)
+        tasks.append(asyncio.ensure_future(_stream_word_audio(phrase, voice, part, rate=rate, pitch=conf.pitch)))
     try:
-        sessions = AudioUtilities.GetAllSessions()
-        by_pid = {s.Process.pid: s for s in sessions if s.Process}
-        for pid, orig in original.items():
+        for part in parts:
+            async for chunk in part:
+                out.feed(chunk)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        out.close()
+
+# === CHANNEL PIPELINES ===
+# Each channel gets its own queues, workers, rate controller and playback sink;
+# the audio cache, name clips and synthesis slots are shared by all of them.
+
+# Workers finish out of order; clips are parked by sequence number and released
+# to playback once every earlier message has a clip or was given up on (None).
+class _ReorderBuffer:
+    def __init__(self, out_queue: asyncio.Queue):
+        self._out = out_queue
+        self._pending = {}
+        self._next = 0
+        self._lock = asyncio.Lock()
+
+    async def put(self, seq: int, path, marks: dict = None):
+        self._pending[seq] = (path, marks)
+        async with self._lock:
+            while self._next in self._pending:
+                ready, ready_marks = self._pending.pop(self._next)
+                self._next += 1
+                if ready is not None:
+                    await self._out.put((ready, ready_marks))
+
+    def __len__(self):
+        return len(self._pending)
+
+class ChannelPipeline:
+    def __init__(self, conf: ChannelConfig, label: bool = False):
+        self.conf = conf
+        self.channel = conf.channel
+        self.log_prefix = f"[#{conf.channel}] " if label else ""
+        self.text_queue = tts_queue.FairTextQueue(
+            conf.text_queue_size, conf.overflow_policy, conf.max_message_age,
+            name=f"#{conf.channel} text" if label else "text", max_wait=conf.priority_max_wait,
+        )
+        self.audio_queue = asyncio.Queue(conf.audio_queue_size)
+        self.dedup = dedup.DuplicateFilter(conf.dedup_window) if conf.dedup_window > 0 else None
+        self.reorder_buffer = _ReorderBuffer(self.audio_queue)
+        try:
+            sink = playback.make_sink(conf.playback_sink, volume=int(conf.volume * 100))
+        except ValueError as e:
+            logging.warning(f"{self.log_prefix}Invalid PLAYBACK_SINK in config ({e}), using default: ffplay")
+            sink = playback.make_sink("ffplay", volume=int(conf.volume * 100))
+        self.engine = playback.PlaybackEngine(sink)
+        self.batch_lock = asyncio.Lock()
+        self.rate_controller = None
+        if conf.adaptive_rate:
+            base_rate = rate_control.parse_rate_percent(conf.rate)
+            if base_rate is None:
+                logging.warning(f"ADAPTIVE_RATE needs TTS_RATE as a percentage (got '{conf.rate}'), disabling it")
+            else:
+                self.rate_controller = rate_control.AdaptiveRate(
+                    base_percent=base_rate,
+                    max_percent=conf.adaptive_rate_max,
+                    step_percent=conf.adaptive_rate_step,
+                    high_water_sec=conf.adaptive_rate_high_sec,
+                    low_water_sec=conf.adaptive_rate_low_sec,
+                )
+        self.last_sender = None
+        self.last_time = 0
+        self.next_seq = 0
+        self._tasks = []
+
+    def filter_message(self, msg):
+        """Text to speak for ``msg``, or None if it is not read out."""
+        sender = msg.nick or "unknown"
+        display_name = msg.display_name or sender
+        filtered_message = _filter_emotes_from_message(msg.text or "", msg.emotes)
+        filtered_message = _pronunciations.apply(filtered_message)
+
+        if sender.lower() == self.channel:
+            return None
+        if sender.lower() in self.conf.ignore_users or display_name.lower() in self.conf.ignore_users:
+            return None
+        if filtered_message.strip().startswith("!"):
+            return None
+        if not filtered_message.strip():
+            return None
+        return filtered_message
+
+    def handle_message(self, msg, received: float = None) -> bool:
+        filtered_message = self.filter_message(msg)
+        if filtered_message is None:
+            return False
+        sender = msg.nick or "unknown"
+        display_name = msg.display_name or sender
+
+        logging.info(f"{self.log_prefix}Received: {display_name} says {filtered_message}")
+        priority = tts_queue.priority_rank(self.conf.priority_classes, msg.badges, msg.bits)
+        item = tts_queue.ChatItem(display_name, filtered_message, user=sender, priority=priority)
+        tts_metrics.mark(item.marks, "received", received)
+        _metrics.count("messages_received", self.channel)
+        if self.dedup is not None:
+            entry, is_new = self.dedup.check(filtered_message, item.user)
+            # A copy of a message the queue dropped unread takes its place.
+            if is_new or (entry.item is not None and entry.item.dropped and not entry.claimed):
+                entry.item = item
+                item.repeats = entry
+            else:
+                # A copy of a message that is still waiting is folded into it
+                # and read once as "N people said"; later copies are dropped.
+                merge = self.conf.dedup_mode == "collapse" and not entry.claimed
+                self.text_queue.reject(item, "merged duplicate" if merge else "duplicate")
+                return False
+        accepted = self.text_queue.offer(item)
+        tts_metrics.mark(item.marks, "enqueued")
+        return accepted
+
+    async def start(self):
+        try:
+            await self.engine.start()
+        except FileNotFoundError:
+            logging.error("ffplay not found. Please install ffmpeg")
+        logging.info(f"{self.log_prefix}Starting {self.conf.workers} TTS synthesis worker(s)")
+        self._tasks = [asyncio.create_task(tts_gen_worker(self, i)) for i in range(self.conf.workers)]
+        self._tasks.append(asyncio.create_task(tts_playback_worker(self)))
+        if self.conf.prewarm_names:
+            asyncio.create_task(prewarm_name_clips(self.conf.prewarm_names, self.conf))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
             try:
-                s = by_pid.get(pid)
-                if not s:
-                    continue
-                vol = s._ctl.QueryInterface(ISimpleAudioVolume)
-                current = float(vol.GetMasterVolume())
-                info.append((pid, vol, current, float(orig)))
-            except Exception:
-                continue
-    except Exception:
-        info = []
-    steps = max(1, int(duration_ms // 10))
-    for i in range(1, steps + 1):
-        t = i / steps
-        for pid, vol, current, orig in info:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.engine.close()
+
+# === ADAPTIVE RATE ===
+def _queued_audio_seconds(pipeline: ChannelPipeline) -> float:
+    total = pipeline.engine.remaining()
+    for clip, _marks in list(pipeline.audio_queue._queue):
+        if isinstance(clip, bytes):
+            total += mp3_frames.duration(clip)
+    return total
+
+def _current_rate(pipeline: ChannelPipeline) -> str:
+    controller = pipeline.rate_controller
+    if controller is None:
+        return pipeline.conf.rate
+    previous = controller.rate
+    rate = controller.update(pipeline.text_queue.pending_chars(), _queued_audio_seconds(pipeline))
+    if rate != previous:
+        logging.info(f"{pipeline.log_prefix}Speaking rate {previous} -> {rate} (backlog ~{controller.backlog_sec:.0f}s)")
+    return rate
+
+class _Job:
+    __slots__ = ("seq", "item", "spoken_name", "rate", "runs", "voice")
+
+    def __init__(self, seq, item, spoken_name, rate, runs):
+        self.seq = seq
+        self.item = item
+        self.spoken_name = spoken_name
+        self.rate = rate
+        self.runs = runs
+        self.voice = runs[0][1] if len(runs) == 1 else None
+
+def _claim(pipeline: ChannelPipeline, tts_item, now: float = None) -> _Job:
+    # Sequence numbers and name cooldown are decided at dequeue time, before
+    # any await, so they follow chat order regardless of which worker wins.
+    seq = pipeline.next_seq
+    pipeline.next_seq += 1
+    display_name = tts_item.display_name
+    entry = tts_item.repeats
+    if entry is not None:
+        entry.claimed = True
+    if entry is not None and pipeline.conf.dedup_mode == "collapse":
+        people = len(entry.users)
+        if people > 1:
+            tts_item.text = f"{people} people said: {tts_item.text}"
+            display_name = None
+    now = time.time() if now is None else now
+    spoken_name = None
+    if display_name is not None:
+        if not (pipeline.last_sender == display_name and (now - pipeline.last_time) < pipeline.conf.name_repeat_cooldown):
+            spoken_name = display_name
+            pipeline.last_sender = display_name
+            pipeline.last_time = now
+    # The message is segmented once here; the runs travel with the job.
+    runs = _split_voice_runs(str(tts_item.text), pipeline.conf)
+    return _Job(seq, tts_item, spoken_name, _current_rate(pipeline), runs)
+
+# === BATCHING ===
+# Consecutive messages for the same voice are merged into one Edge-TTS request
+# and the audio is cut back into per-message clips at the word boundaries, so
+# ordering, name clips and the per-message cache all keep working.
+_SENTENCE_END = (".", "!", "?", "。", "！", "？", "…")
+
+async def _take_jobs(pipeline: ChannelPipeline) -> list:
+    conf = pipeline.conf
+    queue = pipeline.text_queue
+    if conf.batch_size <= 1 or conf.streaming:
+        return [_claim(pipeline, await queue.get())]
+    # Holding the lock while collecting keeps each batch contiguous in chat order.
+    async with pipeline.batch_lock:
+        jobs = [_claim(pipeline, await queue.get())]
+        first = jobs[0]
+        if first.voice is None:
+            return jobs
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + conf.batch_window_ms / 1000.0
+        while len(jobs) < conf.batch_size:
             try:
-                val = current + (orig - current) * t
-                vol.SetMasterVolume(float(val), None)
-            except Exception:
-                continue
-        await asyncio.sleep(duration_ms / steps / 1000.0)
-    for pid, vol, current, orig in info:
-        try:
-            vol.SetMasterVolume(float(orig), None)
-        except Exception:
-            continue
-    global _ACTIVE_ATTENUATION
-    _ACTIVE_ATTENUATION = {}
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            job = _claim(pipeline, item)
+            jobs.append(job)
+            if job.voice != first.voice or job.rate != first.rate:
+                break
+        return jobs
 
+def _join_batch(texts: list):
+    parts = []
+    spans = []
+    pos = 0
+    for text in texts:
+        text = text.strip()
+        if not text.endswith(_SENTENCE_END):
+            text += "."
+        spans.append(pos)
+        parts.append(text)
+        pos += len(text) + 1
+    return "\n".join(parts), spans
 
-# === TTS PIPELINE ===
-tts_text_queue = asyncio.Queue()
-tts_audio_queue = asyncio.Queue()
+async def _synthesize_batch(texts: list, voice: str, rate: str, pitch: str):
+    joined, starts = _join_batch(texts)
+    chunks = []
+    words = []
+    async with _synth_slot():
+        async for chunk in _tts_engine.stream(joined, voice, rate, pitch, boundary="WordBoundary"):
+            if chunk["type"] == "audio":
+                chunks.append(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                words.append((chunk["offset"], chunk["duration"], chunk["text"]))
+            elif chunk["type"] == "engine":
+                # A fallback engine answered; its audio has no word boundaries to split on.
+                return None
+    audio = b"".join(chunks)
+    if not audio:
+        raise Exception("Failed to create audio for batch")
 
-async def generate_tts_file(text: str) -> str:
-    if not text or not text.strip():
-        raise ValueError("Empty text")
-    
-    import re
-    words = re.findall(r'\S+|\s+', text)
-    japanese_words = [w for w in words if w.strip() and _is_japanese_text(w.strip())]
-    non_japanese_words = [w for w in words if w.strip() and not _is_japanese_text(w.strip())]
-    
-    if not (japanese_words and non_japanese_words):
-        voice = _detect_language_and_get_voice(text)
-        logging.debug(f"Using single voice '{voice}' for text: {text[:50]}...")
-        communicate = edge_tts.Communicate(text, voice=voice)
-        temp_dir = _ensure_temp_folder()
-        temp_path = os.path.join(temp_dir, f"tts_{int(time.time()*1000)}_{random.randint(1000,9999)}.mp3")
-        await communicate.save(temp_path)
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            raise Exception("Failed to create audio file")
-        return temp_path
-    
-    logging.debug(f"Processing mixed-language text per word: {text[:50]}...")
-    audio_files = []
-    current_phrase = ""
-    current_voice = None
-    english_connector_words = {"says", "said", "writes", "wrote", "typed", "posted"}
-    
-    for word in words:
-        if not word.strip():
-            current_phrase += word
+    first = [None] * len(texts)
+    last = [None] * len(texts)
+    cursor = 0
+    for offset, duration, word in words:
+        idx = joined.find(word, cursor)
+        if idx < 0:
             continue
-            
-        word_is_japanese = _is_japanese_text(word.strip()) and word.strip().lower() not in english_connector_words
-        needed_voice = TTS_VOICE_JAPANESE if word_is_japanese else TTS_VOICE_ENGLISH
-        
-        if current_voice != needed_voice and current_phrase.strip():
-            audio_files.append(await _generate_word_audio(current_phrase.strip(), current_voice))
-            current_phrase = word
-            current_voice = needed_voice
+        cursor = idx + len(word)
+        m = bisect.bisect_right(starts, idx) - 1
+        if first[m] is None:
+            first[m] = offset
+        last[m] = offset + duration
+    if any(f is None for f in first):
+        return None
+    # Cut in the pause between one message's last word and the next one's first,
+    # as close to its middle as the bit reservoir allows.
+    cuts = [(last[i - 1] + first[i]) / 2 / 10_000_000 for i in range(1, len(texts))]
+    pauses = [(last[i - 1] / 10_000_000, first[i] / 10_000_000) for i in range(1, len(texts))]
+    return mp3_frames.split_at(audio, cuts, pauses)
+
+async def _render_batch(texts: list, voice: str, rate: str, pitch: str) -> list:
+    keys = [_cache_key(t, voice, rate, pitch) for t in texts]
+    clips = await _cache_get_many(keys)
+    missing = [i for i, clip in enumerate(clips) if clip is None]
+    if len(missing) > 1:
+        parts = await _synthesize_batch([texts[i] for i in missing], voice, rate, pitch)
+        if parts is None:
+            logging.debug("Could not split batch at message boundaries, synthesizing separately")
+            results = await asyncio.gather(*(_synthesize_audio(texts[i], voice, rate, pitch) for i in missing))
+            for i, (part, tag) in zip(missing, results):
+                clips[i] = part
+                _cache_put(_cache_key(texts[i], voice, rate, pitch, tag), part)
         else:
-            current_phrase += word
-            current_voice = current_voice or needed_voice
+            # Pieces of a batch aren't cached: they differ from the message synthesized on its own.
+            for i, part in zip(missing, parts):
+                clips[i] = part
+    elif missing:
+        i = missing[0]
+        clips[i], tag = await _synthesize_audio(texts[i], voice, rate, pitch)
+        _cache_put(_cache_key(texts[i], voice, rate, pitch, tag), clips[i])
+    return clips
 
-    if current_phrase.strip():
-        audio_files.append(await _generate_word_audio(current_phrase.strip(), current_voice))
-    
-    if not audio_files:
-        raise Exception("No audio generated")
-    
-    temp_dir = _ensure_temp_folder()
-    final_path = os.path.join(temp_dir, f"tts_{int(time.time()*1000)}_{random.randint(1000,9999)}.mp3")
-    await _combine_audio_files(audio_files, final_path)
-    return final_path
+async def _run_batch(pipeline: ChannelPipeline, jobs: list, worker_id: int):
+    conf = pipeline.conf
+    prefix = pipeline.log_prefix
+    results = {}
+    # Messages left to synthesize one by one after the batch failed.
+    retry = []
+    for job in jobs:
+        tts_metrics.mark(job.item.marks, "synth_start")
+    try:
+        logging.debug(f"{prefix}TTS worker {worker_id}: batching {len(jobs)} messages for '{jobs[0].voice}'")
+        clips, names = await asyncio.wait_for(
+            asyncio.gather(
+                _render_batch([str(job.item.text) for job in jobs], jobs[0].voice, jobs[0].rate, conf.pitch),
+                asyncio.gather(*(
+                    _get_name_clip(job.spoken_name, rate=job.rate, conf=conf) for job in jobs if job.spoken_name
+                )),
+            ),
+            timeout=TTS_SYNTH_TIMEOUT,
+        )
+        names = iter(names)
+        for job, clip in zip(jobs, clips):
+            tts_metrics.mark(job.item.marks, "synth_end")
+            if not clip:
+                continue
+            parts = [next(names), clip] if job.spoken_name else [clip]
+            results[job.seq] = await _hold_clip(mp3_frames.splice(parts))
+            tts_metrics.mark(job.item.marks, "concat")
+    except asyncio.TimeoutError:
+        logging.warning(f"{prefix}TTS worker {worker_id}: batch synthesis timed out after {TTS_SYNTH_TIMEOUT}s, synthesizing messages separately")
+        retry = [job for job in jobs if job.seq not in results]
+    except Exception as e:
+        logging.warning(f"{prefix}TTS worker {worker_id} batch error: {e}, synthesizing messages separately")
+        retry = [job for job in jobs if job.seq not in results]
+    finally:
+        for job in jobs:
+            if job not in retry:
+                await pipeline.reorder_buffer.put(job.seq, results.get(job.seq), job.item.marks)
+    if retry:
+        await asyncio.gather(*(_run_job(pipeline, job, worker_id) for job in retry))
 
-last_sender = None
-last_time = 0
+async def _run_job(pipeline: ChannelPipeline, job: _Job, worker_id: int):
+    conf = pipeline.conf
+    seq = job.seq
+    path = None
+    marks = job.item.marks
+    try:
+        message_text = str(job.item.text)
+        if conf.streaming:
+            # The stream takes its playback slot immediately; the worker stays
+            # busy feeding it until synthesis finishes.
+            stream = _AudioStream()
+            await pipeline.reorder_buffer.put(seq, stream, marks)
+            seq = None
+            # Waiting for room in the audio queue above isn't synthesis time.
+            tts_metrics.mark(marks, "synth_start")
+            try:
+                await asyncio.wait_for(
+                    stream_tts(message_text, stream, display_name=job.spoken_name, rate=job.rate, conf=conf, runs=job.runs),
+                    timeout=TTS_SYNTH_TIMEOUT,
+                )
+                tts_metrics.mark(marks, "synth_end")
+            finally:
+                stream.close()
+        else:
+            tts_metrics.mark(marks, "synth_start")
+            audio = await asyncio.wait_for(
+                render_tts_audio(message_text, display_name=job.spoken_name, rate=job.rate, conf=conf, runs=job.runs),
+                timeout=TTS_SYNTH_TIMEOUT,
+            )
+            tts_metrics.mark(marks, "synth_end")
+            path = await _hold_clip(audio)
+            tts_metrics.mark(marks, "concat")
+    except asyncio.TimeoutError:
+        logging.error(f"{pipeline.log_prefix}TTS worker {worker_id}: synthesis timed out after {TTS_SYNTH_TIMEOUT}s, skipping message")
+    except Exception as e:
+        logging.error(f"{pipeline.log_prefix}TTS worker {worker_id} error: {e}")
+    finally:
+        if seq is not None:
+            await pipeline.reorder_buffer.put(seq, path, marks)
 
-async def tts_gen_worker():
-    global last_sender, last_time
+async def tts_gen_worker(pipeline: ChannelPipeline, worker_id: int = 0):
     while True:
-        tts_item = await tts_text_queue.get()
-        if isinstance(tts_item, tuple) and len(tts_item) == 2:
-            display_name, message_text = tts_item
-        else:
-            display_name, message_text = None, tts_item
-        now = time.time()
-        if display_name is not None:
-            if last_sender == display_name and (now - last_time) < NAME_REPEAT_COOLDOWN:
-                tts_text = message_text
-            else:
-                username_is_japanese = _is_japanese_text(display_name)
-                message_has_japanese = _is_japanese_text(message_text)
-                
-                if username_is_japanese != message_has_japanese:
-                    tts_text = f"{display_name} says {message_text}"
-                else:
-                    tts_text = f"{display_name} says {message_text}"
-                
-                last_sender = display_name
-                last_time = now
-        else:
-            tts_text = message_text
+        jobs = await _take_jobs(pipeline)
         try:
-            path = await generate_tts_file(str(tts_text))
-            await tts_audio_queue.put(path)
-        except Exception as e:
-            logging.error(f"TTS worker error: {e}")
-        tts_text_queue.task_done()
+            groups = []
+            for job in jobs:
+                if groups and job.voice is not None and job.voice == groups[-1][0].voice and job.rate == groups[-1][0].rate:
+                    groups[-1].append(job)
+                else:
+                    groups.append([job])
+            await asyncio.gather(*(
+                _run_batch(pipeline, group, worker_id) if len(group) > 1 else _run_job(pipeline, group[0], worker_id)
+                for group in groups
+            ))
+        finally:
+            for _ in jobs:
+                pipeline.text_queue.task_done()
+
+# === DUCKING ===
+# Several channels may speak at once; other apps are ducked when the first one
+# starts and restored when the last one finishes. The restore isn't waited
+# for, so a message arriving mid-fade turns volumes back down from where they are.
+_ducking_backend = ducking.make_backend()
+_ducker = ducking.Ducker(_ducking_backend) if _ducking_backend is not None else None
+_duck_users = 0
+_duck_pending = None
+
+async def _duck_acquire(exclude_names: set):
+    global _duck_users, _duck_pending
+    if _ducker is None:
+        return
+    _duck_users += 1
+    if _duck_users == 1:
+        _duck_pending = asyncio.wrap_future(_ducker.duck(
+            TTS_ATTENUATION, ATTENUATION_DELAY_MS / 1000.0,
+            exclude_pids={os.getpid()}, exclude_names=exclude_names | _EXCLUDE_FROM_CONFIG,
+        ))
+    # Later channels wait for the same fade instead of starting their own.
+    if _duck_pending is not None:
+        await asyncio.shield(_duck_pending)
+
+async def _duck_release():
+    global _duck_users, _duck_pending
+    if _ducker is None:
+        return
+    _duck_users = max(0, _duck_users - 1)
+    if _duck_users == 0:
+        _duck_pending = None
+        _ducker.restore(ATTENUATION_DELAY_MS / 1000.0)
 
-async def tts_playback_worker():
+def _close_ducker():
+    # Puts ducked apps straight back; safe to call more than once.
+    try:
+        if _ducker is not None:
+            _ducker.close()
+    except Exception as e:
+        logging.debug(f"Volume restore failed: {e}")
+
+async def _play_clip(pipeline: ChannelPipeline, clip):
+    await pipeline.engine.play(clip)
+    if isinstance(clip, _AudioStream) and clip.error is not None:
+        logging.error(f"{pipeline.log_prefix}TTS stream ended early: {clip.error}")
+
+def _drop_if_stale(pipeline: ChannelPipeline, clip, marks) -> bool:
+    # Clips can wait in the reorder buffer and audio queue too, so the age
+    # limit is checked again right before playing.
+    max_age = pipeline.conf.max_message_age
+    received = marks.get("received") if marks else None
+    if not max_age or received is None:
+        return False
+    age = time.monotonic() - received
+    if age <= max_age:
+        return False
+    pipeline.text_queue.dropped["too old to play"] += 1
+    logging.info(f"{pipeline.log_prefix}Skipped TTS clip (too old to play, {age:.0f}s since received)")
+    _release_clip(clip)
+    pipeline.audio_queue.task_done()
+    return True
+
+async def tts_playback_worker(pipeline: ChannelPipeline):
     grace_sec = max(0.0, float(ATTENUATION_DELAY_MS) / 1000.0)
+    engine = pipeline.engine
+    audio_queue = pipeline.audio_queue
+    # Only sinks that reach the speakers need other apps turned down.
+    speaker = engine.sink.process_name
     while True:
-        path = await tts_audio_queue.get()
-        original_volumes = {}
+        path, marks = await audio_queue.get()
+        if _drop_if_stale(pipeline, path, marks):
+            continue
+        ducked = False
         try:
-            original_volumes = await _ramp_duck_other_app_volumes(
-                factor=TTS_ATTENUATION,
-                exclude_pids={os.getpid()},
-                exclude_names={_get_ffplay_process_name()} | _EXCLUDE_FROM_CONFIG,
-                duration_ms=ATTENUATION_DELAY_MS
-            )
+            if speaker:
+                ducked = True
+                await _duck_acquire({speaker})
 
             while True:
-                volume = min(100, max(0, int(float(TTS_VOLUME) * 100)))
-                try:
-                    process = await asyncio.create_subprocess_exec(
-                        "ffplay", "-nodisp", "-autoexit", "-loglevel", "quiet",
-                        "-volume", str(volume), path,
-                        stdin=asyncio.subprocess.DEVNULL,
-                        stdout=asyncio.subprocess.DEVNULL,
-                        stderr=asyncio.subprocess.DEVNULL,
-                    )
-                    await process.communicate()
-                except FileNotFoundError:
-                    logging.error("ffplay not found. Please install ffmpeg")
-                except Exception as e:
-                    logging.error(f"TTS playback error: {e}")
-                finally:
+                if not _drop_if_stale(pipeline, path, marks):
                     try:
-                        os.remove(path)
-                    except Exception:
-                        pass
-                    tts_audio_queue.task_done()
+                        tts_metrics.mark(marks, "play_start")
+                        await _play_clip(pipeline, path)
+                        # play() returns slightly before the clip has finished sounding.
+                        tts_metrics.mark(marks, "play_end", time.monotonic() + engine.remaining())
+                        if marks is not None:
+                            _metrics.observe_message(marks, pipeline.channel)
+                    except FileNotFoundError:
+                        logging.error("ffplay not found. Please install ffmpeg")
+                    except Exception as e:
+                        logging.error(f"{pipeline.log_prefix}TTS playback error: {e}")
+                    finally:
+                        _release_clip(path)
+                        audio_queue.task_done()
                 try:
-                    path = tts_audio_queue.get_nowait()
+                    path, marks = audio_queue.get_nowait()
                     continue
                 except asyncio.QueueEmpty:
                     pass
@@ -425,7 +1255,9 @@ async def tts_playback_worker():
                 got_next = False
                 if grace_sec > 0:
                     try:
-                        path = await asyncio.wait_for(tts_audio_queue.get(), timeout=grace_sec)
+                        path, marks = await asyncio.wait_for(
+                            audio_queue.get(), timeout=grace_sec + engine.remaining()
+                        )
                         got_next = True
                     except asyncio.TimeoutError:
                         got_next = False
@@ -433,45 +1265,139 @@ async def tts_playback_worker():
                     break
         finally:
             try:
-                if original_volumes:
-                    await _ramp_restore_app_volumes(original_volumes or {}, duration_ms=ATTENUATION_DELAY_MS)
+                await engine.drain()
             except Exception:
                 pass
+            try:
+                if ducked:
+                    await _duck_release()
+            except Exception:
+                pass
+
+
+def _register_gauges(pipelines):
+    def per_channel(fn):
+        return lambda: [({"channel": p.channel}, fn(p)) for p in pipelines]
+    _metrics.gauge("text_queue_depth", per_channel(lambda p: p.text_queue.qsize()), "Messages waiting for synthesis.")
+    _metrics.gauge("audio_queue_depth", per_channel(lambda p: p.audio_queue.qsize()), "Clips waiting for playback.")
+    _metrics.gauge("reorder_pending", per_channel(lambda p: len(p.reorder_buffer)), "Finished clips waiting on earlier messages.")
+    _metrics.gauge("queued_audio_seconds", per_channel(_queued_audio_seconds), "Seconds of synthesized speech not yet played.")
+    _metrics.gauge(
+        "speaking_rate_percent",
+        per_channel(lambda p: p.rate_controller.percent if p.rate_controller else rate_control.parse_rate_percent(p.conf.rate) or 0),
+        "Current Edge-TTS rate.",
+    )
+    _metrics.gauge(
+        "messages_dropped",
+        lambda: [({"channel": p.channel, "reason": r}, n) for p in pipelines for r, n in p.text_queue.dropped.items()],
+        "Messages skipped before synthesis or playback, by reason.",
+    )
+    _metrics.gauge("queued_audio_bytes", lambda: [({}, _queued_audio_bytes)], "Bytes of queued clips held in memory.")
+    _metrics.gauge(
+        "cache_entries",
+        lambda: [({}, _audio_cache.stats()["entries"])] if _audio_cache.enabled else [],
+        "Clips in the on-disk audio cache.",
+    )
+
+async def _start_metrics_export():
+    tasks = []
+    if METRICS_PORT:
+        try:
+            server = await tts_metrics.serve(_metrics, METRICS_HOST, METRICS_PORT)
+            logging.info(f"Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+            tasks.append(asyncio.create_task(server.serve_forever()))
+        except OSError as e:
+            logging.error(f"Could not start metrics server on {METRICS_HOST}:{METRICS_PORT}: {e}")
+    if METRICS_JSONL:
+        tasks.append(asyncio.create_task(tts_metrics.dump_jsonl(_metrics, METRICS_JSONL, METRICS_INTERVAL, _io_pool)))
+    return tasks
+
+
+async def _prewarm_engine(pipelines):
+    voices = set()
+    boundaries = {None}
+    for pipeline in pipelines:
+        router = pipeline.conf.router
+        voices.add(router.default_voice)
+        voices.update(router.voices.values())
+        # Batched requests ask for word boundaries, which need their own sessions.
+        if pipeline.conf.batch_size > 1 and not pipeline.conf.streaming:
+            boundaries.add("WordBoundary")
+    try:
+        await _tts_engine.prewarm(sorted(voices), tuple(boundaries))
+    except Exception as e:
+        logging.warning(f"Could not pre-warm TTS sessions: {e}")
 
 
 # === MAIN TTS ===
-def start_bot(channel):
+def start_bot(pipelines):
     async def runner():
-        gen_task = asyncio.create_task(tts_gen_worker())
-        play_task = asyncio.create_subprocess_exec
-        play_task = asyncio.create_task(tts_playback_worker())
+        _register_gauges(pipelines)
+        metrics_tasks = await _start_metrics_export()
+        watchdog = None
+        if LOOP_LAG_WARN_MS:
+            watchdog = loop_watchdog.LoopWatchdog(
+                LOOP_LAG_WARN_MS / 1000.0, on_lag=lambda lag: _metrics.observe("event_loop_lag", lag)
+            )
+            watchdog.start()
         try:
-            while True:
-                try:
-                    await anonymous_irc_reader(channel)
-                    logging.warning("Disconnected from IRC. Reconnecting in 5 seconds...")
-                except Exception as e:
-                    logging.error(f"IRC loop error: {e}")
-                await asyncio.sleep(5)
+            signame = loop_watchdog.install_profile_signal(PROFILE_SECONDS)
+            if signame:
+                logging.info(f"Send {signame} to write a {PROFILE_SECONDS:.0f}s stack profile of the event loop")
+        except (ValueError, OSError) as e:
+            logging.debug(f"Profile signal not installed: {e}")
+        try:
+            await _tts_engine.start()
+        except Exception as e:
+            logging.error(f"Could not start TTS engine '{_tts_engine.name}': {e}")
+        await _prewarm_engine(pipelines)
+        for pipeline in pipelines:
+            await pipeline.start()
+        by_channel = {p.channel: p for p in pipelines}
+        channels = list(by_channel)
+        # Twitch caps how many channels one connection should join, so large
+        # channel lists are spread over several connections.
+        chunks = [channels[i:i + IRC_CHANNELS_PER_CONNECTION] for i in range(0, len(channels), IRC_CHANNELS_PER_CONNECTION)]
+        try:
+            await asyncio.gather(*(
+                _irc_connection_loop({c: by_channel[c] for c in chunk}) for chunk in chunks
+            ))
         finally:
-            gen_task.cancel()
-            play_task.cancel()
-            try:
-                await gen_task
-            except asyncio.CancelledError:
-                pass
-            try:
-                await play_task
-            except asyncio.CancelledError:
-                pass
+            for task in metrics_tasks:
+                task.cancel()
+            for pipeline in pipelines:
+                await pipeline.stop()
+            await _tts_engine.close()
+            if watchdog is not None:
+                await watchdog.stop()
     asyncio.run(runner())
 
 
-async def anonymous_irc_reader(channel: str):
-    server = "irc.chat.twitch.tv"
-    port = 6667
+async def _irc_connection_loop(pipelines: dict):
+    while True:
+        try:
+            await anonymous_irc_reader(pipelines)
+            logging.warning("Disconnected from IRC. Reconnecting in 5 seconds...")
+        except Exception as e:
+            logging.error(f"IRC loop error: {e}")
+        await asyncio.sleep(5)
+
+
+# Anonymous connections may join at most 20 channels per 10 seconds.
+IRC_JOIN_BURST = 20
+IRC_JOIN_WINDOW_SEC = 10.5
+
+async def _join_channels(send, channels: list):
+    for i, channel in enumerate(channels):
+        if i and i % IRC_JOIN_BURST == 0:
+            await asyncio.sleep(IRC_JOIN_WINDOW_SEC)
+        send(f"JOIN #{channel}")
+
+
+async def anonymous_irc_reader(pipelines: dict, server: str = "irc.chat.twitch.tv", port: int = 6667):
     nick = f"justinfan{random.randint(10000,99999)}"
-    logging.info(f"Connected to #{channel}")
+    channels = list(pipelines)
+    logging.info(f"Connected to #{channels[0]}" if len(channels) == 1 else f"Connected to {len(channels)} channels")
 
     reader, writer = await asyncio.open_connection(server, port)
 
@@ -481,67 +1407,36 @@ async def anonymous_irc_reader(channel: str):
 
     send("CAP REQ :twitch.tv/tags twitch.tv/commands twitch.tv/membership")
     send(f"NICK {nick}")
-    send(f"JOIN #{channel}")
+    join_task = asyncio.create_task(_join_channels(send, channels))
 
     try:
         while not reader.at_eof():
             raw = await reader.readline()
             if not raw:
                 break
+            received = time.monotonic()
             line = raw.decode(errors="ignore").strip()
             logging.debug(f"<<< {line}")
 
-            if line.startswith("PING"):
-                send(line.replace("PING", "PONG"))
+            msg = irc_parser.parse_line(line)
+            if msg is None:
                 continue
 
-            if "PRIVMSG" in line:
+            if msg.command == "PING":
+                send(f"PONG :{msg.text}" if msg.text is not None else "PONG")
+                continue
+
+            if msg.command == "PRIVMSG":
                 try:
-                    tags_part = None
-                    rest = line
-                    if line.startswith("@"):
-                        tags_part, rest = line.split(" ", 1)
-                    parts = rest.split(" :", 1)
-                    prefix_and_cmd = parts[0]
-                    message_text = parts[1] if len(parts) > 1 else ""
-
-                    prefix = prefix_and_cmd.split(" ")[0]
-                    if prefix.startswith(":"):
-                        sender = prefix[1:].split("!")[0]
-                    else:
-                        sender = "unknown"
-
-                    display_name = sender
-                    emotes_tag = ""
-                    if tags_part:
-                        tags = {}
-                        for kv in tags_part[1:].split(";"):
-                            if "=" in kv:
-                                k, v = kv.split("=", 1)
-                                tags[k] = v
-                        display_name = tags.get("display-name", sender)
-                        emotes_tag = tags.get("emotes", "")
-                    
-                    filtered_message = _filter_emotes_from_message(message_text, emotes_tag)
-                    
-                    filtered_message = _apply_custom_pronunciations(filtered_message)
-
-                    if sender.lower() == CHANNEL_NAME_LOWER:
-                        continue
-                    if sender.lower() in IGNORE_USERS or display_name.lower() in IGNORE_USERS:
-                        continue
-                    if filtered_message.strip().startswith("!"):
-                        continue
-                    if not filtered_message.strip():
-                        continue
-                    
-                    logging.info(f"Received: {display_name} says {filtered_message}")
-                    await tts_text_queue.put((display_name, filtered_message))
+                    pipeline = pipelines.get(msg.channel.lower())
+                    if pipeline is not None:
+                        pipeline.handle_message(msg, received)
                 except Exception as e:
                     logging.error(f"Error parsing line: {e} -- {line}")
     except Exception as e:
         logging.error(f"Anonymous IRC reader error: {e}")
     finally:
+        join_task.cancel()
         try:
             writer.close()
             await writer.wait_closed()
@@ -551,8 +1446,8 @@ async def anonymous_irc_reader(channel: str):
 
 # === REAL MAIN ===
 def main():
-    if CHANNEL_NAME == "your_channel_here" or not CHANNEL_NAME:
-        print("Please set CHANNEL_NAME in config.txt before running. Exiting.")
+    if not CHANNEL_NAMES:
+        print("Please set CHANNEL_NAME or add a [channel] section in config.txt before running. Exiting.")
         return
     
     platform_name = "Unknown"
@@ -564,38 +1459,35 @@ def main():
         platform_name = "Linux"
     
     logging.info(f"Starting Twitch TTS Bot on {platform_name}")
-    logging.info(f"Reading chat from channel: {CHANNEL_NAME}")
+    init_tts_engine()
+    channel_configs = load_channel_configs()
+    pipelines = [ChannelPipeline(conf, label=len(channel_configs) > 1) for conf in channel_configs]
+    logging.info(f"Reading chat from channel{'s' if len(pipelines) > 1 else ''}: {', '.join(p.channel for p in pipelines)}")
     
     features = []
     if HAS_PYKAKASI:
         features.append("Japanese text romanization")
-    if HAS_PYCAW and sys.platform.startswith("win"):
-        features.append("Audio ducking (volume control)")
+    if _ducker is not None:
+        features.append(f"Audio ducking ({_ducking_backend.name})")
     else:
         logging.info("Audio ducking not available (Windows + pycaw required)")
     if features:
         logging.info(f"Available features: {', '.join(features)}")
     try:
-        start_bot(CHANNEL_NAME)
+        start_bot(pipelines)
     except KeyboardInterrupt:
         logging.info("Interrupted. Exiting...")
     finally:
-        try:
-            if _ACTIVE_ATTENUATION:
-                logging.info("Restoring volumes on shutdown...")
-                _restore_other_app_volumes(_ACTIVE_ATTENUATION)
-        except Exception as e:
-            logging.debug(f"Shutdown restore failed: {e}")
+        # Let queued cache writes finish before the process exits.
+        _io_pool.shutdown(wait=True)
+        _log_queue_stats(pipelines)
+        _log_latency_stats()
+        _log_cache_stats()
+        if _ducker is not None and _ducker.ducked:
+            logging.info("Restoring volumes on shutdown...")
+        _close_ducker()
 
 
 if __name__ == "__main__":
-    def _emergency_restore_on_exit():
-        try:
-            if _ACTIVE_ATTENUATION:
-                logging.info("Emergency restore on exit...")
-                _restore_other_app_volumes(_ACTIVE_ATTENUATION)
-        except Exception as e:
-            logging.debug(f"Atexit restore failed: {e}")
-
-    atexit.register(_emergency_restore_on_exit)
+    atexit.register(_close_ducker)
     main()
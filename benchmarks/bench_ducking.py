@@ -0,0 +1,195 @@
+"""Time ducking bursts and check the fades, using the fake ducking backend.
+
+    python benchmarks/bench_ducking.py [--bursts 20] [--sessions 12] [--call-ms 0.3]
+        [--fade-ms 100] [--hold-ms 150] [--gap-ms 40]
+
+Every backend call sleeps ``--call-ms`` (listing sessions costs that per
+session), standing in for COM round trips. Each burst ducks, holds for
+``--hold-ms`` and restores, and the next burst starts ``--gap-ms`` after the
+restore was requested, so most of them interrupt a restore halfway. The old
+way of ducking (list and open every session for each duck and again for each
+restore, then step the volumes on 10 ms sleeps) is replayed against the same
+backend for comparison.
+
+Reported: time until a duck has fully taken effect, how late fade ticks ran,
+backend calls per burst, and whether any volume ever moved further in one
+step than its fade allows (given the latest tick) or ended away from where it
+started. Sessions come and
+go between bursts, and one vanishes mid-fade.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ducking  # noqa: E402
+
+FACTOR = 0.5
+OWN_PID = 1
+
+
+def _make_backend(sessions: int, call_sec: float) -> ducking.FakeBackend:
+    backend = ducking.FakeBackend(call_sec=call_sec)
+    backend.add("self", OWN_PID, "python.exe", 1.0)
+    for i in range(sessions):
+        backend.add(f"app{i}", 100 + i, f"app{i}.exe", round(0.3 + 0.7 * i / max(1, sessions - 1), 3))
+    return backend
+
+
+def _churn(backend: ducking.FakeBackend, rng: random.Random, burst: int):
+    # An app starts or stops every few bursts.
+    if burst % 5 == 2:
+        backend.add(f"new{burst}", 1000 + burst, f"new{burst}.exe", rng.uniform(0.2, 1.0))
+    if burst % 5 == 4:
+        backend.remove(f"new{burst - 2}")
+
+
+def _old_ramp(backend, info, fade_sec):
+    steps = max(1, int(fade_sec * 1000 // 10))
+    for i in range(1, steps + 1):
+        for handle, start, target in info:
+            try:
+                backend.set_volume(handle, start + (target - start) * i / steps)
+            except Exception:
+                continue
+        time.sleep(fade_sec / steps)
+    for handle, start, target in info:
+        try:
+            backend.set_volume(handle, target)
+        except Exception:
+            continue
+
+
+def run_old(backend, bursts: int, fade_sec: float, hold_sec: float, gap_sec: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies = []
+    for burst in range(bursts):
+        _churn(backend, rng, burst)
+        started = time.perf_counter()
+        original = {}
+        info = []
+        for key, (pid, name, source) in backend.enumerate().items():
+            if pid == OWN_PID:
+                continue
+            handle = backend.open(source)
+            volume = backend.get_volume(handle)
+            original[key] = volume
+            info.append((handle, volume, volume * FACTOR))
+        _old_ramp(backend, info, fade_sec)
+        latencies.append(time.perf_counter() - started)
+        time.sleep(hold_sec)
+        current = backend.enumerate()
+        info = []
+        for key, volume in original.items():
+            if key not in current:
+                continue
+            handle = backend.open(current[key][2])
+            info.append((handle, backend.get_volume(handle), volume))
+        _old_ramp(backend, info, fade_sec)
+        time.sleep(gap_sec)
+    return {"latencies": latencies}
+
+
+def run_ducker(backend, bursts: int, fade_sec: float, hold_sec: float, gap_sec: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    ducker = ducking.Ducker(backend, refresh_sec=0.5)
+    latencies = []
+    interrupted = 0
+    restore = None
+    for burst in range(bursts):
+        _churn(backend, rng, burst)
+        if burst == bursts // 2:
+            # Disappears while its volume is fading back up.
+            backend.remove("app0")
+        started = time.perf_counter()
+        done = ducker.duck(FACTOR, fade_sec, exclude_pids={OWN_PID})
+        done.result()
+        latencies.append(time.perf_counter() - started)
+        if restore is not None and restore.result() is False:
+            interrupted += 1
+        time.sleep(hold_sec)
+        restore = ducker.restore(fade_sec)
+        time.sleep(gap_sec)
+    restore.result()
+    ducker.close()
+    return {"latencies": latencies, "interrupted": interrupted, "ducker": ducker}
+
+
+def check_fades(backend, before: dict, fade_sec: float, step_sec: float) -> list:
+    problems = []
+    last = dict(before)
+    # The most a fade can move between two ticks that are step_sec apart.
+    max_step = max(before.values()) * (1 - FACTOR) * min(1.0, step_sec / fade_sec) if fade_sec else 1.0
+    for _, key, volume in backend.history:
+        previous = last.get(key)
+        if previous is not None and abs(volume - previous) > max_step + 1e-9:
+            problems.append(f"{key} jumped {previous:.3f} -> {volume:.3f}")
+        last[key] = volume
+    for key, volume in before.items():
+        try:
+            now = backend.volume(key)
+        except KeyError:
+            continue
+        if abs(now - volume) > 1e-9:
+            problems.append(f"{key} ended at {now:.3f} instead of {volume:.3f}")
+    if backend.volume("self") != 1.0 or any(key == "self" for _, key, _ in backend.history):
+        problems.append("own session was touched")
+    return problems
+
+
+def _pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] * 1000 if values else 0.0
+
+
+def report(name: str, backend, latencies: list, bursts: int):
+    calls = backend.calls
+    print(f"{name:<8} duck done: p50 {_pct(latencies, 0.5):6.1f} ms   p90 {_pct(latencies, 0.9):6.1f} ms   "
+          f"max {_pct(latencies, 1.0):6.1f} ms")
+    print(f"         per burst: {calls['enumerate'] / bursts:.2f} listings, {calls['open'] / bursts:.2f} opens, "
+          f"{calls['get_volume'] / bursts:.1f} reads, {calls['set_volume'] / bursts:.1f} volume sets")
+
+
+def main(args):
+    fade_sec = args.fade_ms / 1000.0
+    hold_sec = args.hold_ms / 1000.0
+    gap_sec = args.gap_ms / 1000.0
+    call_sec = args.call_ms / 1000.0
+
+    backend = _make_backend(args.sessions, call_sec)
+    old = run_old(backend, args.bursts, fade_sec, hold_sec, gap_sec + fade_sec, args.seed)
+    report("old", backend, old["latencies"], args.bursts)
+
+    backend = _make_backend(args.sessions, call_sec)
+    before = {key: backend.volume(key) for key in backend.enumerate()}
+    backend.calls.clear()
+    new = run_ducker(backend, args.bursts, fade_sec, hold_sec, gap_sec, args.seed)
+    report("ducker", backend, new["latencies"], args.bursts)
+    ducker = new["ducker"]
+    print(f"         {new['interrupted']} restores interrupted by the next duck, "
+          f"{ducker.stats['refreshes']} refreshes, {ducker.stats['sessions_opened']} sessions opened, "
+          f"{ducker.stats['session_errors']} vanished mid-fade, latest tick {ducker.max_tick_lag * 1000:.1f} ms late")
+    # Apps that came and went between bursts were never in `before`.
+    problems = check_fades(backend, {k: v for k, v in before.items() if k != "app0"},
+                           fade_sec, 2 * ducker.tick + ducker.max_tick_lag)
+    if problems:
+        print(f"FADE PROBLEMS ({len(problems)}):")
+        for problem in problems[:10]:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("         fades: no jumps, every session back at its original volume")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=12, help="other apps playing audio")
+    parser.add_argument("--call-ms", type=float, default=0.3, help="cost of one backend call")
+    parser.add_argument("--fade-ms", type=float, default=100.0, help="ATTENUATION_DELAY_MS")
+    parser.add_argument("--hold-ms", type=float, default=150.0, help="speech per burst")
+    parser.add_argument("--gap-ms", type=float, default=40.0, help="time between a restore and the next duck")
+    parser.add_argument("--seed", type=int, default=1)
+    main(parser.parse_args())
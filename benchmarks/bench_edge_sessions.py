@@ -0,0 +1,205 @@
+"""Measure what warm Edge TTS sessions save per message, against a local stand-in server.
+
+    python benchmarks/bench_edge_sessions.py [--messages 200] [--handshake-ms 120]
+        [--synth-ms 80] [--gap-ms 20] [--concurrency 3] [--sessions 3] [--close-after-turn]
+
+A local websocket server speaks enough of the Edge read-aloud protocol for
+both ``edge_tts.Communicate`` and ``edge_sessions.SessionPool``: it waits
+``--handshake-ms`` before accepting each connection (standing in for TCP, TLS
+and the upgrade), then answers every SSML request after ``--synth-ms`` with
+silent MP3 frames, one word boundary per word and ``turn.end``. The same
+messages are sent through a new ``Communicate`` per message and through a
+pre-warmed pool, and time to first audio, time to the whole clip and the
+number of handshakes are reported for each. Nothing touches the network.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from aiohttp import web  # noqa: E402
+
+import edge_sessions  # noqa: E402
+from chatlog import synthetic_chat_lines  # noqa: E402
+
+# One MPEG-2 Layer III frame, 24 kHz / 48 kbps mono like Edge-TTS output: 144 bytes, 24 ms.
+_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC4]) + bytes(140)
+_FRAME_TICKS = 576 * 10_000_000 // 24000
+_FRAMES_PER_WORD = 12
+_FRAMES_PER_MESSAGE = 8
+
+
+def _headers(message: str) -> dict:
+    head = message.split("\r\n\r\n", 1)[0]
+    return dict(line.split(":", 1) for line in head.split("\r\n") if ":" in line)
+
+
+def _text_frame(request_id: str, path: str, body: str = "") -> str:
+    return (f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+            f"Path:{path}\r\n\r\n{body}")
+
+
+def _audio_frame(request_id: str, data: bytes) -> bytes:
+    head = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n".encode()
+    return len(head).to_bytes(2, "big") + head + data
+
+
+class StandInServer:
+    def __init__(self, handshake_sec: float, synth_sec: float, close_after_turn: bool):
+        self.handshake = handshake_sec
+        self.synth = synth_sec
+        self.close_after_turn = close_after_turn
+        self.connections = 0
+        self.requests = 0
+        self.url = None
+        self._runner = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/edge/v1", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}/edge/v1?TrustedClientToken=bench"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+    async def _handle(self, request):
+        self.connections += 1
+        await asyncio.sleep(self.handshake)
+        ws = web.WebSocketResponse(compress=False)
+        try:
+            await ws.prepare(request)
+        except ConnectionResetError:
+            # The client gave up while the handshake was still "in flight".
+            return ws
+        async for msg in ws:
+            if msg.type != web.WSMsgType.TEXT:
+                continue
+            headers = _headers(msg.data)
+            if headers.get("Path") != "ssml":
+                continue
+            self.requests += 1
+            await self._answer(ws, headers["X-RequestId"], msg.data.split("\r\n\r\n", 1)[1])
+            if self.close_after_turn:
+                break
+        await ws.close()
+        return ws
+
+    async def _answer(self, ws, request_id: str, ssml: str):
+        words = ssml.split("volume='+0%'>", 1)[-1].split("</prosody>", 1)[0].split()
+        await ws.send_str(_text_frame(request_id, "turn.start", "{}"))
+        await asyncio.sleep(self.synth)
+        offset = 0
+        for word in words or [""]:
+            meta = {"Metadata": [{"Type": "WordBoundary", "Data": {
+                "Offset": offset, "Duration": _FRAMES_PER_WORD * _FRAME_TICKS, "text": {"Text": word}}}]}
+            await ws.send_str(_text_frame(request_id, "audio.metadata", json.dumps(meta)))
+            offset += _FRAMES_PER_WORD * _FRAME_TICKS
+        for _ in range(_FRAMES_PER_MESSAGE):
+            await ws.send_bytes(_audio_frame(request_id, _FRAME * 4))
+        await ws.send_str(_text_frame(request_id, "turn.end", "{}"))
+
+
+async def _timed(events) -> tuple:
+    started = time.perf_counter()
+    first = None
+    async for event in events:
+        if event["type"] == "audio" and first is None:
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+async def run_mode(name: str, stream, messages: list, concurrency: int, gap_sec: float) -> list:
+    results = []
+    queue = asyncio.Queue()
+    for text in messages:
+        queue.put_nowait(text)
+
+    async def worker():
+        while not queue.empty():
+            text = queue.get_nowait()
+            results.append(await _timed(stream(text)))
+            await asyncio.sleep(gap_sec)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+
+def _pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] * 1000 if values else 0.0
+
+
+def report(name: str, results: list, handshakes: int, elapsed: float):
+    first = [r[0] for r in results if r[0] is not None]
+    total = [r[1] for r in results]
+    print(f"{name:<12} {len(results)} messages in {elapsed:.1f}s, {handshakes} handshakes")
+    for label, values in (("first_audio", first), ("whole_clip", total)):
+        print(f"  {label:<12}: p50 {_pct(values, 0.5):7.1f} ms   p90 {_pct(values, 0.9):7.1f} ms   "
+              f"p99 {_pct(values, 0.99):7.1f} ms")
+
+
+async def main(args):
+    import edge_tts
+    import edge_tts.communicate
+
+    messages = [line.split(" PRIVMSG ", 1)[1].split(" :", 1)[1].strip("\x01").replace("ACTION ", "", 1)
+                for line in synthetic_chat_lines(args.messages, seed=args.seed) if " PRIVMSG " in line]
+    server = StandInServer(args.handshake_ms / 1000.0, args.synth_ms / 1000.0, args.close_after_turn)
+    await server.start()
+    voice = "en-US-AriaNeural"
+    try:
+        # Communicate reads the URL from its own module globals.
+        edge_tts.communicate.WSS_URL = server.url
+        started = time.perf_counter()
+        results = await run_mode(
+            "communicate",
+            lambda text: edge_tts.Communicate(text, voice=voice).stream(),
+            messages, args.concurrency, args.gap_ms / 1000.0,
+        )
+        report("communicate", results, server.connections, time.perf_counter() - started)
+
+        server.connections = 0
+        pool = edge_sessions.SessionPool(args.sessions, url=server.url)
+        warm_started = time.perf_counter()
+        await pool.prewarm([voice])
+        print(f"pre-warmed {server.connections} sessions in {(time.perf_counter() - warm_started) * 1000:.0f} ms")
+        server.connections = 0
+        started = time.perf_counter()
+        results = await run_mode(
+            "pool",
+            lambda text: pool.stream(text, voice, "+0%", "+0Hz"),
+            messages, args.concurrency, args.gap_ms / 1000.0,
+        )
+        elapsed = time.perf_counter() - started
+        await pool.close()
+        report("pool", results, server.connections, elapsed)
+        print(f"  reused {pool.reused} sessions, {pool.handshakes} handshakes including pre-warm"
+              f"{', one turn per connection' if pool.single_turn else ''}")
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=120.0,
+                        help="server delay before accepting a connection")
+    parser.add_argument("--synth-ms", type=float, default=80.0, help="server delay before the first audio")
+    parser.add_argument("--gap-ms", type=float, default=20.0, help="pause between messages per worker")
+    parser.add_argument("--concurrency", type=int, default=3, help="messages in flight, like TTS_WORKERS")
+    parser.add_argument("--sessions", type=int, default=3, help="EDGE_SESSIONS_PER_VOICE")
+    parser.add_argument("--close-after-turn", action="store_true",
+                        help="server closes every connection after one request")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
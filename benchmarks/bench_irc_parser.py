@@ -0,0 +1,91 @@
+"""Replay a chat log through the IRC parser and report lines per second.
+
+    python benchmarks/bench_irc_parser.py [--log chat.log] [--lines 200000] [--repeat 5]
+
+Compares ``irc_parser.parse_line`` with the split-based PRIVMSG handling the
+bot used before the parser module existed.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import irc_parser  # noqa: E402
+from chatlog import load_chat_log, synthetic_chat_lines  # noqa: E402
+
+
+def legacy_parse(line: str):
+    if line.startswith("PING"):
+        return ("PING", None, None, None)
+    if "PRIVMSG" not in line:
+        return None
+    tags_part = None
+    rest = line
+    if line.startswith("@"):
+        tags_part, rest = line.split(" ", 1)
+    parts = rest.split(" :", 1)
+    prefix_and_cmd = parts[0]
+    message_text = parts[1] if len(parts) > 1 else ""
+    prefix = prefix_and_cmd.split(" ")[0]
+    if prefix.startswith(":"):
+        sender = prefix[1:].split("!")[0]
+    else:
+        sender = "unknown"
+    display_name = sender
+    emotes_tag = ""
+    if tags_part:
+        tags = {}
+        for kv in tags_part[1:].split(";"):
+            if "=" in kv:
+                k, v = kv.split("=", 1)
+                tags[k] = v
+        display_name = tags.get("display-name", sender)
+        emotes_tag = tags.get("emotes", "")
+    return ("PRIVMSG", sender, display_name, emotes_tag, message_text)
+
+
+def new_parse(line: str):
+    msg = irc_parser.parse_line(line)
+    if msg is None:
+        return None
+    if msg.command == "PING":
+        return ("PING", None, None, None)
+    if msg.command != "PRIVMSG":
+        return None
+    sender = msg.nick or "unknown"
+    return ("PRIVMSG", sender, msg.display_name or sender, msg.emotes, msg.text or "")
+
+
+def run(fn, lines, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            fn(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--log", help="recorded chat log (raw IRC lines); synthetic if omitted")
+    ap.add_argument("--lines", type=int, default=200_000, help="synthetic log size")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    lines = load_chat_log(args.log) if args.log else list(synthetic_chat_lines(args.lines))
+    legacy_privmsg = sum(1 for line in lines if (legacy_parse(line) or ("",))[0] == "PRIVMSG")
+    new_privmsg = sum(1 for line in lines if (new_parse(line) or ("",))[0] == "PRIVMSG")
+    print(f"{len(lines)} lines ({'recorded' if args.log else 'synthetic'})")
+    print(f"PRIVMSG detected: legacy {legacy_privmsg}, parser {new_privmsg}")
+
+    legacy_rate = run(legacy_parse, lines, args.repeat)
+    new_rate = run(new_parse, lines, args.repeat)
+    print(f"legacy split parser : {legacy_rate:12,.0f} lines/s")
+    print(f"irc_parser          : {new_rate:12,.0f} lines/s  ({new_rate / legacy_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
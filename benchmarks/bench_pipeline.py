@@ -0,0 +1,254 @@
+"""Replay chat through the real TTS pipeline offline and report latency and throughput.
+
+    python benchmarks/bench_pipeline.py [--log chat.log] [--messages 2000] [--rate 20]
+        [--raid-every 30 --raid-size 300 --raid-duration 3] [--synth-ms 250]
+        [--set TTS_WORKERS=6 --set TTS_BATCH_SIZE=4]
+
+A local IRC server replays a recorded or synthetic chat log (with optional raid
+bursts), ``edge_tts`` is replaced by a stub engine with configurable latency and
+output size, and the bot's own ``tts_gen_worker``/``tts_playback_worker`` run
+against a null audio sink (or any ``PLAYBACK_SINK`` given with ``--set``, e.g. to
+time recording and stream outputs). Latencies come from the bot's per-stage metrics.
+Nothing touches the network.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from chatlog import load_chat_log, synthetic_chat_lines  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# One MPEG-2 Layer III frame, 24 kHz / 48 kbps mono like Edge-TTS output: 144 bytes, 24 ms.
+_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC4]) + bytes(140)
+_FRAME_SEC = 576 / 24000
+_TICKS = 10_000_000
+_TS_RE = re.compile(r"(?:^@|;)tmi-sent-ts=(\d+)")
+_CHANNEL_RE = re.compile(r" (PRIVMSG|USERNOTICE) #[^ ]+")
+
+
+def make_stub_engine(synth_ms: float, jitter: float, ms_per_char: float, seed: int = 7):
+    """A stand-in ``edge_tts`` module whose Communicate sleeps, then returns silent frames."""
+    rng = random.Random(seed)
+    stats = {"requests": 0, "chars": 0}
+
+    class Communicate:
+        def __init__(self, text, voice="", rate="+0%", pitch="+0Hz", boundary="SentenceBoundary", **kwargs):
+            self.text = text
+            self.boundary = boundary
+
+        async def stream(self):
+            stats["requests"] += 1
+            stats["chars"] += len(self.text)
+            delay = synth_ms / 1000.0 * max(0.0, 1.0 + rng.uniform(-jitter, jitter))
+            await asyncio.sleep(delay)
+            offset = 0
+            for word in self.text.split():
+                frames = max(1, int(len(word) * ms_per_char / 1000.0 / _FRAME_SEC) + 2)
+                if self.boundary == "WordBoundary":
+                    yield {"type": "WordBoundary", "offset": offset,
+                           "duration": int((frames - 2) * _FRAME_SEC * _TICKS), "text": word}
+                yield {"type": "audio", "data": _FRAME * frames}
+                offset += int(frames * _FRAME_SEC * _TICKS)
+
+    module = types.ModuleType("edge_tts")
+    module.Communicate = Communicate
+    module.stats = stats
+    return module
+
+
+def _sent_ts(line: str):
+    m = _TS_RE.search(line)
+    return int(m.group(1)) if m else None
+
+
+def build_schedule(lines, channel: str, speed: float = 1.0, rate: float = 20.0):
+    """``(offset_sec, line)`` pairs; tmi-sent-ts sets the pace, otherwise ``rate`` lines/s."""
+    schedule = []
+    first = None
+    last = 0.0
+    for i, line in enumerate(lines):
+        ts = _sent_ts(line)
+        if ts is not None:
+            first = ts if first is None else first
+            last = (ts - first) / 1000.0 / speed
+        elif first is None:
+            last = i / rate
+        schedule.append((last, _CHANNEL_RE.sub(lambda m: f" {m.group(1)} #{channel}", line, count=1)))
+    return schedule
+
+
+def raid_lines(channel: str, start_sec: float, size: int, duration: float, seed: int):
+    base_ms = 1_700_000_000_000
+    lines = synthetic_chat_lines(size, channel=channel, seed=seed, users=size,
+                                 start_ts_ms=base_ms, rate_per_sec=size / max(duration, 0.001))
+    return [(start_sec + ((_sent_ts(line) or base_ms) - base_ms) / 1000.0, line) for line in lines]
+
+
+async def serve_replay(schedule, drain_sec: float):
+    """Start an IRC server that replays ``schedule`` to the first client once it has joined."""
+    async def handle(reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line or line.startswith(b"JOIN"):
+                    break
+            start = time.monotonic()
+            for offset, line in schedule:
+                wait = start + offset - time.monotonic()
+                if wait > 0:
+                    await writer.drain()
+                    await asyncio.sleep(wait)
+                writer.write(line.encode() + b"\r\n")
+            await writer.drain()
+            await asyncio.sleep(drain_sec)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def _percentiles(values, qs=(0.5, 0.9, 0.99)):
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in qs}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def run_bench(bot, args, schedule):
+    bot.init_tts_engine()
+    conf = bot.ChannelConfig(args.channel)
+    pipeline = bot.ChannelPipeline(conf)
+    pipeline.engine.realtime = args.realtime
+    bot._register_gauges([pipeline])
+
+    server, port = await serve_replay(schedule, args.drain)
+    await pipeline.start()
+    started = time.monotonic()
+    try:
+        await bot.anonymous_irc_reader({pipeline.channel: pipeline}, server="127.0.0.1", port=port)
+        await pipeline.text_queue.join()
+        await pipeline.audio_queue.join()
+        await pipeline.engine.drain()
+    finally:
+        server.close()
+        await pipeline.stop()
+    return pipeline, time.monotonic() - started
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--log", help="recorded chat log (raw IRC lines); synthetic if omitted")
+    ap.add_argument("--messages", type=int, default=2000, help="synthetic log size")
+    ap.add_argument("--rate", type=float, default=20.0, help="synthetic chat lines per second")
+    ap.add_argument("--speed", type=float, default=1.0, help="replay speed multiplier for tmi-sent-ts")
+    ap.add_argument("--raid-every", type=float, default=0.0, help="seconds between raid bursts (0 = none)")
+    ap.add_argument("--raid-size", type=int, default=300, help="messages per raid burst")
+    ap.add_argument("--raid-duration", type=float, default=3.0, help="seconds a raid burst lasts")
+    ap.add_argument("--synth-ms", type=float, default=250.0, help="stub engine latency per request")
+    ap.add_argument("--jitter", type=float, default=0.3, help="+/- fraction of random latency jitter")
+    ap.add_argument("--ms-per-char", type=float, default=65.0, help="stub audio length per character")
+    ap.add_argument("--realtime", action="store_true", help="pace the null sink at real playback speed")
+    ap.add_argument("--drain", type=float, default=1.0, help="seconds the server stays up after the log")
+    ap.add_argument("--channel", default="benchchannel")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                    help="config.txt setting for the run (repeatable)")
+    ap.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slower)")
+    ap.add_argument("--verbose", action="store_true")
+    args = ap.parse_args()
+
+    if args.log:
+        schedule = build_schedule(load_chat_log(args.log), args.channel, args.speed, args.rate)
+    else:
+        lines = list(synthetic_chat_lines(args.messages, channel=args.channel, rate_per_sec=args.rate))
+        schedule = build_schedule(lines, args.channel, args.speed, args.rate)
+    if args.raid_every > 0 and schedule:
+        end = schedule[-1][0]
+        t = args.raid_every
+        while t < end:
+            schedule.extend(raid_lines(args.channel, t, args.raid_size, args.raid_duration, seed=int(t)))
+            t += args.raid_every
+        schedule.sort(key=lambda item: item[0])
+    chat_lines = sum(1 for _, line in schedule if " PRIVMSG " in line)
+
+    # The bot reads config.txt from the working directory at import, so each
+    # run gets its own scratch directory and a config built from the flags.
+    workdir = tempfile.mkdtemp(prefix="tts_bench_")
+    settings = {"CHANNEL_NAME": args.channel, "PLAYBACK_SINK": "null", "TTS_CACHE_MB": "0",
+                "ATTENUATION_DELAY_MS": "0", "EDGE_SESSIONS_PER_VOICE": "0"}
+    for item in args.set:
+        key, _, value = item.partition("=")
+        settings[key.strip()] = value.strip()
+    with open(os.path.join(workdir, "config.txt"), "w", encoding="utf-8") as f:
+        f.writelines(f"{k}={v}\n" for k, v in settings.items())
+    os.chdir(workdir)
+
+    stub = make_stub_engine(args.synth_ms, args.jitter, args.ms_per_char)
+    sys.modules["edge_tts"] = stub
+    import Twitch_TTS as bot
+    import tts_metrics
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    bot._metrics = tts_metrics.Metrics(window=len(schedule) + 1)
+
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    try:
+        pipeline, elapsed = asyncio.run(run_bench(bot, args, schedule))
+    finally:
+        os.chdir(BENCH_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    heap_peak = None
+    if args.tracemalloc:
+        heap_peak = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.stop()
+
+    spoken = bot._metrics.counters[("messages_spoken", pipeline.channel)]
+    received = bot._metrics.counters[("messages_received", pipeline.channel)]
+    print(f"{chat_lines} chat lines over {schedule[-1][0] if schedule else 0:.1f}s "
+          f"({'recorded' if args.log else 'synthetic'}"
+          f"{f', raids of {args.raid_size} every {args.raid_every:g}s' if args.raid_every > 0 else ''})")
+    print(f"stub engine: {args.synth_ms:g} ms +/-{args.jitter:.0%}, {stub.stats['requests']} requests, "
+          f"{stub.stats['chars']} chars")
+    print(f"received {received}, spoken {spoken}, dropped "
+          f"{sum(pipeline.text_queue.dropped.values())} {dict(pipeline.text_queue.dropped) or ''}")
+    print(f"throughput: {spoken / elapsed:.1f} msgs/s over {elapsed:.1f}s")
+    for stage in ("queue_wait", "synthesis", "first_audio", "end_to_end"):
+        hist = bot._metrics.histograms.get((stage, pipeline.channel))
+        if hist is None or not hist.count:
+            continue
+        pct = _percentiles(hist.recent)
+        print(f"{stage:<12}: p50 {pct[0.5] * 1000:8.1f} ms   p90 {pct[0.9] * 1000:8.1f} ms   "
+              f"p99 {pct[0.99] * 1000:8.1f} ms   max {max(hist.recent) * 1000:8.1f} ms")
+    rss = _peak_rss_mb()
+    if rss is not None:
+        print(f"peak RSS: {rss:.1f} MB")
+    if heap_peak is not None:
+        print(f"peak Python heap: {heap_peak:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
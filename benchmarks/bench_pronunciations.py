@@ -0,0 +1,84 @@
+"""Measure per-message cost of the pronunciation dictionary as it grows.
+
+    python benchmarks/bench_pronunciations.py [--log chat.log] [--lines 20000] [--sizes 2,100,1000,10000]
+
+Compares one ``re.sub`` per entry (how the two built-in replacements used to be
+applied) with the single trie-shaped pattern from ``pronunciations``.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import irc_parser  # noqa: E402
+import pronunciations  # noqa: E402
+from chatlog import load_chat_log, synthetic_chat_lines  # noqa: E402
+
+
+def make_entries(size: int, seed: int = 3) -> dict:
+    rng = random.Random(seed)
+    entries = {"nya": "ニャ", "nani": "何"}
+    letters = "abcdefghijklmnopqrstuvwxyz_0123456789"
+    while len(entries) < size:
+        word = "".join(rng.choice(letters) for _ in range(rng.randint(3, 14)))
+        entries[word] = word.upper()
+    return entries
+
+
+def per_entry(entries: dict):
+    patterns = [(re.compile(rf"\b{re.escape(k)}\b", re.IGNORECASE), v) for k, v in entries.items()]
+
+    def apply(text):
+        for pattern, value in patterns:
+            text = pattern.sub(value, text)
+        return text
+    return apply
+
+
+def single_pass(entries: dict):
+    d = pronunciations.PronunciationDict(None, defaults=entries, check_interval=3600)
+    return d.apply
+
+
+def run(fn, texts, budget: float = 2.0):
+    start = time.perf_counter()
+    done = 0
+    while done < len(texts):
+        fn(texts[done])
+        done += 1
+        if time.perf_counter() - start > budget:
+            break
+    return (time.perf_counter() - start) / done * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--log", help="recorded chat log (raw IRC lines); synthetic if omitted")
+    ap.add_argument("--lines", type=int, default=20_000)
+    ap.add_argument("--sizes", default="2,100,1000,10000")
+    args = ap.parse_args()
+
+    lines = load_chat_log(args.log) if args.log else list(synthetic_chat_lines(args.lines))
+    texts = []
+    for line in lines:
+        msg = irc_parser.parse_line(line)
+        if msg is not None and msg.command == "PRIVMSG" and msg.text:
+            texts.append(msg.text)
+    print(f"{len(texts)} messages")
+    print(f"{'entries':>8} {'per-entry re.sub':>18} {'single pass':>14}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        entries = make_entries(size)
+        started = time.perf_counter()
+        single = single_pass(entries)
+        compile_ms = (time.perf_counter() - started) * 1000
+        legacy_us = run(per_entry(entries), texts)
+        single_us = run(single, texts)
+        print(f"{size:>8} {legacy_us:>15.1f} us {single_us:>11.1f} us   (compiled in {compile_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Chat log helpers shared by the benchmarks.
+
+A chat log is a text file of raw IRC lines exactly as received from Twitch
+(one per line, tags included). When no recorded log is available a
+deterministic synthetic one is generated with the same shape.
+"""
+import random
+import uuid
+
+_WORDS = (
+    "gg lol W L pog kekw based true nah yeah lets go clip it chat is this real "
+    "that was insane no way bro what how did you hit that shot again "
+    "first time here love the stream hello from germany any tips for this boss "
+    "もう一回 すごい かわいい ナイス おつかれ こんにちは"
+).split()
+_EMOTES = ("Kappa", "LUL", "PogChamp", "Kreygasm", "BibleThump", "4Head")
+_EMOTE_IDS = {"Kappa": "25", "LUL": "425618", "PogChamp": "305954156", "Kreygasm": "41", "BibleThump": "86", "4Head": "354"}
+_BADGES = ("", "subscriber/12", "subscriber/3,premium/1", "moderator/1", "vip/1", "broadcaster/1", "bits/1000")
+_COPYPASTA = "I am once again asking chat to please stop spamming the same message over and over"
+
+
+def _escape_tag(value: str) -> str:
+    return value.replace("\\", "\\\\").replace(";", "\\:").replace(" ", "\\s")
+
+
+def privmsg_line(channel: str, nick: str, text: str, display_name: str = None,
+                 badges: str = "", bits: str = "", sent_ts: int = 0, emotes: str = "",
+                 rng: random.Random = None) -> str:
+    rng = rng or random
+    tags = [
+        ("badge-info", "subscriber/12" if "subscriber" in badges else ""),
+        ("badges", badges),
+        ("color", "#%06X" % rng.randrange(0x1000000)),
+        ("display-name", _escape_tag(display_name or nick)),
+        ("emotes", emotes),
+        ("first-msg", "0"),
+        ("flags", ""),
+        ("id", str(uuid.UUID(int=rng.getrandbits(128)))),
+        ("mod", "1" if "moderator" in badges else "0"),
+        ("returning-chatter", "0"),
+        ("room-id", "12345678"),
+        ("subscriber", "1" if "subscriber" in badges else "0"),
+        ("tmi-sent-ts", str(sent_ts)),
+        ("turbo", "0"),
+        ("user-id", str(rng.randrange(10**7, 10**9))),
+        ("user-type", "mod" if "moderator" in badges else ""),
+    ]
+    if bits:
+        tags.insert(2, ("bits", bits))
+    tag_str = ";".join(f"{k}={v}" for k, v in tags)
+    return f"@{tag_str} :{nick}!{nick}@{nick}.tmi.twitch.tv PRIVMSG #{channel} :{text}"
+
+
+def synthetic_chat_lines(count: int, channel: str = "benchchannel", seed: int = 1,
+                         users: int = 300, start_ts_ms: int = 1_700_000_000_000,
+                         rate_per_sec: float = 20.0):
+    """Yield ``count`` raw IRC lines resembling a busy channel, including PINGs,
+    emotes, bits, escaped display names and copypasta bursts."""
+    rng = random.Random(seed)
+    nicks = [f"viewer_{i:04d}" for i in range(users)]
+    ts = float(start_ts_ms)
+    for i in range(count):
+        ts += rng.expovariate(rate_per_sec) * 1000.0
+        if i and i % 500 == 0:
+            yield "PING :tmi.twitch.tv"
+            continue
+        if i % 97 == 0:
+            yield f":tmi.twitch.tv USERNOTICE #{channel} :PRIVMSG spoofed in a notice body"
+            continue
+        nick = rng.choice(nicks)
+        display = nick.replace("_", " ") if i % 53 == 0 else nick.capitalize()
+        if rng.random() < 0.08:
+            text = _COPYPASTA
+        else:
+            text = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(1, 14)))
+        emotes = ""
+        if rng.random() < 0.3:
+            emote = rng.choice(_EMOTES)
+            start = len(text) + 1
+            text = f"{text} {emote}"
+            emotes = f"{_EMOTE_IDS[emote]}:{start}-{start + len(emote) - 1}"
+        bits = ""
+        if rng.random() < 0.02:
+            bits = str(rng.choice((100, 500, 1000)))
+            text = f"Cheer{bits} {text}"
+        yield privmsg_line(channel, nick, text, display_name=display, badges=rng.choice(_BADGES),
+                           bits=bits, sent_ts=int(ts), emotes=emotes, rng=rng)
+
+
+def load_chat_log(path: str):
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return [line.rstrip("\r\n") for line in f if line.strip()]
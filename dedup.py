@@ -0,0 +1,156 @@
+"""Spot repeated and near-identical chat messages within a sliding time window.
+
+Text is normalized (case, punctuation, repeated words and stretched letters)
+and looked up by exact hash. Messages long enough to sketch also get a 32-bin
+MinHash signature of their character 4-grams (one-permutation hashing: every
+4-gram is hashed once and kept only if it is the smallest in its bin). Those
+signatures are indexed in bands of two bins, so candidates are found without
+comparing against every earlier message. Only candidates sharing a few bands
+are compared, and one counts as a copy when enough bins agree. Entries expire
+``window_sec`` after they were last repeated, and there are never more than
+``max_entries`` of them. Once a message has been taken to be read, copies of
+it no longer extend its window, so a phrase chat keeps repeating ("gg") is
+read again every ``window_sec`` rather than never.
+"""
+import re
+import time
+from collections import Counter, OrderedDict
+
+_WORD_RE = re.compile(r"\w+")
+_STRETCH_RE = re.compile(r"(.)\1{2,}")
+_GRAM = 4
+_BINS = 32
+_BAND_ROWS = 2
+_MIN_BAND_HITS = 3
+_MASK64 = (1 << 64) - 1
+MAX_SKETCH_CHARS = 500
+MAX_USERS = 1000
+
+
+def normalize(text: str) -> str:
+    words = _WORD_RE.findall(_STRETCH_RE.sub(r"\1\1", text.casefold()))
+    out = []
+    for word in words:
+        if not out or out[-1] != word:
+            out.append(word)
+    return " ".join(out)
+
+
+def signature(normalized: str) -> tuple:
+    """MinHash signature; empty bins are None."""
+    text = normalized[:MAX_SKETCH_CHARS]
+    sig = [None] * _BINS
+    for i in range(len(text) - _GRAM + 1):
+        h = hash(text[i:i + _GRAM]) & _MASK64
+        b = h % _BINS
+        v = h // _BINS
+        if sig[b] is None or v < sig[b]:
+            sig[b] = v
+    return tuple(sig)
+
+
+def similarity(a: tuple, b: tuple) -> float:
+    """Estimated Jaccard similarity of the 4-gram sets behind two signatures."""
+    same = used = 0
+    for x, y in zip(a, b):
+        if x is None and y is None:
+            continue
+        used += 1
+        same += x == y
+    return same / used if used else 1.0
+
+
+def _bands(sig: tuple):
+    for i in range(0, _BINS, _BAND_ROWS):
+        band = sig[i:i + _BAND_ROWS]
+        if any(v is not None for v in band):
+            yield (i, band)
+
+
+class DuplicateEntry:
+    __slots__ = ("key", "sig", "users", "hits", "last_seen", "item", "claimed")
+
+    def __init__(self, key, sig, user, now):
+        self.key = key
+        self.sig = sig
+        self.users = {user}
+        self.hits = 1
+        self.last_seen = now
+        # The latest message of the copies that was queued, and whether a
+        # worker has already taken it.
+        self.item = None
+        self.claimed = False
+
+
+class DuplicateFilter:
+    def __init__(self, window_sec: float = 30.0, max_entries: int = 2000,
+                 threshold: float = 0.7, min_chars: int = 20):
+        self.window = max(0.0, float(window_sec))
+        self.max_entries = max(1, int(max_entries))
+        self.threshold = float(threshold)
+        self.min_chars = max(_GRAM, int(min_chars))
+        self._entries = OrderedDict()
+        self._index = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, entry: DuplicateEntry):
+        del self._entries[entry.key]
+        if entry.sig is not None:
+            for band in _bands(entry.sig):
+                bucket = self._index.get(band)
+                if bucket is not None:
+                    bucket.discard(entry)
+                    if not bucket:
+                        del self._index[band]
+
+    def _expire(self, now: float):
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if now - oldest.last_seen <= self.window and len(self._entries) <= self.max_entries:
+                break
+            self._remove(oldest)
+
+    def _similar(self, sig: tuple):
+        # Messages sharing a few common 4-grams collide in a band or two;
+        # real copies share about half of them, so only those are compared.
+        hits = Counter()
+        for band in _bands(sig):
+            hits.update(self._index.get(band, ()))
+        best, best_score = None, self.threshold
+        for entry, count in hits.items():
+            if count < _MIN_BAND_HITS:
+                continue
+            score = similarity(sig, entry.sig)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def check(self, text: str, user: str = "", now: float = None):
+        """Return ``(entry, is_new)``. Repeats update and return the entry they matched."""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        normalized = normalize(text) or " ".join(text.casefold().split())
+        key = hash(normalized)
+        entry = self._entries.get(key)
+        sig = None
+        if entry is None and len(normalized) >= self.min_chars:
+            sig = signature(normalized)
+            entry = self._similar(sig)
+        if entry is not None:
+            entry.hits += 1
+            if len(entry.users) < MAX_USERS:
+                entry.users.add(user)
+            if not entry.claimed:
+                entry.last_seen = now
+                self._entries.move_to_end(entry.key)
+            return entry, False
+
+        entry = DuplicateEntry(key, sig, user, now)
+        self._entries[key] = entry
+        if sig is not None:
+            for band in _bands(sig):
+                self._index.setdefault(band, set()).add(entry)
+        self._expire(now)
+        return entry, True
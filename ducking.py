@@ -0,0 +1,395 @@
+"""Turning other applications down while TTS speaks.
+
+A ``DuckingBackend`` lists the platform's audio sessions and reads and sets
+their volumes: ``PycawBackend`` on Windows, and ``FakeBackend`` anywhere, for
+benchmarks and for checking fades without touching real volumes.
+
+A ``Ducker`` owns one backend and one thread, and every backend call happens
+on that thread (pycaw's COM objects must stay on the thread that made them).
+Sessions are kept in an index: each one is opened once, and the session list
+is refreshed at most every ``refresh_sec``, opening only sessions not seen
+before. All fades run from a single timer that only ticks while a volume is
+moving.
+
+A session remembers its volume from before it was first ducked, and a
+restore fades back to it. A duck that arrives during a restore fades down
+again from wherever the volume is at that moment, so nothing jumps and the
+remembered volume is never replaced by a half-restored one.
+"""
+import concurrent.futures
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class DuckingBackend:
+    """Audio sessions of one platform. Only ever called from the ducker's thread."""
+
+    name = "none"
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def enumerate(self) -> dict:
+        """``{key: (pid, process name, source)}`` for the current sessions.
+
+        ``source`` is handed to ``open()`` the first time a key is seen.
+        """
+        raise NotImplementedError
+
+    def open(self, source):
+        """Volume handle for a session, kept for as long as the session exists."""
+        return source
+
+    def get_volume(self, handle) -> float:
+        raise NotImplementedError
+
+    def set_volume(self, handle, volume: float):
+        raise NotImplementedError
+
+
+class PycawBackend(DuckingBackend):
+    """Per-application volumes on Windows through pycaw."""
+
+    name = "pycaw"
+
+    def __init__(self):
+        import comtypes
+        from pycaw.pycaw import AudioUtilities, ISimpleAudioVolume
+        self._comtypes = comtypes
+        self._utilities = AudioUtilities
+        self._volume_interface = ISimpleAudioVolume
+        # pid -> process name, so only new processes are looked up.
+        self._names = {}
+
+    def start(self):
+        self._comtypes.CoInitialize()
+
+    def enumerate(self):
+        found = {}
+        names = {}
+        for session in self._utilities.GetAllSessions():
+            try:
+                pid = session.ProcessId
+                if not pid:
+                    continue
+                name = self._names.get(pid)
+                if name is None:
+                    process = session.Process
+                    name = (process.name() if process else "").lower()
+                names[pid] = name
+                found[session._ctl.GetSessionInstanceIdentifier()] = (pid, name, session)
+            except Exception:
+                continue
+        self._names = names
+        return found
+
+    def open(self, session):
+        return session._ctl.QueryInterface(self._volume_interface)
+
+    def get_volume(self, handle):
+        return float(handle.GetMasterVolume())
+
+    def set_volume(self, handle, volume):
+        handle.SetMasterVolume(float(volume), None)
+
+
+class FakeBackend(DuckingBackend):
+    """Sessions kept in memory.
+
+    Every call takes ``call_sec`` (listing takes it once per session), like a
+    slow audio API. ``calls`` counts calls by method and ``history`` records
+    ``(monotonic time, key, volume)`` for every volume set.
+    """
+
+    name = "fake"
+
+    def __init__(self, sessions: dict = None, call_sec: float = 0.0):
+        self.call_sec = float(call_sec)
+        self.calls = Counter()
+        self.history = []
+        self._lock = threading.Lock()
+        self._sessions = {}
+        for key, (pid, name, volume) in (sessions or {}).items():
+            self.add(key, pid, name, volume)
+
+    def add(self, key, pid: int, name: str, volume: float = 1.0):
+        with self._lock:
+            self._sessions[key] = [pid, name.lower(), float(volume)]
+
+    def remove(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def volume(self, key) -> float:
+        with self._lock:
+            return self._sessions[key][2]
+
+    def _call(self, method: str, cost: int = 1):
+        self.calls[method] += 1
+        if self.call_sec:
+            time.sleep(self.call_sec * cost)
+
+    def enumerate(self):
+        self._call("enumerate", max(1, len(self._sessions)))
+        with self._lock:
+            return {key: (pid, name, key) for key, (pid, name, _) in self._sessions.items()}
+
+    def open(self, key):
+        self._call("open")
+        return key
+
+    def get_volume(self, key):
+        self._call("get_volume")
+        with self._lock:
+            # KeyError once the session is gone, like a real backend failing.
+            return self._sessions[key][2]
+
+    def set_volume(self, key, volume):
+        self._call("set_volume")
+        with self._lock:
+            self._sessions[key][2] = float(volume)
+        self.history.append((time.monotonic(), key, float(volume)))
+
+
+def make_backend():
+    """The platform's backend, or None when ducking isn't available here."""
+    if not sys.platform.startswith("win"):
+        return None
+    try:
+        return PycawBackend()
+    except Exception as e:
+        logging.debug(f"pycaw unavailable: {e}")
+        return None
+
+
+class _Session:
+    __slots__ = ("key", "pid", "name", "handle", "original", "value", "start", "target", "t0", "duration")
+
+    def __init__(self, key, pid, name, handle):
+        self.key = key
+        self.pid = pid
+        self.name = name
+        self.handle = handle
+        self.original = self.value = self.start = self.target = None
+        self.t0 = 0.0
+        self.duration = 0.0
+
+    def fade_to(self, target: float, now: float, duration: float):
+        self.start = self.value
+        self.target = target
+        self.t0 = now
+        self.duration = duration
+
+
+class Ducker:
+    def __init__(self, backend: DuckingBackend, tick_sec: float = 0.01, refresh_sec: float = 5.0):
+        self.backend = backend
+        self.tick = max(0.001, float(tick_sec))
+        self.refresh_sec = max(0.0, float(refresh_sec))
+        # refreshes, sessions_opened, ticks, volume_sets, session_errors
+        self.stats = Counter()
+        self.max_tick_lag = 0.0
+        self._index = {}
+        self._refreshed = None
+        # Sessions away from their original volume, or fading back to it.
+        self._ducked = {}
+        # (factor, excluded pids, excluded names, fade seconds) while ducking.
+        self._duck = None
+        self._future = None
+        self._commands = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+
+    @property
+    def ducked(self) -> bool:
+        return bool(self._ducked)
+
+    def duck(self, factor: float, duration_sec: float, exclude_pids=(), exclude_names=()):
+        """Fade every other session to ``factor`` of its volume.
+
+        Returns a ``concurrent.futures.Future``: True once the fade is done,
+        False if a later call took over first.
+        """
+        spec = (max(0.0, min(1.0, float(factor))), set(exclude_pids), {n.lower() for n in exclude_names},
+                max(0.0, float(duration_sec)))
+        return self._submit(self._start_duck, spec)
+
+    def restore(self, duration_sec: float):
+        """Fade ducked sessions back to their original volume. Returns a future like ``duck()``."""
+        return self._submit(self._start_restore, max(0.0, float(duration_sec)))
+
+    def close(self, timeout: float = 2.0):
+        """Put ducked sessions straight back to their original volume and stop the thread."""
+        with self._cond:
+            self._closing = True
+            thread = self._thread
+            self._cond.notify()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _submit(self, start, arg):
+        future = concurrent.futures.Future()
+        with self._cond:
+            if self._closing:
+                future.set_result(False)
+                return future
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ducking", daemon=True)
+                self._thread.start()
+            self._commands.append((start, arg, future))
+            self._cond.notify()
+        return future
+
+    # --- everything below runs on the ducking thread ---
+    def _run(self):
+        try:
+            self.backend.start()
+        except Exception as e:
+            logging.warning(f"Ducking backend '{self.backend.name}' failed to start: {e}")
+        next_tick = None
+        while True:
+            with self._cond:
+                while not (self._commands or self._closing):
+                    now = time.monotonic()
+                    if next_tick is not None:
+                        timeout = next_tick - now
+                    elif self._duck is not None and self.refresh_sec:
+                        # Held down: look for sessions that appeared meanwhile.
+                        timeout = self._refreshed + self.refresh_sec - now
+                    else:
+                        timeout = None
+                    if timeout is not None and timeout <= 0:
+                        break
+                    self._cond.wait(timeout)
+                commands, self._commands = self._commands, []
+                closing = self._closing
+            if closing:
+                self._snap_back()
+                break
+            now = time.monotonic()
+            for start, arg, future in commands:
+                start(arg, future, now)
+            if self._duck is not None and self._stale(now):
+                self._enlist(self._refresh(now), now)
+            if next_tick is not None:
+                lag = now - next_tick
+                if lag > self.max_tick_lag:
+                    self.max_tick_lag = lag
+            moving = self._step(time.monotonic())
+            if moving:
+                next_tick = (next_tick + self.tick) if next_tick is not None and now - next_tick < self.tick else now + self.tick
+            else:
+                next_tick = None
+        try:
+            self.backend.stop()
+        except Exception:
+            pass
+
+    def _stale(self, now: float) -> bool:
+        return self._refreshed is None or now - self._refreshed >= self.refresh_sec
+
+    def _refresh(self, now: float) -> list:
+        self._refreshed = now
+        self.stats["refreshes"] += 1
+        try:
+            current = self.backend.enumerate()
+        except Exception as e:
+            logging.debug(f"Could not list audio sessions: {e}")
+            return []
+        for key in [k for k in self._index if k not in current]:
+            del self._index[key]
+            self._ducked.pop(key, None)
+        added = []
+        for key, (pid, name, source) in current.items():
+            if key in self._index:
+                continue
+            try:
+                handle = self.backend.open(source)
+            except Exception:
+                continue
+            session = self._index[key] = _Session(key, pid, name, handle)
+            self.stats["sessions_opened"] += 1
+            added.append(session)
+        return added
+
+    def _drop(self, session: _Session):
+        self.stats["session_errors"] += 1
+        self._index.pop(session.key, None)
+        self._ducked.pop(session.key, None)
+
+    def _settle(self, result: bool):
+        future, self._future = self._future, None
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def _enlist(self, sessions, now: float):
+        factor, exclude_pids, exclude_names, duration = self._duck
+        for session in sessions:
+            if session.pid in exclude_pids or session.name in exclude_names:
+                continue
+            if session.key not in self._ducked:
+                try:
+                    session.original = session.value = self.backend.get_volume(session.handle)
+                except Exception:
+                    self._drop(session)
+                    continue
+                self._ducked[session.key] = session
+            session.fade_to(session.original * factor, now, duration)
+
+    def _start_duck(self, spec, future, now: float):
+        self._settle(False)
+        self._future = future
+        self._duck = spec
+        if self._refreshed is None:
+            self._refresh(now)
+        # Cached sessions start fading right away; a refresh that is due only
+        # adds the sessions it finds (see _run).
+        self._enlist(list(self._index.values()), now)
+
+    def _start_restore(self, duration: float, future, now: float):
+        self._settle(False)
+        self._future = future
+        self._duck = None
+        for session in self._ducked.values():
+            session.fade_to(session.original, now, duration)
+
+    def _step(self, now: float) -> bool:
+        """Move every fading session one tick; returns True while any is still moving."""
+        self.stats["ticks"] += 1
+        moving = False
+        for session in list(self._ducked.values()):
+            if session.value == session.target:
+                continue
+            progress = 1.0 if session.duration <= 0 else min(1.0, (now - session.t0) / session.duration)
+            value = session.target if progress >= 1.0 else session.start + (session.target - session.start) * progress
+            try:
+                self.backend.set_volume(session.handle, value)
+            except Exception:
+                self._drop(session)
+                continue
+            self.stats["volume_sets"] += 1
+            session.value = value
+            moving = moving or progress < 1.0
+        if not moving:
+            if self._duck is None:
+                # Fully restored: originals are read afresh at the next duck.
+                self._ducked.clear()
+            self._settle(True)
+        return moving
+
+    def _snap_back(self):
+        self._duck = None
+        for session in list(self._ducked.values()):
+            try:
+                self.backend.set_volume(session.handle, session.original)
+            except Exception:
+                continue
+        self._ducked.clear()
+        self._settle(False)
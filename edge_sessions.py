@@ -0,0 +1,368 @@
+"""Warm, reusable Edge TTS websocket sessions.
+
+``edge_tts.Communicate`` opens a new TLS websocket for every utterance: TCP
+and TLS handshakes, the websocket upgrade and ``speech.config``, all before
+the first audio byte. A ``SessionPool`` keeps up to ``size`` of those
+connections open per voice, already configured. It sends each request over an
+idle one and takes it back after ``turn.end``, so requests on one connection
+run one after another.
+
+Idle connections are pinged every ``ping_sec`` and replaced when they have
+gone away; lost ones are reopened in the background, so the handshake stays
+off the message path. A request that fails on a reused connection before any
+audio arrives is retried once on a fresh one. If that keeps happening on
+connections that already served a turn (``single_turn_after`` times in a row),
+the service is taken to close connections after each turn and every request
+gets a fresh one. Reuse is tried again after ``single_turn_retry_sec``.
+
+Events are the same dicts ``Communicate.stream()`` yields. The module relies
+on edge-tts internals (URL, headers, DRM token, text splitting); ``AVAILABLE``
+is False when the installed version does not have them.
+"""
+import asyncio
+import json
+import logging
+import ssl
+import time
+import uuid
+from collections import Counter, deque
+from xml.sax.saxutils import escape, unescape
+
+try:
+    import aiohttp
+    from edge_tts.communicate import remove_incompatible_characters, split_text_by_byte_length
+    from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+    from edge_tts.drm import DRM
+    AVAILABLE = True
+except ImportError:
+    aiohttp = None
+    WSS_URL = ""
+    AVAILABLE = False
+
+try:
+    import certifi
+    _SSL_CTX = ssl.create_default_context(cafile=certifi.where())
+except ImportError:
+    _SSL_CTX = ssl.create_default_context()
+
+MAX_TEXT_BYTES = 4096
+# Offsets are in 100 ns ticks; the output is 48 kbps CBR MP3.
+_TICKS_PER_SECOND = 10_000_000
+_BITRATE = 48_000
+
+
+class SessionError(Exception):
+    pass
+
+
+def _timestamp() -> str:
+    return time.strftime("%a %b %d %Y %H:%M:%S GMT+0000 (Coordinated Universal Time)", time.gmtime())
+
+
+def _split_message(data: bytes, header_length: int):
+    headers = {}
+    for line in data[:header_length].split(b"\r\n"):
+        if b":" in line:
+            key, value = line.split(b":", 1)
+            headers[key] = value
+    return headers, data[header_length + 2:]
+
+
+class EdgeSession:
+    """One open websocket to the Edge read-aloud service."""
+
+    def __init__(self, url: str, boundary: str = None, connect_timeout: float = 10, receive_timeout: float = 60):
+        self.url = url
+        self.boundary = boundary or "SentenceBoundary"
+        self.connect_timeout = connect_timeout
+        self.receive_timeout = receive_timeout
+        self.turns = 0
+        self.last_used = 0.0
+        self._http = None
+        self._ws = None
+
+    @property
+    def closed(self) -> bool:
+        return self._ws is None or self._ws.closed
+
+    async def open(self):
+        self._http = aiohttp.ClientSession(
+            trust_env=True,
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=self.connect_timeout, sock_read=self.receive_timeout),
+        )
+        headers = DRM.headers_with_muid(WSS_HEADERS) if hasattr(DRM, "headers_with_muid") else dict(WSS_HEADERS)
+        try:
+            for attempt in range(2):
+                url = (f"{self.url}&ConnectionId={uuid.uuid4().hex}"
+                       f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}")
+                try:
+                    self._ws = await self._http.ws_connect(
+                        url, compress=15, headers=headers,
+                        ssl=_SSL_CTX if url.startswith("wss:") else None,
+                    )
+                    break
+                except aiohttp.ClientResponseError as e:
+                    # 403 means the token was built from a skewed clock; edge-tts corrects it.
+                    if e.status != 403 or attempt:
+                        raise
+                    DRM.handle_client_response_error(e)
+            word = "true" if self.boundary == "WordBoundary" else "false"
+            sentence = "false" if self.boundary == "WordBoundary" else "true"
+            await self._ws.send_str(
+                f"X-Timestamp:{_timestamp()}\r\n"
+                "Content-Type:application/json; charset=utf-8\r\n"
+                "Path:speech.config\r\n\r\n"
+                '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+                f'"sentenceBoundaryEnabled":"{sentence}","wordBoundaryEnabled":"{word}"'
+                '},"outputFormat":"audio-24khz-48kbitrate-mono-mp3"}}}}\r\n'
+            )
+        except BaseException:
+            await self.close()
+            raise
+        self.last_used = time.monotonic()
+        return self
+
+    async def close(self):
+        ws, self._ws = self._ws, None
+        http, self._http = self._http, None
+        if ws is not None:
+            try:
+                await ws.close()
+            except Exception:
+                pass
+        if http is not None:
+            await http.close()
+
+    async def check(self) -> bool:
+        """True if the idle connection still answers. A close frame the service
+        sent while idle only shows up once the connection is read."""
+        if self.closed:
+            return False
+        try:
+            await self._ws.ping()
+            await self._ws.receive(timeout=0.05)
+        except asyncio.TimeoutError:
+            return True
+        except Exception:
+            return False
+        # Nothing is expected on an idle connection, so anything that arrived
+        # (usually a close) retires it.
+        return False
+
+    async def request(self, text: str, voice: str, rate: str, pitch: str):
+        """Synthesize ``text``, yielding ``audio`` and boundary events until the last turn ends."""
+        compensation = 0
+        audio_bytes = 0
+        for part in split_text_by_byte_length(escape(remove_incompatible_characters(text)), MAX_TEXT_BYTES):
+            request_id = uuid.uuid4().hex
+            ssml = (
+                "<speak version='1.0' xmlns='http://www.w3.org/2001/10/synthesis' xml:lang='en-US'>"
+                f"<voice name='{voice}'><prosody pitch='{pitch}' rate='{rate}' volume='+0%'>"
+                f"{part.decode('utf-8')}</prosody></voice></speak>"
+            )
+            await self._ws.send_str(
+                f"X-RequestId:{request_id}\r\nContent-Type:application/ssml+xml\r\n"
+                f"X-Timestamp:{_timestamp()}Z\r\nPath:ssml\r\n\r\n{ssml}"
+            )
+            async for event in self._turn(request_id.encode(), compensation):
+                if event["type"] == "audio":
+                    audio_bytes += len(event["data"])
+                yield event
+            compensation = audio_bytes * 8 * _TICKS_PER_SECOND // _BITRATE
+        self.turns += 1
+        self.last_used = time.monotonic()
+        if not audio_bytes:
+            raise SessionError("No audio was received")
+
+    async def _turn(self, request_id: bytes, compensation: int):
+        while True:
+            msg = await self._ws.receive()
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                data = msg.data.encode("utf-8")
+                headers, body = _split_message(data, data.find(b"\r\n\r\n"))
+                if headers.get(b"X-RequestId", request_id) != request_id:
+                    continue
+                path = headers.get(b"Path")
+                if path == b"turn.end":
+                    return
+                if path == b"audio.metadata":
+                    for meta in json.loads(body)["Metadata"]:
+                        if meta["Type"] in ("WordBoundary", "SentenceBoundary"):
+                            yield {
+                                "type": meta["Type"],
+                                "offset": meta["Data"]["Offset"] + compensation,
+                                "duration": meta["Data"]["Duration"],
+                                "text": unescape(meta["Data"]["text"]["Text"]),
+                            }
+            elif msg.type == aiohttp.WSMsgType.BINARY:
+                if len(msg.data) < 2:
+                    raise SessionError("Binary message without a header length")
+                headers, body = _split_message(msg.data, int.from_bytes(msg.data[:2], "big"))
+                if headers.get(b"X-RequestId", request_id) != request_id:
+                    continue
+                if headers.get(b"Path") == b"audio" and body:
+                    yield {"type": "audio", "data": body}
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING, aiohttp.WSMsgType.CLOSED):
+                raise SessionError("Connection closed during a turn")
+            elif msg.type == aiohttp.WSMsgType.ERROR:
+                raise SessionError(f"Websocket error: {msg.data}")
+
+
+class SessionPool:
+    def __init__(self, size: int = 2, url: str = None, ping_sec: float = 20.0, idle_sec: float = 300.0,
+                 single_turn_after: int = 3, single_turn_retry_sec: float = 600.0):
+        if not AVAILABLE:
+            raise RuntimeError("the installed edge-tts does not support reusable sessions")
+        self.size = max(1, int(size))
+        self.url = url or WSS_URL
+        self.ping_sec = max(1.0, float(ping_sec))
+        self.idle_sec = max(self.ping_sec, float(idle_sec))
+        self.handshakes = 0
+        self.reused = 0
+        # Set while the service is seen closing connections after a turn; used
+        # sessions are then closed and fresh ones kept ready instead.
+        self.single_turn = False
+        self.single_turn_after = max(1, int(single_turn_after))
+        self.single_turn_retry_sec = max(0.0, float(single_turn_retry_sec))
+        # Reused sessions that failed in a row; a single one is usually an idle timeout.
+        self._reuse_failures = 0
+        self._single_turn_since = 0.0
+        self._idle = {}
+        self._busy = Counter()
+        self._warm = set()
+        self._refills = {}
+        self._maintainer = None
+
+    def _key(self, voice: str, boundary: str = None):
+        return (voice, boundary or "SentenceBoundary")
+
+    async def _open(self, key) -> EdgeSession:
+        self.handshakes += 1
+        return await EdgeSession(self.url, key[1]).open()
+
+    async def _refill(self, key):
+        idle = self._idle.setdefault(key, deque())
+        # Sessions in use count towards the pool unless they can't be reused.
+        missing = self.size - len(idle) - (0 if self.single_turn else self._busy[key])
+        if missing <= 0:
+            return
+        for result in await asyncio.gather(*(self._open(key) for _ in range(missing)), return_exceptions=True):
+            if isinstance(result, EdgeSession):
+                idle.append(result)
+            elif isinstance(result, Exception):
+                logging.debug(f"Could not open Edge TTS session for {key[0]}: {result}")
+
+    def _schedule_refill(self, key):
+        if key in self._warm and key not in self._refills:
+            task = self._refills[key] = asyncio.ensure_future(self._refill(key))
+            task.add_done_callback(lambda _t: self._refills.pop(key, None))
+
+    def _start_maintainer(self):
+        if self._maintainer is None:
+            self._maintainer = asyncio.ensure_future(self._maintain())
+
+    async def prewarm(self, voices, boundaries=(None,)):
+        keys = {self._key(v, b) for v in voices if v for b in boundaries}
+        self._warm |= keys
+        self._start_maintainer()
+        started = time.monotonic()
+        await asyncio.gather(*(self._refill(key) for key in keys))
+        opened = sum(len(self._idle.get(key, ())) for key in keys)
+        logging.info(f"Opened {opened} Edge TTS sessions for {len(keys)} voice(s) in {time.monotonic() - started:.1f}s")
+
+    async def _maintain(self):
+        while True:
+            await asyncio.sleep(self.ping_sec)
+            now = time.monotonic()
+            for key, idle in list(self._idle.items()):
+                for session in list(idle):
+                    # Skip sessions taken for a request meanwhile or used since the last round.
+                    if session not in idle or now - session.last_used < self.ping_sec:
+                        continue
+                    # Checking reads from the connection, so it is out of the pool meanwhile.
+                    idle.remove(session)
+                    expired = key not in self._warm and now - session.last_used > self.idle_sec
+                    if not expired and await session.check() and len(idle) + self._busy[key] < self.size:
+                        idle.append(session)
+                    else:
+                        await session.close()
+                self._schedule_refill(key)
+
+    async def _acquire(self, key, fresh: bool = False):
+        self._start_maintainer()
+        self._busy[key] += 1
+        idle = self._idle.get(key)
+        while idle:
+            session = idle.popleft()
+            if not session.closed and not (fresh and session.turns):
+                self.reused += 1
+                return session, True
+            await session.close()
+        try:
+            return await self._open(key), False
+        except BaseException:
+            self._busy[key] -= 1
+            raise
+
+    def _release(self, key, session: EdgeSession, healthy: bool):
+        self._busy[key] -= 1
+        idle = self._idle.setdefault(key, deque())
+        if healthy and not self.single_turn and not session.closed and len(idle) + self._busy[key] < self.size:
+            idle.append(session)
+        else:
+            asyncio.ensure_future(session.close())
+        self._schedule_refill(key)
+
+    def _reuse_failed(self):
+        self._reuse_failures += 1
+        if self._reuse_failures >= self.single_turn_after and not self.single_turn:
+            self.single_turn = True
+            self._single_turn_since = time.monotonic()
+            logging.warning(
+                f"Edge TTS closed {self._reuse_failures} reused connections in a row, "
+                f"keeping fresh ones ready instead for {self.single_turn_retry_sec:.0f}s"
+            )
+
+    def _reuse_worked(self):
+        self._reuse_failures = 0
+
+    async def stream(self, text: str, voice: str, rate: str, pitch: str, boundary: str = None):
+        key = self._key(voice, boundary)
+        if self.single_turn and time.monotonic() - self._single_turn_since >= self.single_turn_retry_sec:
+            self.single_turn = False
+            self._reuse_failures = 0
+            logging.info("Trying to reuse Edge TTS connections again")
+        for attempt in range(2):
+            session, reused = await self._acquire(key, fresh=attempt > 0)
+            used_before = session.turns
+            started = False
+            healthy = False
+            try:
+                async for event in session.request(text, voice, rate, pitch):
+                    started = True
+                    yield event
+                healthy = True
+                if used_before:
+                    self._reuse_worked()
+                return
+            except (SessionError, aiohttp.ClientError, ConnectionError, asyncio.TimeoutError) as e:
+                # A reused connection may have been closed by the service; that
+                # is only worth one more try if nothing was passed on yet.
+                if started or not reused or attempt:
+                    raise
+                if used_before:
+                    self._reuse_failed()
+                logging.debug(f"Edge TTS session failed before any audio ({e}), retrying on a fresh one")
+            finally:
+                self._release(key, session, healthy)
+
+    async def close(self):
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            self._maintainer = None
+        self._warm.clear()
+        for task in list(self._refills.values()):
+            task.cancel()
+        for idle in self._idle.values():
+            while idle:
+                await idle.popleft().close()
@@ -0,0 +1,124 @@
+"""IRCv3 line parser for Twitch chat.
+
+Only the tags the bot actually reads are decoded; everything else in the tag
+section is skipped without building a dict. Tag values are unescaped per the
+IRCv3 message-tags spec (``\\:`` ``\\s`` ``\\\\`` ``\\r`` ``\\n``).
+"""
+
+# Tag name -> IrcMessage attribute. Tags not listed here are ignored.
+TAG_FIELDS = {
+    "display-name": "display_name",
+    "emotes": "emotes",
+    "badges": "badges",
+    "bits": "bits",
+}
+
+_ESCAPES = {":": ";", "s": " ", "\\": "\\", "r": "\r", "n": "\n"}
+
+
+def unescape_tag_value(value: str) -> str:
+    if "\\" not in value:
+        return value
+    out = []
+    i = 0
+    n = len(value)
+    while i < n:
+        ch = value[i]
+        if ch == "\\":
+            i += 1
+            if i < n:
+                nxt = value[i]
+                out.append(_ESCAPES.get(nxt, nxt))
+        else:
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+class IrcMessage:
+    __slots__ = ("command", "nick", "params", "text", "display_name", "emotes", "badges", "bits", "sent_ts")
+
+    def __init__(self, command, nick, params, text):
+        self.command = command
+        self.nick = nick
+        self.params = params
+        self.text = text
+        self.display_name = ""
+        self.emotes = ""
+        self.badges = ""
+        self.bits = ""
+        # Only filled in when parsing with needles that include tmi-sent-ts.
+        self.sent_ts = ""
+
+    @property
+    def channel(self) -> str:
+        if self.params and self.params[0].startswith("#"):
+            return self.params[0][1:]
+        return ""
+
+    def __repr__(self):
+        return (
+            f"IrcMessage(command={self.command!r}, nick={self.nick!r}, "
+            f"params={self.params!r}, text={self.text!r})"
+        )
+
+
+def tag_needles(tag_fields: dict):
+    return tuple((f";{name}=", len(name) + 2, field) for name, field in tag_fields.items())
+
+
+# Needles are searched directly in ";" + the tag section, so cost scales with
+# the number of wanted tags rather than with every tag Twitch sends.
+_TAG_NEEDLES = tag_needles(TAG_FIELDS)
+
+
+def parse_line(line: str, needles=_TAG_NEEDLES):
+    """Parse one IRC line into an ``IrcMessage``, or return None if it is malformed.
+
+    ``needles`` comes from ``tag_needles()`` when tags other than ``TAG_FIELDS`` are wanted.
+    """
+    pos = 0
+    tags_part = None
+    if line.startswith("@"):
+        sp = line.find(" ")
+        if sp < 0:
+            return None
+        tags_part = line[1:sp]
+        pos = sp + 1
+        if line.startswith(" ", pos):
+            pos = len(line) - len(line[pos:].lstrip(" "))
+
+    nick = ""
+    if line.startswith(":", pos):
+        sp = line.find(" ", pos)
+        if sp < 0:
+            return None
+        prefix = line[pos + 1:sp]
+        bang = prefix.find("!")
+        nick = prefix[:bang] if bang >= 0 else prefix
+        pos = sp + 1
+
+    text = None
+    trail = line.find(" :", pos)
+    if trail >= 0:
+        text = line[trail + 2:]
+        head = line[pos:trail]
+    else:
+        head = line[pos:]
+    parts = head.split()
+    if not parts:
+        return None
+    command = parts[0].upper()
+
+    msg = IrcMessage(command, nick, tuple(parts[1:]), text)
+    if tags_part:
+        tags_part = ";" + tags_part
+        for needle, skip, field in needles:
+            start = tags_part.find(needle)
+            if start < 0:
+                continue
+            start += skip
+            end = tags_part.find(";", start)
+            value = tags_part[start:end] if end >= 0 else tags_part[start:]
+            setattr(msg, field, unescape_tag_value(value) if "\\" in value else value)
+    return msg
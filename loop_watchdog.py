@@ -0,0 +1,169 @@
+"""Event-loop stall detection and on-demand stack sampling.
+
+``LoopWatchdog`` runs a heartbeat task that wakes every ``interval`` seconds
+and a monitor thread that watches it. Once the heartbeat is ``threshold``
+seconds overdue, the thread captures the event-loop thread's stack while the
+blocking call is still on it and logs it, once per stall. When the loop
+catches up, the heartbeat logs how long the stall lasted.
+
+``StackSampler`` samples a thread's stack from another thread and counts
+stacks in folded format: one ``outer;...;inner count`` line per distinct
+stack, which flame graph tools read directly. ``install_profile_signal``
+starts a sampling run whenever the process receives SIGUSR1, or SIGBREAK
+(Ctrl+Break) on Windows.
+"""
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+STACK_LIMIT = 25
+_ASYNCIO_EVENTS = os.path.join("asyncio", "events.py")
+
+
+def format_thread_stack(thread_id: int, limit: int = STACK_LIMIT) -> str:
+    frame = sys._current_frames().get(thread_id)
+    if frame is None:
+        return "  (thread not running)\n"
+    stack = traceback.extract_stack(frame)
+    # Frames above the callback the loop is running belong to asyncio itself.
+    for i in range(len(stack) - 1, -1, -1):
+        if stack[i].filename.endswith(_ASYNCIO_EVENTS):
+            stack = stack[i + 1:]
+            break
+    return "".join(traceback.format_list(stack[-limit:]))
+
+
+class LoopWatchdog:
+    def __init__(self, threshold_sec: float = 0.25, interval_sec: float = 0.05, on_lag=None):
+        self.threshold = max(0.01, float(threshold_sec))
+        self.interval = max(0.005, min(float(interval_sec), self.threshold / 2))
+        # Called on the loop with every measured lag in seconds.
+        self.on_lag = on_lag
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._beat = None
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self):
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._beat - self.interval)
+            self.max_lag = max(self.max_lag, lag)
+            if self.on_lag is not None:
+                self.on_lag(lag)
+            if lag >= self.threshold:
+                self.stalls += 1
+                logging.warning(f"Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def _monitor(self):
+        reported = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue >= self.threshold and beat != reported:
+                reported = beat
+                logging.warning(
+                    f"Event loop blocked for over {overdue * 1000:.0f} ms, currently in:\n"
+                    f"{format_thread_stack(self._loop_thread)}"
+                )
+
+
+def _fold(frame) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval_sec: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = max(0.001, float(interval_sec))
+
+    def run(self, seconds: float) -> Counter:
+        """Sample for ``seconds`` in the calling thread and return folded stack counts."""
+        counts = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                counts[_fold(frame)] += 1
+            del frame
+            time.sleep(self.interval)
+        return counts
+
+
+def write_folded(counts: Counter, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in counts.most_common():
+            f.write(f"{stack} {n}\n")
+
+
+def top_functions(counts: Counter, n: int = 10) -> list:
+    """``[(function, share of samples), ...]`` for the innermost frames seen most often."""
+    total = sum(counts.values())
+    leaves = Counter()
+    for stack, count in counts.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return [(name, count / total) for name, count in leaves.most_common(n)] if total else []
+
+
+def install_profile_signal(seconds: float = 10.0, directory: str = ".", thread_id: int = None):
+    """Sample ``thread_id`` (default: the calling thread) for ``seconds`` whenever the
+    profile signal arrives. Returns the signal name, or None if the platform has none."""
+    signum = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+    if signum is None:
+        return None
+    thread_id = thread_id or threading.get_ident()
+    busy = threading.Lock()
+
+    def profile():
+        if not busy.acquire(blocking=False):
+            logging.info("Profile already running, ignoring signal")
+            return
+        try:
+            logging.info(f"Sampling the event loop for {seconds:.0f}s...")
+            counts = StackSampler(thread_id).run(seconds)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, time.strftime("tts_profile_%Y%m%d_%H%M%S.txt"))
+            write_folded(counts, path)
+            top = ", ".join(f"{name} {share:.0%}" for name, share in top_functions(counts, 5))
+            logging.info(f"Wrote {sum(counts.values())} stack samples to {path} (top: {top})")
+        except Exception as e:
+            logging.error(f"Profile failed: {e}")
+        finally:
+            busy.release()
+
+    # The handler itself only starts the sampling thread.
+    signal.signal(signum, lambda *_: threading.Thread(target=profile, name="loop-profiler", daemon=True).start())
+    return signal.Signals(signum).name
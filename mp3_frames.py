@@ -0,0 +1,170 @@
+"""Minimal MPEG audio frame helpers used to splice Edge-TTS clips in memory.
+
+Edge-TTS returns headerless MPEG-2 Layer III frames, so clips produced with
+the same output format can be joined by concatenating their frames once any
+ID3 tags are stripped. No decoding happens here.
+"""
+
+_BITRATES_KBPS = {
+    (3, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (3, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (3, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    3: (44100, 48000, 32000),
+    2: (22050, 24000, 16000),
+    0: (11025, 12000, 8000),
+}
+
+
+def parse_header(data, pos=0):
+    """Return ``(frame_length, samples, sample_rate)`` for the frame at ``pos``, or None."""
+    if pos + 4 > len(data):
+        return None
+    b0, b1, b2 = data[pos], data[pos + 1], data[pos + 2]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_idx = b2 >> 4
+    sr_idx = (b2 >> 2) & 0x03
+    if version == 1 or layer == 0 or bitrate_idx in (0, 15) or sr_idx == 3:
+        return None
+    padding = (b2 >> 1) & 0x01
+    table_version = 3 if version == 3 else 2
+    bitrate = _BITRATES_KBPS[(table_version, layer)][bitrate_idx] * 1000
+    sample_rate = _SAMPLE_RATES[version][sr_idx]
+    if layer == 3:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 1 and version != 3:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def strip_tags(data: bytes) -> bytes:
+    """Drop a leading ID3v2 tag and a trailing ID3v1 tag, if present."""
+    start = 0
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+        start = 10 + size + (10 if data[5] & 0x10 else 0)
+    end = len(data)
+    if end - start >= 128 and data[end - 128:end - 125] == b"TAG":
+        end -= 128
+    return data[start:end] if start or end != len(data) else data
+
+
+def iter_frames(data: bytes):
+    """Yield ``(offset, length, samples, sample_rate)`` for each complete frame, skipping junk."""
+    pos = 0
+    n = len(data)
+    while pos + 4 <= n:
+        header = parse_header(data, pos)
+        if header is None:
+            nxt = data.find(b"\xff", pos + 1)
+            if nxt < 0:
+                return
+            pos = nxt
+            continue
+        length, samples, sample_rate = header
+        if pos + length > n:
+            return
+        yield pos, length, samples, sample_rate
+        pos += length
+
+
+def duration(data: bytes) -> float:
+    """Playback length of ``data`` in seconds, computed from its frame headers."""
+    total = 0.0
+    for _, _, samples, sample_rate in iter_frames(data):
+        total += samples / sample_rate
+    return total
+
+
+def silent_frame(like: bytes):
+    """One frame of silence in the format of the first frame of ``like``, or None if it has none.
+
+    Zeroed side information decodes as silence and takes nothing from the bit
+    reservoir, so the frame can go anywhere in a stream of the same format.
+    """
+    for offset, _, _, _ in iter_frames(like):
+        header = bytearray(like[offset:offset + 4])
+        header[1] |= 0x01  # no CRC
+        header[2] &= 0xFD  # no padding
+        return bytes(header) + bytes(parse_header(header)[0] - 4)
+    return None
+
+
+def splice(clips) -> bytes:
+    """Join MP3 clips into one gapless frame stream."""
+    return b"".join(strip_tags(c) for c in clips if c)
+
+
+class FrameClock:
+    """Accumulates playback time for an MP3 stream delivered in arbitrary chunks."""
+
+    def __init__(self):
+        self._tail = b""
+        self.seconds = 0.0
+
+    def feed(self, data: bytes) -> float:
+        buf = self._tail + data if self._tail else data
+        consumed = 0
+        added = 0.0
+        for offset, length, samples, sample_rate in iter_frames(buf):
+            added += samples / sample_rate
+            consumed = offset + length
+        # Keep a partial trailing frame for the next chunk; junk is bounded.
+        self._tail = bytes(buf[consumed:][-4096:])
+        self.seconds += added
+        return added
+
+
+def main_data_begin(data, pos=0):
+    """Bit reservoir back pointer of the Layer III frame at ``pos``, or None for other layers.
+
+    A frame with 0 takes none of its data from earlier frames, so a stream can
+    start there and still decode.
+    """
+    if pos + 4 > len(data):
+        return None
+    b1 = data[pos + 1]
+    if (b1 >> 1) & 0x03 != 1:
+        return None
+    side = pos + 4 + (0 if b1 & 0x01 else 2)
+    if side + 2 > len(data):
+        return None
+    if (b1 >> 3) & 0x03 == 3:
+        return (data[side] << 1) | (data[side + 1] >> 7)
+    return data[side]
+
+
+def split_at(data: bytes, cut_times, windows=None):
+    """Split a frame stream near ``cut_times`` (seconds, ascending) into ``len(cut_times) + 1`` pieces.
+
+    Each piece starts at a frame that takes nothing from the bit reservoir, so
+    it decodes on its own. The cut goes at the nearest such frame that starts
+    inside the matching ``(earliest, latest)`` window, or anywhere after the
+    previous cut without windows. Returns None if a cut has no such frame.
+    """
+    data = strip_tags(data)
+    starts = []
+    elapsed = 0.0
+    for offset, length, samples, sample_rate in iter_frames(data):
+        if not main_data_begin(data, offset):
+            starts.append((elapsed, offset))
+        elapsed += samples / sample_rate
+    pieces = []
+    start = 0
+    for i, cut in enumerate(cut_times):
+        earliest, latest = windows[i] if windows is not None else (float("-inf"), float("inf"))
+        candidates = [(abs(t - cut), offset) for t, offset in starts if offset > start and earliest <= t <= latest]
+        if not candidates:
+            return None
+        offset = min(candidates)[1]
+        pieces.append(data[start:offset])
+        start = offset
+    pieces.append(data[start:])
+    return pieces
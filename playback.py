@@ -0,0 +1,643 @@
+"""Long-lived audio output for TTS clips.
+
+A ``PlaybackEngine`` owns one ``AudioSink`` for the lifetime of the bot and
+writes clips into it back to back. Clip lengths are taken from the MP3 frame
+headers, so the engine knows when each clip will finish without asking the
+output process, and the next clip is queued shortly before the current one
+ends to keep bursts gapless.
+
+Several sinks can be fed at once through a ``FanOutSink``. Sinks that take
+MP3 get the frames as they are; sinks that take PCM (the speaker, WAV and
+Opus recordings, a local PCM stream) share one ffmpeg decode per clip.
+"""
+import asyncio
+import logging
+import os
+import stat
+import struct
+import sys
+
+import mp3_frames
+
+# Decoded audio: 16-bit mono at the rate every engine produces (see tts_engines.encode_mp3).
+PCM_RATE = 24000
+PCM_CHANNELS = 1
+PCM_WIDTH = 2
+PCM_BYTES_PER_SEC = PCM_RATE * PCM_CHANNELS * PCM_WIDTH
+_WAV_HEADER_SIZE = 44
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def wav_header(data_bytes: int) -> bytes:
+    """Header of a PCM WAV file holding ``data_bytes`` of audio (0xFFFFFFFF for an open-ended stream)."""
+    riff = 0xFFFFFFFF if data_bytes >= 0xFFFFFFFF - 36 else data_bytes + 36
+    return (b"RIFF" + struct.pack("<I", riff) + b"WAVEfmt "
+            + struct.pack("<IHHIIHH", 16, 1, PCM_CHANNELS, PCM_RATE, PCM_BYTES_PER_SEC,
+                          PCM_CHANNELS * PCM_WIDTH, PCM_WIDTH * 8)
+            + b"data" + struct.pack("<I", min(data_bytes, 0xFFFFFFFF)))
+
+
+def _no_window() -> dict:
+    if sys.platform.startswith("win"):
+        import subprocess
+        return {"creationflags": getattr(subprocess, "CREATE_NO_WINDOW", 0)}
+    return {}
+
+
+def _decoder_args(executable: str) -> list:
+    return [executable, "-hide_banner", "-loglevel", "error", "-f", "mp3", "-i", "pipe:0",
+            "-f", "s16le", "-ar", str(PCM_RATE), "-ac", str(PCM_CHANNELS), "pipe:1"]
+
+
+async def decode_mp3(data: bytes, executable: str = "ffmpeg") -> bytes:
+    """Decode a whole MP3 clip to PCM_RATE mono 16-bit samples."""
+    process = await asyncio.create_subprocess_exec(
+        *_decoder_args(executable),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        **_no_window(),
+    )
+    pcm, _ = await process.communicate(data)
+    if process.returncode:
+        raise RuntimeError(f"ffmpeg could not decode the clip (exit code {process.returncode})")
+    return pcm
+
+
+class AudioSink:
+    """Destination for the audio stream. Subclasses override ``write``."""
+
+    name = "sink"
+    # "mp3" sinks get the MP3 frames, "pcm" sinks get decoded PCM_RATE audio.
+    input_format = "mp3"
+    # Process name to exclude from ducking, if the sink plays through one.
+    process_name = None
+
+    async def start(self):
+        pass
+
+    async def write(self, data: bytes):
+        raise NotImplementedError
+
+    async def end_clip(self):
+        """Called after the last ``write`` of each clip."""
+
+    async def close(self):
+        pass
+
+
+class NullSink(AudioSink):
+    """Discards audio; used for headless runs and benchmarks."""
+
+    name = "null"
+
+    def __init__(self):
+        self.bytes_written = 0
+
+    async def write(self, data: bytes):
+        self.bytes_written += len(data)
+
+
+class FileSink(AudioSink):
+    """Appends every clip to a single MP3 file."""
+
+    name = "file"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def _open(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        return open(self.path, "ab")
+
+    def _write(self, data: bytes):
+        self._file.write(data)
+        self._file.flush()
+
+    async def start(self):
+        if self._file is None:
+            self._file = await asyncio.get_running_loop().run_in_executor(None, self._open)
+
+    async def write(self, data: bytes):
+        if self._file is None:
+            await self.start()
+        # Writes are awaited one at a time, so they land in order.
+        await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+
+    async def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class FFplaySink(AudioSink):
+    """One persistent ffplay process reading an MP3 stream from its stdin."""
+
+    name = "ffplay"
+
+    def __init__(self, volume: int = 100, executable: str = "ffplay", pcm: bool = False):
+        self.volume = min(100, max(0, int(volume)))
+        self.executable = executable
+        self.input_format = "pcm" if pcm else "mp3"
+        self.process_name = "ffplay.exe" if sys.platform.startswith("win") else "ffplay"
+        self._process = None
+
+    async def start(self):
+        if self._process is not None and self._process.returncode is None:
+            return
+        if self.input_format == "pcm":
+            # Raw PCM options differ between ffmpeg versions (-channels was
+            # replaced by -ch_layout in 5.1); a WAV header works with all of them.
+            source = ["-f", "wav"]
+        else:
+            source = ["-f", "mp3"]
+        self._process = await asyncio.create_subprocess_exec(
+            self.executable, "-nodisp", "-loglevel", "quiet",
+            "-volume", str(self.volume),
+            "-fflags", "nobuffer", *source, "-i", "pipe:0",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        if self.input_format == "pcm":
+            self._process.stdin.write(wav_header(0xFFFFFFFF))
+        logging.debug(f"Started persistent ffplay (pid {self._process.pid})")
+
+    async def write(self, data: bytes):
+        for attempt in range(2):
+            await self.start()
+            try:
+                self._process.stdin.write(data)
+                await self._process.stdin.drain()
+                return
+            except (BrokenPipeError, ConnectionResetError) as e:
+                logging.warning(f"ffplay output went away ({e}), restarting it")
+                self._process = None
+        raise RuntimeError("ffplay output could not be restarted")
+
+    async def close(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except Exception:
+            pass
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            pass
+        try:
+            await asyncio.wait_for(process.wait(), timeout=2)
+        except asyncio.TimeoutError:
+            process.kill()
+
+
+class WavSink(AudioSink):
+    """Appends decoded audio to a WAV file, continuing one left by an earlier run.
+
+    The header is rewritten after every write, so the file stays playable if
+    the bot stops without closing it.
+    """
+
+    name = "wav"
+    input_format = "pcm"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._data_bytes = 0
+
+    def _open(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        f = open(self.path, "r+b" if os.path.exists(self.path) else "w+b")
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            f.seek(0)
+            header = f.read(_WAV_HEADER_SIZE)
+            if header[:4] != b"RIFF" or header[8:36] != wav_header(0)[8:36] or header[36:40] != b"data":
+                f.close()
+                raise ValueError(f"{self.path} is not a {PCM_RATE} Hz mono 16-bit WAV file written by this bot")
+            self._data_bytes = size - _WAV_HEADER_SIZE
+        else:
+            f.write(wav_header(0))
+        return f
+
+    def _write(self, data: bytes):
+        f = self._file
+        f.seek(0, os.SEEK_END)
+        f.write(data)
+        self._data_bytes += len(data)
+        header = wav_header(self._data_bytes)
+        f.seek(4)
+        f.write(header[4:8])
+        f.seek(40)
+        f.write(header[40:44])
+        f.flush()
+
+    async def start(self):
+        if self._file is None:
+            self._file = await asyncio.get_running_loop().run_in_executor(None, self._open)
+
+    async def write(self, data: bytes):
+        if self._file is None:
+            await self.start()
+        await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+
+    async def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class OpusSink(AudioSink):
+    """Encodes decoded audio to Opus with ffmpeg and appends it to an Ogg file.
+
+    Each run adds a new Ogg stream to the end of the file; players read such
+    a chained file as one recording.
+    """
+
+    name = "opus"
+    input_format = "pcm"
+
+    def __init__(self, path: str, bitrate: str = "32k", executable: str = "ffmpeg"):
+        self.path = path
+        self.bitrate = bitrate
+        self.executable = executable
+        self._file = None
+        self._process = None
+
+    def _open(self):
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        return open(self.path, "ab")
+
+    async def start(self):
+        if self._process is not None:
+            return
+        if self._file is None:
+            self._file = await asyncio.get_running_loop().run_in_executor(None, self._open)
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                self.executable, "-hide_banner", "-loglevel", "error",
+                "-f", "s16le", "-ar", str(PCM_RATE), "-ac", str(PCM_CHANNELS), "-i", "pipe:0",
+                "-c:a", "libopus", "-b:a", self.bitrate, "-f", "ogg", "pipe:1",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=self._file,
+                stderr=asyncio.subprocess.DEVNULL,
+                **_no_window(),
+            )
+        except Exception:
+            self._file.close()
+            self._file = None
+            raise
+
+    async def write(self, data: bytes):
+        await self.start()
+        self._process.stdin.write(data)
+        await self._process.stdin.drain()
+
+    async def close(self):
+        process, self._process = self._process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+                await asyncio.wait_for(process.wait(), timeout=5)
+            except (asyncio.TimeoutError, OSError):
+                process.kill()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PcmStreamSink(AudioSink):
+    """Serves decoded audio to local readers (OBS, ffmpeg, ...) over TCP or a Unix socket.
+
+    Every reader gets a WAV header and then the audio as it plays. Gaps
+    between clips are filled with silence, so readers see one continuous
+    real-time stream. Readers that fall too far behind are disconnected.
+    """
+
+    name = "stream"
+    input_format = "pcm"
+    # Silence is sent this often between clips.
+    PACE_SEC = 0.02
+    # Audio a reader may leave unread before it is dropped.
+    MAX_BACKLOG_BYTES = 5 * PCM_BYTES_PER_SEC
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, path: str = None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self._server = None
+        self._clients = set()
+        self._pacer = None
+        self._started_at = None
+        self._sent = 0
+
+    @property
+    def address(self) -> str:
+        return f"unix:{self.path}" if self.path else f"tcp://{self.host}:{self.port}"
+
+    def _remove_socket(self):
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.unlink(self.path)
+
+    async def start(self):
+        if self._server is not None:
+            return
+        if self.path:
+            # A socket left behind by an earlier run.
+            await asyncio.get_running_loop().run_in_executor(None, self._remove_socket)
+            self._server = await asyncio.start_unix_server(self._serve, self.path)
+        else:
+            self._server = await asyncio.start_server(self._serve, self.host, self.port)
+            self.port = self._server.sockets[0].getsockname()[1]
+        self._pacer = asyncio.ensure_future(self._pace())
+        logging.info(f"Streaming TTS audio as WAV at {self.address}")
+
+    async def _serve(self, reader, writer):
+        writer.write(wav_header(0xFFFFFFFF))
+        self._clients.add(writer)
+        logging.info(f"TTS stream reader connected ({len(self._clients)} connected)")
+        try:
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, OSError):
+            pass
+        except asyncio.CancelledError:
+            # Shutting down; a cancelled handler would be logged as an error.
+            pass
+        finally:
+            self._drop(writer)
+
+    def _drop(self, writer):
+        if writer in self._clients:
+            self._clients.discard(writer)
+            writer.close()
+            logging.info(f"TTS stream reader disconnected ({len(self._clients)} connected)")
+
+    def _send(self, data: bytes):
+        for writer in list(self._clients):
+            if writer.is_closing() or writer.transport.get_write_buffer_size() > self.MAX_BACKLOG_BYTES:
+                self._drop(writer)
+                continue
+            writer.write(data)
+        self._sent += len(data)
+
+    def _catch_up(self):
+        now = asyncio.get_running_loop().time()
+        if self._started_at is None:
+            self._started_at = now
+        due = int((now - self._started_at) * PCM_BYTES_PER_SEC) & ~(PCM_WIDTH * PCM_CHANNELS - 1)
+        behind = due - self._sent
+        if behind <= 0:
+            return
+        if not self._clients or behind > PCM_BYTES_PER_SEC:
+            # Nobody to send to, or the loop stalled: skip ahead instead of bursting silence.
+            self._sent = due
+            return
+        self._send(bytes(behind))
+
+    async def _pace(self):
+        while True:
+            await asyncio.sleep(self.PACE_SEC)
+            self._catch_up()
+
+    async def write(self, data: bytes):
+        if self._server is None:
+            await self.start()
+        self._catch_up()
+        self._send(data)
+
+    async def close(self):
+        if self._pacer is not None:
+            self._pacer.cancel()
+            self._pacer = None
+        for writer in list(self._clients):
+            self._drop(writer)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if self.path:
+                await asyncio.get_running_loop().run_in_executor(None, self._remove_socket)
+
+
+class FanOutSink(AudioSink):
+    """Feeds every clip to several sinks.
+
+    MP3 sinks get the frames unchanged. For PCM sinks each clip is decoded
+    once by its own ffmpeg process, so the clip's last samples come out as
+    soon as it ends. One long-lived decoder would hold the end of every clip
+    back until the next clip (or padding silence) pushed it out. The price is
+    one process start per clip, paid while the previous clip is still
+    playing because the next decoder is started ahead of time; the ffplay
+    player itself stays one persistent process.
+    A sink that fails is logged and left out from then on.
+    """
+
+    name = "fanout"
+
+    def __init__(self, sinks: list, ffmpeg: str = "ffmpeg"):
+        self.sinks = list(sinks)
+        self.ffmpeg = ffmpeg
+        # Ducking follows the speaker; recordings and streams don't need it.
+        self.process_name = next((s.process_name for s in self.sinks if s.process_name), None)
+        self._decoder = None
+        self._spare = None
+        self._forwarding = None
+
+    def _sinks(self, input_format: str) -> list:
+        return [s for s in self.sinks if s.input_format == input_format]
+
+    def _fail(self, sink: AudioSink, e: Exception):
+        if sink in self.sinks:
+            self.sinks.remove(sink)
+            logging.error(f"TTS output '{sink.name}' failed and was disabled: {e}")
+
+    async def start(self):
+        for sink in list(self.sinks):
+            try:
+                await sink.start()
+            except Exception as e:
+                self._fail(sink, e)
+        if self._sinks("pcm") and self._spare is None:
+            self._spare = asyncio.ensure_future(self._spawn_decoder())
+
+    async def _spawn_decoder(self):
+        return await asyncio.create_subprocess_exec(
+            *_decoder_args(self.ffmpeg),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            **_no_window(),
+        )
+
+    async def _write_each(self, sinks: list, data: bytes):
+        for sink in sinks:
+            try:
+                await sink.write(data)
+            except Exception as e:
+                self._fail(sink, e)
+
+    async def _forward(self, decoder, previous):
+        # Clips are forwarded in the order they were written.
+        if previous is not None:
+            await asyncio.wait([previous])
+        while True:
+            chunk = await decoder.stdout.read(16384)
+            if not chunk:
+                break
+            await self._write_each(self._sinks("pcm"), chunk)
+        await decoder.wait()
+
+    async def write(self, data: bytes):
+        await self._write_each(self._sinks("mp3"), data)
+        if not self._sinks("pcm"):
+            return
+        if self._decoder is None:
+            spare, self._spare = self._spare, None
+            try:
+                self._decoder = await (spare or self._spawn_decoder())
+            except Exception as e:
+                for sink in self._sinks("pcm"):
+                    self._fail(sink, e)
+                return
+            self._spare = asyncio.ensure_future(self._spawn_decoder())
+            self._forwarding = asyncio.ensure_future(self._forward(self._decoder, self._forwarding))
+        try:
+            self._decoder.stdin.write(data)
+            await self._decoder.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError) as e:
+            logging.warning(f"Audio decoder went away mid-clip: {e}")
+            self._decoder = None
+
+    async def end_clip(self):
+        decoder, self._decoder = self._decoder, None
+        if decoder is not None:
+            try:
+                decoder.stdin.close()
+            except Exception:
+                pass
+
+    async def close(self):
+        await self.end_clip()
+        if self._forwarding is not None:
+            try:
+                await asyncio.wait_for(self._forwarding, timeout=5)
+            except Exception:
+                self._forwarding.cancel()
+        if self._spare is not None:
+            self._spare.cancel()
+            try:
+                spare = await self._spare
+                spare.kill()
+                await spare.wait()
+            except BaseException:
+                pass
+            self._spare = None
+        for sink in self.sinks:
+            try:
+                await sink.close()
+            except Exception as e:
+                logging.debug(f"Closing TTS output '{sink.name}' failed: {e}")
+
+
+def _make_one(spec: str, volume: int, pcm: bool) -> AudioSink:
+    kind, _, arg = spec.partition(":")
+    kind = kind.lower()
+    if kind == "ffplay":
+        return FFplaySink(volume=volume, executable=arg or "ffplay", pcm=pcm)
+    if kind == "null":
+        return NullSink()
+    if kind == "file":
+        return FileSink(arg or "tts_output.mp3")
+    if kind == "wav":
+        return WavSink(arg or "tts_output.wav")
+    if kind == "opus":
+        return OpusSink(arg or "tts_output.opus")
+    if kind == "tcp":
+        host, _, port = arg.rpartition(":")
+        try:
+            return PcmStreamSink(host=host or "127.0.0.1", port=int(port))
+        except ValueError:
+            raise ValueError(f"Playback sink '{spec}' needs a port, e.g. tcp:127.0.0.1:7070") from None
+    if kind == "unix":
+        if not arg or not hasattr(asyncio, "start_unix_server"):
+            raise ValueError(f"Playback sink '{spec}' needs a socket path and a platform with Unix sockets")
+        return PcmStreamSink(path=arg)
+    raise ValueError(f"Unknown playback sink '{spec}'")
+
+
+def make_sink(spec: str, volume: int = 100) -> AudioSink:
+    """Build a sink from a config value: ``ffplay``, ``null``, ``file:<path>``,
+    ``wav:<path>``, ``opus:<path>``, ``tcp:[host:]port`` or ``unix:<path>``, or
+    several of them separated by commas."""
+    specs = [part.strip() for part in (spec or "ffplay").split(",") if part.strip()] or ["ffplay"]
+    if len(specs) == 1 and specs[0].partition(":")[0].lower() in ("ffplay", "null", "file"):
+        return _make_one(specs[0], volume, pcm=False)
+    # With any PCM output the speaker plays the shared decode too.
+    pcm = any(s.partition(":")[0].lower() not in ("ffplay", "null", "file") for s in specs)
+    return FanOutSink([_make_one(s, volume, pcm) for s in specs])
+
+
+class PlaybackEngine:
+    def __init__(self, sink: AudioSink, realtime: bool = True, lead: float = 0.15):
+        self.sink = sink
+        self.realtime = realtime
+        self.lead = max(0.0, lead)
+        self._busy_until = 0.0
+
+    async def start(self):
+        await self.sink.start()
+
+    async def close(self):
+        await self.sink.close()
+
+    def _advance(self, seconds: float):
+        now = asyncio.get_running_loop().time()
+        self._busy_until = max(self._busy_until, now) + seconds
+
+    async def _wait_until(self, deadline: float):
+        if not self.realtime:
+            return
+        delay = deadline - asyncio.get_running_loop().time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def play(self, clip):
+        """Write ``clip`` (bytes, a file path or an async iterable of chunks) and
+        return just before it finishes playing."""
+        clock = mp3_frames.FrameClock()
+        if isinstance(clip, str):
+            clip = await asyncio.get_running_loop().run_in_executor(None, _read_file, clip)
+        try:
+            if isinstance(clip, (bytes, bytearray)):
+                data = mp3_frames.strip_tags(bytes(clip))
+                await self.sink.write(data)
+                self._advance(clock.feed(data))
+            else:
+                async for chunk in clip:
+                    await self.sink.write(chunk)
+                    self._advance(clock.feed(chunk))
+        finally:
+            await self.sink.end_clip()
+        await self._wait_until(self._busy_until - self.lead)
+        return clock.seconds
+
+    def remaining(self) -> float:
+        """Seconds of already written audio that have not been heard yet."""
+        if not self.realtime:
+            return 0.0
+        return max(0.0, self._busy_until - asyncio.get_running_loop().time())
+
+    async def drain(self):
+        """Wait until everything written so far has been heard."""
+        await self._wait_until(self._busy_until)
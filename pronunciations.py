@@ -0,0 +1,139 @@
+"""Pronunciation / replacement dictionary applied to chat text before synthesis.
+
+Entries live in a text file of ``word = replacement`` lines (``#`` starts a
+comment, keys may contain spaces and match case-insensitively as whole words).
+All keys are compiled into one regular expression shaped like a trie, so a
+message is scanned once and the cost per character depends on the length of
+the keys rather than on how many there are. The file is re-read automatically
+when it changes; checking, reading and compiling happen on a background
+thread, and the new pattern replaces the old one in a single assignment.
+"""
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+_END = ""
+
+
+def parse_entries(lines) -> dict:
+    entries = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        key = " ".join(key.split()).lower()
+        if key:
+            entries[key] = value.strip()
+    return entries
+
+
+def _trie_pattern(node: dict) -> str:
+    alternatives = []
+    single_chars = []
+    for ch in sorted(k for k in node if k != _END):
+        sub = _trie_pattern(node[ch])
+        if sub:
+            alternatives.append(re.escape(ch) + sub)
+        else:
+            single_chars.append(re.escape(ch))
+    if single_chars:
+        alternatives.append(single_chars[0] if len(single_chars) == 1 else "[" + "".join(single_chars) + "]")
+    if not alternatives:
+        return ""
+    body = alternatives[0] if len(alternatives) == 1 and _END not in node else "(?:" + "|".join(alternatives) + ")"
+    return body + "?" if _END in node else body
+
+
+def compile_entries(entries: dict):
+    """One compiled pattern matching any key as a whole word, or None if there are no keys."""
+    if not entries:
+        return None
+    trie = {}
+    for key in entries:
+        node = trie
+        for ch in key:
+            node = node.setdefault(ch, {})
+        node[_END] = True
+    return re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)", re.IGNORECASE)
+
+
+class PronunciationDict:
+    def __init__(self, path: str = None, defaults: dict = None, check_interval: float = 2.0):
+        self.path = path
+        self.defaults = {k.lower(): v for k, v in (defaults or {}).items()}
+        self.check_interval = max(0.0, check_interval)
+        # (pattern, entries), swapped as one so apply() never mixes two versions.
+        self._compiled = (None, {})
+        self._mtime = None
+        self._using_defaults = False
+        self._next_check = 0.0
+        self._reloader = None
+        self._reloading = False
+        self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def entries(self) -> dict:
+        return self._compiled[1]
+
+    def _set(self, entries: dict):
+        self._compiled = (compile_entries(entries), entries)
+
+    def load(self) -> bool:
+        """(Re)load the file; falls back to ``defaults`` when it doesn't exist. True if anything changed."""
+        if not self.path or not os.path.exists(self.path):
+            if self._using_defaults:
+                return False
+            self._using_defaults = True
+            self._mtime = None
+            self._set(dict(self.defaults))
+            return True
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            with open(self.path, encoding="utf-8") as f:
+                entries = parse_entries(f)
+        except (OSError, UnicodeDecodeError) as e:
+            logging.warning(f"Could not read pronunciations from {self.path}: {e}")
+            return False
+        try:
+            self._set(entries)
+        except re.error as e:
+            logging.warning(f"Could not compile pronunciations from {self.path}: {e}")
+            return False
+        self._mtime = mtime
+        self._using_defaults = False
+        logging.info(f"Loaded {len(entries)} pronunciation entries from {self.path}")
+        return True
+
+    def _reload(self):
+        try:
+            self.load()
+        except Exception as e:
+            logging.warning(f"Could not reload pronunciations from {self.path}: {e}")
+        finally:
+            self._reloading = False
+
+    def maybe_reload(self):
+        """Start a background check of the file if one is due; returns at once."""
+        now = time.monotonic()
+        if now < self._next_check or self._reloading:
+            return
+        self._next_check = now + self.check_interval
+        self._reloading = True
+        if self._reloader is None:
+            self._reloader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pronunciations")
+        self._reloader.submit(self._reload)
+
+    def apply(self, text: str) -> str:
+        self.maybe_reload()
+        pattern, entries = self._compiled
+        if pattern is None or not text:
+            return text
+        return pattern.sub(lambda m: entries.get(" ".join(m.group(0).split()).lower(), m.group(0)), text)
@@ -0,0 +1,64 @@
+"""Backlog-driven speaking-rate controller.
+
+The controller estimates how many seconds of speech are waiting and raises the
+Edge-TTS ``rate`` in fixed steps while that backlog is above a high-water mark,
+then relaxes back toward the base rate once it falls below a low-water mark.
+Changes are spaced by ``hold_sec`` so the rate doesn't flap on every message.
+"""
+import re
+import time
+
+_RATE_RE = re.compile(r"^\s*([+-]?\d+)\s*%\s*$")
+
+
+def parse_rate_percent(rate: str):
+    """``"+10%"`` -> 10; returns None for anything that isn't a percentage."""
+    m = _RATE_RE.match(rate or "")
+    return int(m.group(1)) if m else None
+
+
+def format_rate(percent: int) -> str:
+    return f"{percent:+d}%"
+
+
+class AdaptiveRate:
+    def __init__(self, base_percent: int = 0, max_percent: int = 50, step_percent: int = 10,
+                 high_water_sec: float = 20.0, low_water_sec: float = 5.0,
+                 chars_per_sec: float = 15.0, hold_sec: float = 3.0):
+        self.base = int(base_percent)
+        # max_percent is how far above the base rate it may go.
+        self.max = self.base + max(0, int(max_percent))
+        self.step = max(1, int(step_percent))
+        self.high_water = float(high_water_sec)
+        self.low_water = min(float(low_water_sec), self.high_water)
+        self.chars_per_sec = max(1.0, float(chars_per_sec))
+        self.hold = max(0.0, float(hold_sec))
+        self.percent = self.base
+        self.backlog_sec = 0.0
+        self._last_change = 0.0
+
+    @property
+    def rate(self) -> str:
+        return format_rate(self.percent)
+
+    def estimate_backlog(self, queued_chars: int, queued_audio_sec: float = 0.0) -> float:
+        """Seconds of speech waiting, with text measured at the base rate."""
+        return queued_chars / self.chars_per_sec + queued_audio_sec
+
+    def update(self, queued_chars: int, queued_audio_sec: float = 0.0, now: float = None) -> str:
+        now = time.monotonic() if now is None else now
+        self.backlog_sec = self.estimate_backlog(queued_chars, queued_audio_sec)
+        if now - self._last_change < self.hold:
+            return self.rate
+        target = self.percent
+        if self.backlog_sec > self.high_water and self.percent < self.max:
+            target = min(self.max, self.percent + self.step)
+        elif self.backlog_sec < self.low_water and self.percent > self.base:
+            # Updates only happen when messages arrive, so after a quiet spell
+            # relax by every step that would have been taken in the meantime.
+            steps = int((now - self._last_change) / self.hold) if self.hold else 1
+            target = max(self.base, self.percent - self.step * max(1, steps))
+        if target != self.percent:
+            self.percent = target
+            self._last_change = now
+        return self.rate
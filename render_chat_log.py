@@ -0,0 +1,255 @@
+"""Render a saved chat log into one TTS audio track that lines up with the VOD.
+
+    python render_chat_log.py chat.log [-o tts_track.mp3] [--channel NAME] [--jobs 16]
+        [--start-ts 1700000000000] [--ffmpeg ffmpeg]
+
+The log holds raw IRC lines as received from Twitch, tags included, and each
+message is placed at its ``tmi-sent-ts``. Messages go through the same
+filters as live chat (emotes, pronunciations, ignore lists, commands,
+duplicates) and the same name cooldown, using the channel's settings from
+config.txt. Duplicates are judged by their sent time, and a message is read
+as "N people said" when copies follow it within DEDUP_WINDOW_SEC.
+
+Up to ``--jobs`` messages are synthesized at once through the same render
+path and audio cache as the live bot, so repeated phrases and names are only
+synthesized once. Each clip is decoded with ffmpeg and mixed in at its
+message's offset from ``--start-ts`` (default: the first message), so clips
+of messages sent close together overlap instead of pushing later ones back
+and every clip stays in sync with the VOD. The mixed audio is encoded by one
+ffmpeg process as it is produced; the output format follows the file
+extension.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+from array import array
+from collections import Counter, deque
+
+import irc_parser
+import mp3_frames
+import playback
+import tts_queue
+import Twitch_TTS as bot
+
+_NEEDLES = irc_parser.tag_needles({**irc_parser.TAG_FIELDS, "tmi-sent-ts": "sent_ts"})
+# Silence is written in blocks of this many bytes.
+_SILENCE_BLOCK = 1 << 16
+
+
+def read_messages(path: str, channel: str = None):
+    """``(channel, [(sent_ms, IrcMessage), ...])`` in sent order. ``channel`` defaults to the first one in the log."""
+    messages = []
+    untimed = 0
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            msg = irc_parser.parse_line(line.rstrip("\r\n"), _NEEDLES)
+            if msg is None or msg.command != "PRIVMSG":
+                continue
+            channel = channel or msg.channel
+            if msg.channel != channel:
+                continue
+            if not msg.sent_ts.isdigit():
+                untimed += 1
+                continue
+            messages.append((int(msg.sent_ts), msg))
+    if untimed:
+        logging.warning(f"Skipped {untimed} messages without tmi-sent-ts")
+    messages.sort(key=lambda m: m[0])
+    return channel, messages
+
+
+def _claim_jobs(pipeline, messages, skipped: Counter) -> list:
+    items = []
+    for sent_ms, msg in messages:
+        text = pipeline.filter_message(msg)
+        if text is None:
+            skipped["filtered"] += 1
+            continue
+        sender = msg.nick or "unknown"
+        item = tts_queue.ChatItem(msg.display_name or sender, text, user=sender, received=sent_ms / 1000.0)
+        if pipeline.dedup is not None:
+            entry, is_new = pipeline.dedup.check(text, item.user, now=item.received)
+            if not is_new:
+                skipped["duplicate"] += 1
+                continue
+            item.repeats = entry
+        items.append(item)
+    # Claimed once every copy has been seen, so "N people said" counts them all.
+    return [bot._claim(pipeline, item, now=item.received) for item in items]
+
+
+def _mix_into(buf: bytearray, pcm: bytes, n: int):
+    mixed = array("h", bytes(buf[:n]))
+    for i, sample in enumerate(array("h", pcm[:n])):
+        total = mixed[i] + sample
+        mixed[i] = 32767 if total > 32767 else -32768 if total < -32768 else total
+    buf[:n] = mixed.tobytes()
+
+
+class _Track:
+    """Mixes clips into one PCM track and hands finished audio to an ffmpeg encoder.
+
+    Clips are added in time order, so audio before the latest clip's start
+    can't change anymore and is written out; only the part later clips may
+    still overlap is kept in memory.
+    """
+
+    def __init__(self, encoder):
+        self._encoder = encoder
+        # Bytes of PCM handed to the encoder, and the audio after them.
+        self.written = 0
+        self._tail = bytearray()
+
+    async def _write(self, data):
+        self._encoder.stdin.write(data)
+        await self._encoder.stdin.drain()
+        self.written += len(data)
+
+    async def add(self, pos: int, pcm: bytes) -> bool:
+        """Mix ``pcm`` in at byte ``pos``. Returns True if it overlaps an earlier clip."""
+        end = self.written + len(self._tail)
+        if pos >= end:
+            await self._write(bytes(self._tail))
+            self._tail = bytearray()
+            gap = pos - end
+            while gap > 0:
+                n = min(gap, _SILENCE_BLOCK)
+                await self._write(bytes(n))
+                gap -= n
+            self._tail = bytearray(pcm)
+            return False
+        done = pos - self.written
+        if done > 0:
+            await self._write(bytes(self._tail[:done]))
+            del self._tail[:done]
+        n = min(len(self._tail), len(pcm))
+        _mix_into(self._tail, pcm, n)
+        self._tail += pcm[n:]
+        return True
+
+    async def finish(self):
+        await self._write(bytes(self._tail))
+        self._tail = bytearray()
+        self._encoder.stdin.close()
+        if await self._encoder.wait():
+            raise RuntimeError(f"ffmpeg exited with code {self._encoder.returncode} while encoding the track")
+
+
+async def _start_encoder(out_path: str, ffmpeg: str):
+    return await asyncio.create_subprocess_exec(
+        ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "s16le", "-ar", str(playback.PCM_RATE), "-ac", str(playback.PCM_CHANNELS), "-i", "pipe:0",
+        "-b:a", "48k", out_path,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.DEVNULL,
+    )
+
+
+async def render(pipeline, messages, out_path: str, jobs: int = 16, start_ms: int = None,
+                 ffmpeg: str = "ffmpeg") -> dict:
+    conf = pipeline.conf
+    skipped = Counter()
+    claimed = _claim_jobs(pipeline, messages, skipped)
+    start = (start_ms if start_ms is not None else messages[0][0]) / 1000.0 if messages else 0.0
+    slots = asyncio.Semaphore(max(1, jobs))
+
+    async def synthesize(job):
+        if job.item.received < start:
+            skipped["before start"] += 1
+            return None
+        async with slots:
+            try:
+                clip = await bot.render_tts_audio(
+                    str(job.item.text), display_name=job.spoken_name, rate=job.rate, conf=conf, runs=job.runs
+                )
+                return await playback.decode_mp3(mp3_frames.strip_tags(clip), ffmpeg)
+            except Exception as e:
+                skipped["failed"] += 1
+                logging.warning(f"Could not synthesize message from {job.item.display_name}: {e}")
+                return None
+
+    # Clips are mixed in order, so only a window of them is in flight at once:
+    # enough to keep every job busy while the oldest one finishes.
+    todo = iter(claimed)
+    pending = deque()
+
+    def fill():
+        for job in itertools.islice(todo, max(1, jobs) * 2 - len(pending)):
+            pending.append((job, asyncio.ensure_future(synthesize(job))))
+
+    spoken = 0
+    overlapping = 0
+    speech = 0.0
+    frame = playback.PCM_WIDTH * playback.PCM_CHANNELS
+    track = _Track(await _start_encoder(out_path, ffmpeg))
+    fill()
+    try:
+        while pending:
+            job, task = pending.popleft()
+            fill()
+            pcm = await task
+            if not pcm:
+                continue
+            pos = int((job.item.received - start) * playback.PCM_RATE) * frame
+            overlapping += await track.add(pos, pcm[:len(pcm) - len(pcm) % frame])
+            spoken += 1
+            speech += len(pcm) / playback.PCM_BYTES_PER_SEC
+    finally:
+        for _job, task in pending:
+            task.cancel()
+        await track.finish()
+    return {"messages": len(messages), "spoken": spoken, "speech_sec": speech,
+            "track_sec": track.written / playback.PCM_BYTES_PER_SEC, "overlapping": overlapping,
+            "skipped": skipped}
+
+
+async def _run(args):
+    channel, messages = read_messages(args.log, args.channel and args.channel.lstrip("#").lower())
+    if not messages:
+        logging.error(f"No chat messages with timestamps found in {args.log}")
+        return
+    conf = bot.load_channel_configs([channel])[0]
+    pipeline = bot.ChannelPipeline(conf)
+    # One warm session per job instead of the live setting.
+    engine = bot.init_tts_engine(args.jobs if bot.EDGE_SESSIONS_PER_VOICE else 0)
+    try:
+        await engine.start()
+        await bot._prewarm_engine([pipeline])
+        logging.info(f"Rendering {len(messages)} messages from #{channel} to {args.output} with {args.jobs} jobs")
+        started = time.monotonic()
+        stats = await render(pipeline, messages, args.output, args.jobs, args.start_ts, args.ffmpeg)
+        elapsed = time.monotonic() - started
+    finally:
+        await engine.close()
+    skipped = ", ".join(f"{n} {reason}" for reason, n in stats["skipped"].most_common())
+    logging.info(
+        f"Rendered {stats['spoken']} of {stats['messages']} messages into a {stats['track_sec']:.0f}s track "
+        f"({stats['speech_sec']:.0f}s of speech) in {elapsed:.1f}s, "
+        f"{stats['track_sec'] / max(elapsed, 1e-6):.0f}x real time"
+        f"{f'; skipped {skipped}' if skipped else ''}"
+    )
+    if stats["overlapping"]:
+        logging.info(f"{stats['overlapping']} clips were mixed over one still playing")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("log", help="chat log of raw IRC lines with tags")
+    parser.add_argument("-o", "--output", default="tts_track.mp3",
+                        help="output audio file, format from its extension (default: tts_track.mp3)")
+    parser.add_argument("--channel", help="channel to render (default: the first one in the log)")
+    parser.add_argument("--jobs", type=int, default=16, help="messages synthesized at once (default: 16)")
+    parser.add_argument("--start-ts", type=int, help="tmi-sent-ts in ms where the track starts (default: first message)")
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg executable used to decode, mix and encode")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_run(args))
+    finally:
+        bot._io_pool.shutdown(wait=True)
+        bot._log_cache_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Split chat text into runs of one writing script and route each run to a voice.
+
+Characters are classified with a sorted table of Unicode ranges (one bisect
+per non-ASCII character; ASCII words never leave C code). A word takes the
+first non-Latin script found in it, otherwise Latin, and words with no letters
+at all (numbers, punctuation, emoji) join the run around them. Han characters
+are read as Japanese when the same message contains kana. Each script maps to
+a voice, with unmapped scripts using the default voice.
+"""
+import bisect
+import re
+
+# (first code point, last code point, script), sorted and non-overlapping.
+SCRIPT_RANGES = (
+    (0x0041, 0x005A, "latin"),
+    (0x0061, 0x007A, "latin"),
+    (0x00C0, 0x024F, "latin"),
+    (0x0370, 0x03FF, "greek"),
+    (0x0400, 0x052F, "cyrillic"),
+    (0x0530, 0x058F, "armenian"),
+    (0x0590, 0x05FF, "hebrew"),
+    (0x0600, 0x06FF, "arabic"),
+    (0x0750, 0x077F, "arabic"),
+    (0x0900, 0x097F, "devanagari"),
+    (0x0980, 0x09FF, "bengali"),
+    (0x0E00, 0x0E7F, "thai"),
+    (0x10A0, 0x10FF, "georgian"),
+    (0x1100, 0x11FF, "hangul"),
+    (0x1E00, 0x1EFF, "latin"),
+    (0x1F00, 0x1FFF, "greek"),
+    (0x3040, 0x309F, "kana"),
+    (0x30A0, 0x30FF, "kana"),
+    (0x3130, 0x318F, "hangul"),
+    (0x31F0, 0x31FF, "kana"),
+    (0x3400, 0x4DBF, "han"),
+    (0x4E00, 0x9FFF, "han"),
+    (0xAC00, 0xD7AF, "hangul"),
+    (0xF900, 0xFAFF, "han"),
+    (0xFF21, 0xFF3A, "latin"),
+    (0xFF41, 0xFF5A, "latin"),
+    (0xFF66, 0xFF9D, "kana"),
+    (0x20000, 0x2FA1F, "han"),
+)
+SCRIPTS = tuple(sorted({script for _, _, script in SCRIPT_RANGES}))
+SCRIPT_ALIASES = {"japanese": "kana", "chinese": "han", "korean": "hangul", "russian": "cyrillic"}
+
+_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+_WORD_RE = re.compile(r"\S+")
+_ASCII_LETTER_RE = re.compile(r"[A-Za-z]")
+
+
+def script_of(ch: str):
+    """Script name of one character, or None for digits, punctuation, symbols and spaces."""
+    cp = ord(ch)
+    i = bisect.bisect_right(_STARTS, cp) - 1
+    if i >= 0 and cp <= SCRIPT_RANGES[i][1]:
+        return SCRIPT_RANGES[i][2]
+    return None
+
+
+def _word_script(word: str):
+    if word.isascii():
+        return "latin" if _ASCII_LETTER_RE.search(word) else None
+    found = None
+    for ch in word:
+        if ch < "\x80":
+            if found is None and ("a" <= ch <= "z" or "A" <= ch <= "Z"):
+                found = "latin"
+            continue
+        script = script_of(ch)
+        if script is not None and script != "latin":
+            return script
+        found = found or script
+    return found
+
+
+def parse_voice_map(value: str) -> dict:
+    """``"korean:ko-KR-SunHiNeural, cyrillic:ru-RU-SvetlanaNeural"`` -> ``{"hangul": ..., "cyrillic": ...}``."""
+    voices = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        script, sep, voice = item.partition(":")
+        script = script.strip().lower()
+        script = SCRIPT_ALIASES.get(script, script)
+        if not sep or not voice.strip() or script not in SCRIPTS:
+            raise ValueError(f"bad voice map entry '{item.strip()}' (scripts: {', '.join(SCRIPTS)})")
+        voices[script] = voice.strip()
+    return voices
+
+
+class VoiceRouter:
+    def __init__(self, default_voice: str, script_voices: dict = None):
+        self.default_voice = default_voice
+        self.voices = dict(script_voices or {})
+        self.signature = (default_voice, tuple(sorted(self.voices.items())))
+
+    def voice_for(self, script: str) -> str:
+        return self.voices.get(script, self.default_voice)
+
+    def segments(self, text: str) -> list:
+        """``[(run text, voice), ...]`` in order, adjacent runs always with different voices."""
+        runs = []
+        lead = None
+        has_kana = False
+        for m in _WORD_RE.finditer(text):
+            script = _word_script(m.group())
+            if script is None:
+                if runs:
+                    runs[-1][2] = m.end()
+                elif lead is None:
+                    lead = m.start()
+                continue
+            has_kana = has_kana or script == "kana"
+            if runs and runs[-1][0] == script:
+                runs[-1][2] = m.end()
+            else:
+                runs.append([script, m.start() if lead is None or runs else lead, m.end()])
+        if not runs:
+            return [(text.strip(), self.default_voice)] if text.strip() else []
+
+        out = []
+        for script, start, end in runs:
+            voice = self.voice_for("kana" if script == "han" and has_kana else script)
+            if out and out[-1][1] == voice:
+                out[-1][2] = end
+            else:
+                out.append([start, voice, end])
+        return [(text[start:end].strip(), voice) for start, voice, end in out]
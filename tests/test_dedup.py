@@ -0,0 +1,19 @@
+import dedup
+
+
+def test_copies_extend_the_window_while_the_message_waits():
+    f = dedup.DuplicateFilter(window_sec=10)
+    entry, is_new = f.check("gg", "a", now=0)
+    assert is_new
+    for t in (8, 16, 24):
+        assert f.check("gg", "b", now=t) == (entry, False)
+
+
+def test_copies_stop_extending_the_window_once_the_message_was_read():
+    f = dedup.DuplicateFilter(window_sec=10)
+    entry, _ = f.check("gg", "a", now=0)
+    entry.claimed = True
+    for t in (4, 8):
+        assert f.check("gg", "b", now=t) == (entry, False)
+    again, is_new = f.check("gg", "c", now=12)
+    assert is_new and again is not entry
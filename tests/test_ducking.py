@@ -0,0 +1,79 @@
+import time
+
+import ducking
+
+OWN_PID = 1
+
+
+def _setup(**volumes):
+    backend = ducking.FakeBackend({"self": (OWN_PID, "python.exe", 1.0)})
+    for i, (key, volume) in enumerate(volumes.items()):
+        backend.add(key, 100 + i, f"{key}.exe", volume)
+    return backend, ducking.Ducker(backend, tick_sec=0.005)
+
+
+def _sets(backend, key):
+    return [(t, volume) for t, k, volume in backend.history if k == key]
+
+
+def test_restore_returns_every_session_to_its_original_volume():
+    backend, ducker = _setup(game=0.8, music=0.4)
+    try:
+        assert ducker.duck(0.5, 0.05, exclude_pids={OWN_PID}).result(timeout=2) is True
+        assert backend.volume("game") == 0.4
+        assert backend.volume("music") == 0.2
+        assert ducker.restore(0.05).result(timeout=2) is True
+        assert backend.volume("game") == 0.8
+        assert backend.volume("music") == 0.4
+        assert backend.volume("self") == 1.0
+        assert not _sets(backend, "self")
+        assert not ducker.ducked
+    finally:
+        ducker.close()
+
+
+def test_duck_during_restore_fades_from_the_current_volume():
+    backend, ducker = _setup(game=0.8)
+    try:
+        ducker.duck(0.5, 0.0, exclude_pids={OWN_PID}).result(timeout=2)
+        restore = ducker.restore(0.4)
+        time.sleep(0.1)
+        interrupted_at = time.monotonic()
+        assert ducker.duck(0.5, 0.2, exclude_pids={OWN_PID}).result(timeout=2) is True
+        assert restore.result(timeout=2) is False
+        before = [v for t, v in _sets(backend, "game") if t < interrupted_at]
+        after = [v for t, v in _sets(backend, "game") if t >= interrupted_at]
+        # Halfway up when the duck came in, and it carried on from there.
+        assert 0.4 < before[-1] < 0.8
+        assert abs(after[0] - before[-1]) < 0.1
+        # Ducked relative to the original volume, not the halfway one.
+        assert backend.volume("game") == 0.4
+        assert ducker.restore(0.0).result(timeout=2) is True
+        assert backend.volume("game") == 0.8
+    finally:
+        ducker.close()
+
+
+def test_session_vanishing_mid_fade_is_dropped():
+    backend, ducker = _setup(game=0.8, music=0.4)
+    try:
+        duck = ducker.duck(0.5, 0.2, exclude_pids={OWN_PID})
+        time.sleep(0.05)
+        backend.remove("music")
+        assert duck.result(timeout=2) is True
+        assert backend.volume("game") == 0.4
+        assert ducker.stats["session_errors"] == 1
+        assert ducker.restore(0.05).result(timeout=2) is True
+        assert backend.volume("game") == 0.8
+    finally:
+        ducker.close()
+
+
+def test_close_puts_ducked_sessions_straight_back():
+    backend, ducker = _setup(game=0.8)
+    duck = ducker.duck(0.5, 0.5, exclude_pids={OWN_PID})
+    time.sleep(0.05)
+    ducker.close()
+    assert duck.result(timeout=2) is False
+    assert backend.volume("game") == 0.8
+    assert ducker.duck(0.5, 0.0).result(timeout=2) is False
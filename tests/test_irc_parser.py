@@ -0,0 +1,61 @@
+import irc_parser
+
+
+def test_tag_values_are_unescaped():
+    assert irc_parser.unescape_tag_value(r"a\sb\:c\\d") == "a b;c\\d"
+    assert irc_parser.unescape_tag_value(r"line\r\nbreak") == "line\r\nbreak"
+    # Unknown escapes keep the character; a trailing backslash is dropped.
+    assert irc_parser.unescape_tag_value(r"\bold") == "bold"
+    assert irc_parser.unescape_tag_value("trailing\\") == "trailing"
+    assert irc_parser.unescape_tag_value("plain") == "plain"
+
+
+def test_privmsg_tags_and_escaped_display_name():
+    line = (r"@badges=moderator/1,subscriber/12;bits=100;display-name=Some\sName\:x;emotes= "
+            ":somename!somename@somename.tmi.twitch.tv PRIVMSG #chan :hello there")
+    msg = irc_parser.parse_line(line)
+    assert msg.command == "PRIVMSG"
+    assert msg.nick == "somename"
+    assert msg.channel == "chan"
+    assert msg.text == "hello there"
+    assert msg.display_name == "Some Name;x"
+    assert msg.badges == "moderator/1,subscriber/12"
+    assert msg.bits == "100"
+    assert msg.emotes == ""
+
+
+def test_ping():
+    msg = irc_parser.parse_line("PING :tmi.twitch.tv")
+    assert msg.command == "PING"
+    assert msg.nick == ""
+    assert msg.text == "tmi.twitch.tv"
+    assert irc_parser.parse_line("PING").command == "PING"
+
+
+def test_trailing_parameter_keeps_its_colons():
+    msg = irc_parser.parse_line(":nick!nick@host PRIVMSG #chan :: hi :) at 10:30 :D")
+    assert msg.params == ("#chan",)
+    assert msg.text == ": hi :) at 10:30 :D"
+
+
+def test_lines_mentioning_privmsg_are_not_privmsgs():
+    notice = irc_parser.parse_line("@msg-id=x :tmi.twitch.tv NOTICE #chan :PRIVMSG #chan :not a chat line")
+    assert notice.command == "NOTICE"
+    assert notice.text == "PRIVMSG #chan :not a chat line"
+    usernotice = irc_parser.parse_line(
+        r"@system-msg=PRIVMSG\sPRIVMSG;display-name=Raider :tmi.twitch.tv USERNOTICE #chan :PRIVMSG"
+    )
+    assert usernotice.command == "USERNOTICE"
+    assert usernotice.display_name == "Raider"
+
+
+def test_wanted_tags_only_match_whole_names():
+    # "user-display-name" must not be read as "display-name".
+    msg = irc_parser.parse_line("@user-display-name=Wrong;display-name=Right :n!n@h PRIVMSG #c :x")
+    assert msg.display_name == "Right"
+
+
+def test_malformed_lines():
+    assert irc_parser.parse_line("") is None
+    assert irc_parser.parse_line("@tags-only") is None
+    assert irc_parser.parse_line(":prefix-only") is None
@@ -0,0 +1,34 @@
+import mp3_frames
+
+# MPEG-2 Layer III, 24 kHz, 48 kbps, no CRC: 144-byte frames of 24 ms.
+FRAME_SEC = 576 / 24000
+
+
+def _frame(main_data_begin: int) -> bytes:
+    return bytes([0xFF, 0xF3, 0x64, 0xC4, main_data_begin]) + bytes(139)
+
+
+def _stream(reservoir: list) -> bytes:
+    return b"".join(_frame(b) for b in reservoir)
+
+
+def test_main_data_begin_reads_the_side_info():
+    data = _stream([0, 7])
+    assert mp3_frames.main_data_begin(data, 0) == 0
+    assert mp3_frames.main_data_begin(data, 144) == 7
+
+
+def test_split_at_only_cuts_before_self_contained_frames():
+    data = _stream([0, 9, 9, 9, 0, 9, 9, 0, 9, 9])
+    # Nearest frame start to 2 frames in is frame 2, but it borrows from frame 1.
+    pieces = mp3_frames.split_at(data, [2 * FRAME_SEC])
+    assert [len(p) // 144 for p in pieces] == [4, 6]
+    for piece in pieces:
+        assert mp3_frames.main_data_begin(piece, 0) == 0
+
+
+def test_split_at_keeps_cuts_inside_their_windows():
+    data = _stream([0, 9, 9, 9, 0, 9, 9, 0, 9, 9])
+    pieces = mp3_frames.split_at(data, [5.5 * FRAME_SEC], [(5 * FRAME_SEC, 8 * FRAME_SEC)])
+    assert [len(p) // 144 for p in pieces] == [7, 3]
+    assert mp3_frames.split_at(data, [2 * FRAME_SEC], [(1 * FRAME_SEC, 3 * FRAME_SEC)]) is None
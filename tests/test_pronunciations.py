@@ -0,0 +1,30 @@
+import os
+import time
+
+import pronunciations
+
+
+def _wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_apply_replaces_whole_words_only():
+    d = pronunciations.PronunciationDict(None, defaults={"gg": "good game", "brb": "be right back"})
+    assert d.apply("GG everyone, brb") == "good game everyone, be right back"
+    assert d.apply("eggs") == "eggs"
+
+
+def test_changed_file_is_reloaded_in_the_background(tmp_path):
+    path = tmp_path / "pronunciations.txt"
+    path.write_text("gg = good game\n", encoding="utf-8")
+    d = pronunciations.PronunciationDict(str(path), check_interval=0)
+    assert d.apply("gg") == "good game"
+    path.write_text("gg = get good\n", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    # apply() only starts the reload; the old pattern is used until it is done.
+    assert _wait_for(lambda: d.apply("gg") == "get good")
+    assert len(d) == 1
@@ -0,0 +1,11 @@
+import rate_control
+
+
+def test_max_is_relative_to_the_base_rate():
+    controller = rate_control.AdaptiveRate(base_percent=20, max_percent=50, step_percent=10, hold_sec=0)
+    for t in range(20):
+        controller.update(queued_chars=10000, now=float(t))
+    assert controller.rate == "+70%"
+    for t in range(20, 40):
+        controller.update(queued_chars=0, now=float(t))
+    assert controller.rate == "+20%"
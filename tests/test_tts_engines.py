@@ -0,0 +1,39 @@
+import asyncio
+
+import edge_sessions
+import tts_engines
+
+
+class _BrokenPool:
+    def __init__(self):
+        self.requests = 0
+
+    async def stream(self, text, voice, rate, pitch, boundary=None):
+        self.requests += 1
+        raise edge_sessions.SessionError("protocol changed")
+        yield  # pragma: no cover
+
+    async def close(self):
+        pass
+
+
+class _Communicate:
+    def __init__(self, text, **kwargs):
+        self.text = text
+
+    async def stream(self):
+        yield {"type": "audio", "data": self.text.encode()}
+
+
+def test_edge_engine_falls_back_to_communicate_when_the_pool_keeps_failing(monkeypatch):
+    monkeypatch.setattr(tts_engines.edge_tts, "Communicate", _Communicate)
+    engine = tts_engines.EdgeEngine(pool_failures=3, pool_retry_sec=600)
+    engine.pool = pool = _BrokenPool()
+
+    async def run():
+        return [await engine.synthesize(f"message {i}", "en-US-AriaNeural", "+0%", "+0Hz") for i in range(5)]
+
+    results = asyncio.run(run())
+    # Every message is still spoken, and the pool is left alone after the third failure.
+    assert [audio for audio, _tag in results] == [f"message {i}".encode() for i in range(5)]
+    assert pool.requests == 3
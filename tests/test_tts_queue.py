@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import tts_queue
+
+
+def _item(name, age=0.0):
+    return tts_queue.ChatItem(name, f"message from {name}", received=time.time() - age)
+
+
+def test_get_waits_when_every_queued_item_has_expired():
+    async def run():
+        queue = tts_queue.BoundedTextQueue(10, max_age=1)
+        for name in ("a", "b", "c"):
+            queue.offer(_item(name, age=5))
+        getter = asyncio.ensure_future(queue.get())
+        await asyncio.sleep(0.05)
+        assert not getter.done()
+        queue.offer(_item("fresh"))
+        item = await asyncio.wait_for(getter, 1)
+        return queue, item
+
+    queue, item = asyncio.run(run())
+    assert item.display_name == "fresh"
+    assert queue.dropped["too old"] == 3
+    assert queue.empty()
+
+
+def test_get_skips_stale_items_and_returns_the_next_fresh_one():
+    async def run():
+        queue = tts_queue.BoundedTextQueue(10, max_age=1)
+        queue.offer(_item("old", age=5))
+        queue.offer(_item("new"))
+        return queue, await asyncio.wait_for(queue.get(), 1)
+
+    queue, item = asyncio.run(run())
+    assert item.display_name == "new"
+    assert queue.dropped["too old"] == 1
+
+
+def test_dropped_items_record_why():
+    queue = tts_queue.BoundedTextQueue(1)
+    first, second = _item("a"), _item("b")
+    queue.offer(first)
+    queue.offer(second)
+    assert first.dropped == "queue full"
+    assert second.dropped is None
+
+
+def test_fair_scheduler_does_not_keep_served_entries():
+    scheduler = tts_queue.FairScheduler(max_wait=60)
+    for i in range(5):
+        scheduler.append(_item(f"waiting{i}"))
+    for i in range(10000):
+        scheduler.append(_item(f"user{i % 7}"))
+        scheduler.popleft()
+    classes = list(scheduler._classes.values())
+    assert len(scheduler) == 5
+    assert sum(len(cls.fifo) for cls in classes) <= 5 * 2 + 16
+    assert sum(len(cls.heap) for cls in classes) <= 5 * 2 + 16
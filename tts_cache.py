@@ -0,0 +1,121 @@
+"""Persistent, size-bounded cache of synthesized audio clips.
+
+Entries are stored as one file per clip, named by the SHA-256 of the
+normalized text and synthesis settings. Recency is tracked in memory and
+mirrored to file mtimes so LRU order survives restarts.
+"""
+import hashlib
+import logging
+import os
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz", engine: str = "") -> str:
+    parts = (normalize_text(text), voice, rate, pitch) + ((engine,) if engine else ())
+    raw = "\x1f".join(parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max(0, int(max_bytes))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._index = OrderedDict()
+        if self.enabled:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".mp3")
+
+    def _load_index(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".tmp"):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            if not entry.name.endswith(".mp3"):
+                continue
+            st = entry.stat()
+            entries.append((st.st_mtime, entry.name[:-4], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+        self._evict()
+        logging.info(f"Audio cache: {len(self._index)} clips, {self.total_bytes / 1e6:.1f} MB in '{self.directory}'")
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+        if key not in self._index:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            self.total_bytes -= self._index.pop(key, 0)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes):
+        if not self.enabled or not data or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.debug(f"Audio cache write failed: {e}")
+            return
+        self.total_bytes -= self._index.pop(key, 0)
+        self._index[key] = len(data)
+        self.total_bytes += len(data)
+        self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and self._index:
+            key, size = self._index.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self._index),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,292 @@
+"""Speech synthesis backends.
+
+Every engine streams Edge-TTS style events: ``{"type": "audio", "data": ...}``
+chunks of MPEG-2 Layer III audio (24 kHz mono, 48 kbps). Some engines also emit
+``{"type": "WordBoundary", ...}``. A ``FailoverEngine`` that hands a request to
+its fallback first emits ``{"type": "engine", "name": ..., "cache_tag": ...}``,
+so callers can tell which engine produced the audio. Consumers skip event types
+they don't know.
+
+Engines:
+  * ``EdgeEngine``: Microsoft Edge online voices through ``edge_tts``. With
+    ``sessions`` > 0 requests go over warm websockets kept open per voice by
+    ``edge_sessions.SessionPool`` instead of a new connection each. When the
+    pool fails ``pool_failures`` requests in a row, ``edge_tts.Communicate``
+    is used instead for ``pool_retry_sec``.
+  * ``PiperEngine``: local Piper voices on the CPU. Models are loaded once per
+    process in a ``ProcessPoolExecutor``, and the WAV output is encoded with
+    ffmpeg to the same MP3 format so clips from both engines splice together.
+  * ``FailoverEngine``: uses a primary engine and switches to a fallback for a
+    while when the primary is slower than a threshold to start answering.
+"""
+import asyncio
+import io
+import logging
+import os
+import subprocess
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor
+
+import edge_sessions
+import rate_control
+
+try:
+    import edge_tts
+except ImportError:
+    edge_tts = None
+
+ENGINES = ("edge", "piper")
+
+
+class TTSEngine:
+    name = "engine"
+    # Mixed into cache keys so clips from different engines never mix.
+    cache_tag = ""
+
+    @property
+    def current_tag(self) -> str:
+        """Tag of the engine the next request is expected to use."""
+        return self.cache_tag
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def prewarm(self, voices, boundaries=(None,)):
+        """Get ready to synthesize ``voices`` before the first request, if the engine can."""
+        pass
+
+    async def stream(self, text: str, voice: str, rate: str, pitch: str, boundary: str = None):
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def synthesize(self, text: str, voice: str, rate: str, pitch: str):
+        """Return ``(audio, cache_tag)`` for the whole utterance."""
+        chunks = []
+        tag = self.cache_tag
+        async for event in self.stream(text, voice, rate, pitch):
+            if event["type"] == "audio":
+                chunks.append(event["data"])
+            elif event["type"] == "engine":
+                tag = event["cache_tag"]
+        return b"".join(chunks), tag
+
+
+class EdgeEngine(TTSEngine):
+    name = "edge"
+
+    def __init__(self, sessions: int = 0, pool_failures: int = 3, pool_retry_sec: float = 600.0):
+        if edge_tts is None:
+            raise RuntimeError("edge-tts is not installed (pip install edge-tts)")
+        self.pool_failures = max(1, int(pool_failures))
+        self.pool_retry_sec = max(0.0, float(pool_retry_sec))
+        self._failures = 0
+        self._pool_off_until = 0.0
+        self.pool = None
+        if sessions > 0:
+            if edge_sessions.AVAILABLE:
+                self.pool = edge_sessions.SessionPool(sessions)
+            else:
+                logging.warning("This edge-tts version does not support reusable sessions, "
+                                "opening a connection per message")
+
+    async def prewarm(self, voices, boundaries=(None,)):
+        if self.pool is not None:
+            await self.pool.prewarm(voices, boundaries)
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+
+    async def stream(self, text, voice, rate, pitch, boundary=None):
+        if self.pool is not None and time.monotonic() >= self._pool_off_until:
+            started = False
+            try:
+                async for event in self.pool.stream(text, voice, rate, pitch, boundary):
+                    started = True
+                    yield event
+                self._failures = 0
+                return
+            except Exception as e:
+                # The pool relies on edge-tts internals; if it keeps failing
+                # where Communicate may not, stop using it for a while.
+                if started:
+                    raise
+                self._failures += 1
+                if self._failures < self.pool_failures:
+                    logging.debug(f"Edge TTS session request failed ({e}), retrying with a new connection")
+                else:
+                    self._failures = 0
+                    self._pool_off_until = time.monotonic() + self.pool_retry_sec
+                    logging.warning(f"Edge TTS sessions failed {self.pool_failures} requests in a row ({e}), "
+                                    f"opening a connection per message for {self.pool_retry_sec:.0f}s")
+        kwargs = {"boundary": boundary} if boundary else {}
+        communicate = edge_tts.Communicate(text, voice=voice, rate=rate, pitch=pitch, **kwargs)
+        async for event in communicate.stream():
+            yield event
+
+
+# --- Piper (runs inside the pool's worker processes) ---
+_piper_voice = None
+
+
+def _piper_init(model_path: str):
+    global _piper_voice
+    from piper import PiperVoice
+    _piper_voice = PiperVoice.load(model_path)
+
+
+def _piper_wav(text: str, length_scale: float) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        if hasattr(_piper_voice, "synthesize_wav"):
+            from piper import SynthesisConfig
+            _piper_voice.synthesize_wav(text, wav, syn_config=SynthesisConfig(length_scale=length_scale))
+        else:
+            _piper_voice.synthesize(text, wav, length_scale=length_scale)
+    return buf.getvalue()
+
+
+def _piper_render(text: str, length_scale: float, ffmpeg: str) -> bytes:
+    return encode_mp3(_piper_wav(text, length_scale), ffmpeg)
+
+
+def _piper_warm() -> int:
+    time.sleep(0.05)
+    return len(_piper_wav("Ready.", 1.0))
+
+
+def encode_mp3(wav: bytes, ffmpeg: str = "ffmpeg") -> bytes:
+    """Encode WAV bytes to headerless MP3 frames in the Edge-TTS output format."""
+    result = subprocess.run(
+        [ffmpeg, "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+         "-ar", "24000", "-ac", "1", "-b:a", "48k", "-f", "mp3",
+         "-id3v2_version", "0", "-write_xing", "0", "pipe:1"],
+        input=wav, capture_output=True, check=True,
+        creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0) if sys.platform.startswith("win") else 0,
+    )
+    return result.stdout
+
+
+class PiperEngine(TTSEngine):
+    name = "piper"
+
+    def __init__(self, model_path: str, workers: int = 2, ffmpeg: str = "ffmpeg"):
+        if not model_path or not os.path.exists(model_path):
+            raise FileNotFoundError(f"Piper model '{model_path}' not found")
+        self.model_path = model_path
+        self.workers = max(1, int(workers))
+        self.ffmpeg = ffmpeg
+        self.cache_tag = f"piper:{os.path.basename(model_path)}"
+        self._pool = None
+
+    async def start(self):
+        if self._pool is not None:
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_piper_init, initargs=(self.model_path,)
+        )
+        # Bring every worker process up and through one synthesis now, so the
+        # first real message doesn't pay for loading the model.
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _piper_warm) for _ in range(self.workers)))
+        logging.info(f"Local Piper voice loaded in {self.workers} process(es) in {time.monotonic() - started:.1f}s")
+
+    async def close(self):
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def stream(self, text, voice, rate, pitch, boundary=None):
+        if self._pool is None:
+            await self.start()
+        percent = rate_control.parse_rate_percent(rate) or 0
+        length_scale = 1.0 / max(0.1, 1.0 + percent / 100.0)
+        loop = asyncio.get_running_loop()
+        audio = await loop.run_in_executor(self._pool, _piper_render, text, length_scale, self.ffmpeg)
+        yield {"type": "audio", "data": audio}
+
+
+class FailoverEngine(TTSEngine):
+    def __init__(self, primary: TTSEngine, fallback: TTSEngine, threshold_sec: float, retry_sec: float = 60.0):
+        self.primary = primary
+        self.fallback = fallback
+        self.threshold = max(0.01, float(threshold_sec))
+        self.retry = max(0.0, float(retry_sec))
+        self.name = f"{primary.name}+{fallback.name}"
+        self.cache_tag = primary.cache_tag
+        self.failovers = 0
+        self._retry_at = 0.0
+
+    @property
+    def degraded(self) -> bool:
+        return time.monotonic() < self._retry_at
+
+    @property
+    def current_tag(self) -> str:
+        return self.fallback.cache_tag if self.degraded else self.primary.cache_tag
+
+    async def start(self):
+        await self.primary.start()
+        await self.fallback.start()
+
+    async def close(self):
+        await self.primary.close()
+        await self.fallback.close()
+
+    async def prewarm(self, voices, boundaries=(None,)):
+        await self.primary.prewarm(voices, boundaries)
+
+    def _fail(self, reason: str):
+        self.failovers += 1
+        if not self.degraded:
+            logging.warning(
+                f"{self.primary.name} TTS {reason}, using {self.fallback.name} for the next {self.retry:.0f}s"
+            )
+        self._retry_at = time.monotonic() + self.retry
+
+    async def stream(self, text, voice, rate, pitch, boundary=None):
+        if not self.degraded:
+            events = self.primary.stream(text, voice, rate, pitch, boundary).__aiter__()
+            try:
+                # Only the wait for the first event is bounded: once audio has
+                # started flowing the request can't switch engines any more.
+                first = await asyncio.wait_for(events.__anext__(), timeout=self.threshold)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                self._fail(f"took over {self.threshold:.1f}s to respond")
+                await events.aclose()
+            except Exception as e:
+                self._fail(f"failed ({e})")
+                await events.aclose()
+            else:
+                yield first
+                async for event in events:
+                    yield event
+                return
+        yield {"type": "engine", "name": self.fallback.name, "cache_tag": self.fallback.cache_tag}
+        async for event in self.fallback.stream(text, voice, rate, pitch, boundary):
+            yield event
+
+
+def make_engine(spec: str = "edge", local_model: str = "", local_workers: int = 2,
+                failover_sec: float = 0.0, retry_sec: float = 60.0, sessions_per_voice: int = 0) -> TTSEngine:
+    """Build the engine named by ``TTS_ENGINE``, wrapped for failover to Piper when configured."""
+    spec = (spec or "edge").strip().lower()
+    if spec not in ENGINES:
+        raise ValueError(f"Unknown TTS engine '{spec}', expected one of {', '.join(ENGINES)}")
+    if spec == "piper":
+        return PiperEngine(local_model, local_workers)
+    engine = EdgeEngine(sessions_per_voice)
+    if failover_sec and failover_sec > 0:
+        try:
+            return FailoverEngine(engine, PiperEngine(local_model, local_workers), failover_sec, retry_sec)
+        except FileNotFoundError as e:
+            logging.error(f"TTS failover disabled: {e}")
+    return engine
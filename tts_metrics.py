@@ -0,0 +1,227 @@
+"""Per-stage latency histograms, queue gauges and their export formats.
+
+Every chat message carries a dict of monotonic timestamps (``marks``) that is
+filled in as it moves through the pipeline. ``Metrics.observe_message`` turns
+those into per-stage latencies. The results can be scraped in Prometheus text
+format from a small built-in HTTP server, or appended to a JSON-lines file at a
+fixed interval.
+"""
+import asyncio
+import bisect
+import json
+import logging
+import time
+from collections import Counter, deque
+
+STAGES = ("received", "enqueued", "synth_start", "synth_end", "concat", "play_start", "play_end")
+
+# (interval, from mark, to mark)
+INTERVALS = (
+    ("queue_wait", "enqueued", "synth_start"),
+    ("synthesis", "synth_start", "synth_end"),
+    ("concat", "synth_end", "concat"),
+    ("playback_wait", "concat", "play_start"),
+    ("playback", "play_start", "play_end"),
+    ("first_audio", "received", "play_start"),
+    ("end_to_end", "received", "play_end"),
+)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.9, 0.99)
+PREFIX = "twitch_tts_"
+
+
+def mark(marks, stage: str, when: float = None):
+    if marks is not None:
+        marks[stage] = time.monotonic() if when is None else when
+
+
+class LatencyHistogram:
+    """Cumulative Prometheus-style buckets plus a window of recent samples for quantiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1000):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=max(1, window))
+
+    def observe(self, seconds: float):
+        seconds = max(0.0, seconds)
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def quantile(self, q: float):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _label_str(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    def __init__(self, buckets=DEFAULT_BUCKETS, window: int = 1000):
+        self.buckets = buckets
+        self.window = window
+        self.histograms = {}
+        self.counters = Counter()
+        self._gauges = {}
+
+    def observe(self, interval: str, seconds: float, channel: str = ""):
+        key = (interval, channel)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram(self.buckets, self.window)
+        hist.observe(seconds)
+
+    def observe_message(self, marks: dict, channel: str = ""):
+        for interval, start, end in INTERVALS:
+            if start in marks and end in marks:
+                self.observe(interval, marks[end] - marks[start], channel)
+        self.count("messages_spoken", channel)
+
+    def count(self, name: str, channel: str = "", n: int = 1):
+        self.counters[(name, channel)] += n
+
+    def gauge(self, name: str, fn, help: str = ""):
+        """Register ``fn() -> iterable of (labels dict, value)``, evaluated on every export."""
+        self._gauges[name] = (fn, help)
+
+    def _gauge_values(self):
+        for name, (fn, help) in self._gauges.items():
+            try:
+                values = list(fn())
+            except Exception as e:
+                logging.debug(f"Metrics gauge {name} failed: {e}")
+                continue
+            yield name, help, values
+
+    def snapshot(self) -> dict:
+        stages = {}
+        for (interval, channel), hist in self.histograms.items():
+            entry = {"count": hist.count, "sum": round(hist.sum, 6)}
+            for q in QUANTILES:
+                value = hist.quantile(q)
+                if value is not None:
+                    entry[f"p{int(q * 100)}"] = round(value, 6)
+            stages.setdefault(channel, {})[interval] = entry
+        counters = {}
+        for (name, channel), n in self.counters.items():
+            counters.setdefault(channel, {})[name] = n
+        gauges = {}
+        for name, _help, values in self._gauge_values():
+            gauges[name] = [dict(labels, value=value) for labels, value in values]
+        return {"time": time.time(), "latency": stages, "counters": counters, "gauges": gauges}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        name = PREFIX + "stage_seconds"
+        lines.append(f"# HELP {name} Time spent between pipeline stages per message.")
+        lines.append(f"# TYPE {name} histogram")
+        for (interval, channel), hist in sorted(self.histograms.items()):
+            labels = {"stage": interval, "channel": channel}
+            running = 0
+            for bound, n in zip(hist.buckets, hist.counts):
+                running += n
+                lines.append(f"{name}_bucket{_label_str(dict(labels, le=_fmt(bound)))} {running}")
+            lines.append(f"{name}_bucket{_label_str(dict(labels, le='+Inf'))} {hist.count}")
+            lines.append(f"{name}_sum{_label_str(labels)} {_fmt(hist.sum)}")
+            lines.append(f"{name}_count{_label_str(labels)} {hist.count}")
+
+        name = PREFIX + "stage_recent_seconds"
+        lines.append(f"# HELP {name} Stage latency quantiles over the most recent messages.")
+        lines.append(f"# TYPE {name} gauge")
+        for (interval, channel), hist in sorted(self.histograms.items()):
+            for q in QUANTILES:
+                value = hist.quantile(q)
+                if value is not None:
+                    labels = {"stage": interval, "channel": channel, "quantile": q}
+                    lines.append(f"{name}{_label_str(labels)} {_fmt(value)}")
+
+        for counter in sorted({n for n, _ in self.counters}):
+            name = f"{PREFIX}{counter}_total"
+            lines.append(f"# TYPE {name} counter")
+            for (n, channel), value in sorted(self.counters.items()):
+                if n == counter:
+                    lines.append(f"{name}{_label_str({'channel': channel})} {value}")
+
+        for gauge, help, values in self._gauge_values():
+            name = PREFIX + gauge
+            if help:
+                lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in values:
+                lines.append(f"{name}{_label_str(labels)} {_fmt(value)}")
+        return "\n".join(lines) + "\n"
+
+
+async def serve(metrics: Metrics, host: str = "127.0.0.1", port: int = 9464):
+    """Serve ``/metrics`` (Prometheus text) and ``/metrics.json`` until the server is closed."""
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), timeout=5)
+                if header in (b"\r\n", b"\n", b""):
+                    break
+            parts = request.decode(errors="ignore").split()
+            path = parts[1].split("?")[0] if len(parts) > 1 else "/"
+            if path in ("/", "/metrics"):
+                status, ctype, body = "200 OK", "text/plain; version=0.0.4", metrics.render_prometheus()
+            elif path == "/metrics.json":
+                status, ctype, body = "200 OK", "application/json", json.dumps(metrics.snapshot())
+            else:
+                status, ctype, body = "404 Not Found", "text/plain", "not found\n"
+            data = body.encode()
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: {ctype}\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+            )
+            await writer.drain()
+        except Exception as e:
+            logging.debug(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+def _append_line(path: str, line: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+async def dump_jsonl(metrics: Metrics, path: str, interval: float = 60.0, executor=None):
+    """Append a snapshot to ``path`` every ``interval`` seconds, with spoken messages per second.
+
+    The file is written on ``executor`` (the default one if None), off the event loop.
+    """
+    last = Counter()
+    last_time = time.monotonic()
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        snap = metrics.snapshot()
+        spoken = Counter({ch: n for (name, ch), n in metrics.counters.items() if name == "messages_spoken"})
+        elapsed = max(1e-9, now - last_time)
+        snap["messages_per_sec"] = {ch: round((n - last[ch]) / elapsed, 3) for ch, n in spoken.items()}
+        last, last_time = spoken, now
+        try:
+            await asyncio.get_running_loop().run_in_executor(executor, _append_line, path, json.dumps(snap))
+        except Exception as e:
+            logging.warning(f"Could not write metrics to {path}: {e}")
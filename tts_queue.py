@@ -0,0 +1,302 @@
+"""Chat message records and the bounded, load-shedding TTS text queue."""
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import Counter, deque
+
+
+class ChatItem:
+    __slots__ = ("display_name", "text", "user", "received", "marks", "repeats", "priority", "dropped")
+
+    def __init__(self, display_name, text, user=None, received=None, priority=0):
+        self.display_name = display_name
+        self.text = text
+        self.user = (user or display_name or "").lower()
+        self.received = time.time() if received is None else received
+        # Rank of the sender's priority class, 0 is served first.
+        self.priority = priority
+        # Monotonic per-stage timestamps, see tts_metrics.STAGES.
+        self.marks = {}
+        # dedup.DuplicateEntry collecting later copies of this message, if any.
+        self.repeats = None
+        # Why the text queue dropped this message, once it has.
+        self.dropped = None
+
+    def __repr__(self):
+        return f"ChatItem({self.display_name!r}, {self.text!r})"
+
+
+OVERFLOW_POLICIES = ("drop-oldest", "drop-newest", "keep-latest-per-user")
+
+PRIORITY_CLASSES = ("bits", "mod", "vip", "sub")
+_BADGE_CLASSES = {"moderator": "mod", "vip": "vip", "subscriber": "sub", "founder": "sub"}
+
+
+def parse_priority_classes(value: str) -> tuple:
+    """``"bits, mod, sub"`` -> ``("bits", "mod", "sub")``, highest priority first."""
+    classes = []
+    for name in (value or "").split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name not in PRIORITY_CLASSES:
+            raise ValueError(f"unknown priority class '{name}' (expected {', '.join(PRIORITY_CLASSES)})")
+        if name not in classes:
+            classes.append(name)
+    return tuple(classes)
+
+
+def priority_rank(classes: tuple, badges: str = "", bits: str = "") -> int:
+    """Index of the first of ``classes`` a message belongs to, ``len(classes)`` for everyone else."""
+    found = set()
+    if bits and bits.isdigit() and int(bits) > 0:
+        found.add("bits")
+    for badge in (badges or "").split(","):
+        name = _BADGE_CLASSES.get(badge.partition("/")[0])
+        if name:
+            found.add(name)
+    for rank, name in enumerate(classes):
+        if name in found:
+            return rank
+    return len(classes)
+
+
+class BoundedTextQueue(asyncio.Queue):
+    """An ``asyncio.Queue`` of ``ChatItem`` that sheds load instead of growing.
+
+    ``offer()`` never blocks: when the queue is full the overflow policy picks a
+    message to drop. ``get()`` silently skips messages older than ``max_age``
+    seconds. Every dropped or skipped message is counted in ``dropped`` by
+    reason and logged.
+    """
+
+    def __init__(self, maxsize: int = 0, policy: str = "drop-oldest", max_age: float = 0.0, name: str = "text"):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy '{policy}', expected one of {', '.join(OVERFLOW_POLICIES)}")
+        super().__init__(maxsize)
+        self.policy = policy
+        self.max_age = max(0.0, float(max_age or 0.0))
+        self.name = name
+        self.dropped = Counter()
+
+    def _init(self, maxsize):
+        self._queue = deque()
+
+    def _drop(self, item, reason: str):
+        self.dropped[reason] += 1
+        if isinstance(item, ChatItem):
+            item.dropped = reason
+        who = getattr(item, "display_name", None) or "?"
+        text = getattr(item, "text", item)
+        logging.info(f"Skipped TTS ({reason}, {self.name} queue): {who}: {str(text)[:60]}")
+
+    def reject(self, item, reason: str):
+        """Count and log a message that was turned away before reaching the queue."""
+        self._drop(item, reason)
+
+    def _overflow_victim(self, item):
+        if self.policy == "drop-newest":
+            return None
+        if self.policy == "keep-latest-per-user":
+            user = getattr(item, "user", None)
+            for queued in self._queue:
+                if getattr(queued, "user", None) == user:
+                    return queued
+        return self._fallback_victim(item)
+
+    def _fallback_victim(self, item):
+        return self._queue[0]
+
+    def offer(self, item) -> bool:
+        """Enqueue without waiting. Returns False if ``item`` itself was dropped."""
+        if self.full():
+            victim = self._overflow_victim(item)
+            if victim is None:
+                self._drop(item, "queue full")
+                return False
+            self._queue.remove(victim)
+            self._drop(victim, "replaced by newer" if self.policy == "keep-latest-per-user" and
+                       getattr(victim, "user", None) == getattr(item, "user", None) else "queue full")
+            self.task_done()
+        self.put_nowait(item)
+        return True
+
+    def pending_chars(self) -> int:
+        return sum(len(getattr(item, "text", "") or "") for item in self._queue)
+
+    def _is_stale(self, item) -> bool:
+        if not self.max_age:
+            return False
+        received = getattr(item, "received", None)
+        return received is not None and (time.time() - received) > self.max_age
+
+    async def get(self):
+        while True:
+            try:
+                # Queue.get() ends in get_nowait(), which skips stale items
+                # and finds nothing if every queued item was stale.
+                return await super().get()
+            except asyncio.QueueEmpty:
+                continue
+
+    def get_nowait(self):
+        while True:
+            item = super().get_nowait()
+            if not self._is_stale(item):
+                return item
+            self._drop(item, "too old")
+            self.task_done()
+
+
+class _Class:
+    __slots__ = ("heap", "fifo", "clock", "user_tags", "pending", "size")
+
+    def __init__(self):
+        self.heap = []
+        self.fifo = deque()
+        self.clock = 0
+        self.user_tags = {}
+        self.pending = Counter()
+        self.size = 0
+
+    def compact(self):
+        # Removed entries leave the fifo from its head; the ones stuck behind
+        # a long-waiting message are swept out once they outnumber live ones.
+        fifo = self.fifo
+        while fifo and not fifo[0][4]:
+            fifo.popleft()
+        if len(fifo) > 2 * self.size + 16:
+            self.fifo = deque(entry for entry in fifo if entry[4])
+        if len(self.heap) > 2 * self.size + 16:
+            self.heap = [entry for entry in self.heap if entry[4]]
+            heapq.heapify(self.heap)
+
+
+class FairScheduler:
+    """Pending messages ordered by priority class, then round-robin across users.
+
+    Within a class each message gets a virtual finish tag one past the later of
+    the class clock and its sender's previous tag, and a heap serves the
+    lowest tag. A user with ten queued messages therefore takes turns with
+    everyone else instead of going ten times in a row. Classes are served
+    highest first, except that once the oldest message of a lower class has
+    waited ``max_wait`` seconds that class is served next. Enqueue and dequeue
+    are O(log n); removed entries are dropped lazily from the heaps.
+    """
+
+    def __init__(self, max_wait: float = 0.0):
+        self.max_wait = max(0.0, float(max_wait or 0.0))
+        self._classes = {}
+        self._entries = {}
+        self._seq = itertools.count()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    def append(self, item):
+        rank = getattr(item, "priority", 0)
+        user = getattr(item, "user", None)
+        cls = self._classes.get(rank)
+        if cls is None:
+            cls = self._classes[rank] = _Class()
+        tag = max(cls.clock, cls.user_tags.get(user, 0)) + 1
+        cls.user_tags[user] = tag
+        cls.pending[user] += 1
+        cls.size += 1
+        # [tag, seq, item, rank, alive]; seq is unique so items are never compared.
+        entry = [tag, next(self._seq), item, rank, True]
+        heapq.heappush(cls.heap, entry)
+        cls.fifo.append(entry)
+        self._entries[item] = entry
+
+    def _discard(self, entry):
+        entry[4] = False
+        item, rank = entry[2], entry[3]
+        del self._entries[item]
+        cls = self._classes[rank]
+        user = getattr(item, "user", None)
+        cls.pending[user] -= 1
+        cls.size -= 1
+        if cls.pending[user] <= 0:
+            del cls.pending[user]
+            cls.user_tags.pop(user, None)
+        if not cls.pending:
+            del self._classes[rank]
+        else:
+            cls.compact()
+
+    @staticmethod
+    def _oldest(cls: _Class):
+        while not cls.fifo[0][4]:
+            cls.fifo.popleft()
+        return cls.fifo[0]
+
+    def _next_rank(self) -> int:
+        ranks = sorted(self._classes)
+        if self.max_wait and len(ranks) > 1:
+            cutoff = time.time() - self.max_wait
+            starved = None
+            for rank in ranks[1:]:
+                received = getattr(self._oldest(self._classes[rank])[2], "received", None)
+                if received is not None and received <= cutoff and (starved is None or received < starved[0]):
+                    starved = (received, rank)
+            if starved is not None:
+                return starved[1]
+        return ranks[0]
+
+    def popleft(self):
+        if not self._entries:
+            raise IndexError("pop from an empty FairScheduler")
+        cls = self._classes[self._next_rank()]
+        while True:
+            entry = heapq.heappop(cls.heap)
+            if entry[4]:
+                break
+        cls.clock = entry[0]
+        self._discard(entry)
+        return entry[2]
+
+    def remove(self, item):
+        entry = self._entries.get(item)
+        if entry is None:
+            raise ValueError("item not queued")
+        self._discard(entry)
+
+    def lowest_oldest(self):
+        """Oldest message of the lowest priority class queued."""
+        return self._oldest(self._classes[max(self._classes)])[2]
+
+
+class FairTextQueue(BoundedTextQueue):
+    """``BoundedTextQueue`` served by a ``FairScheduler`` instead of in arrival order.
+
+    When full, ``drop-oldest`` (and ``keep-latest-per-user`` for users with
+    nothing queued) evicts the oldest message of the lowest priority class,
+    or turns the new message away if its class is lower than all of them.
+    """
+
+    def __init__(self, maxsize: int = 0, policy: str = "drop-oldest", max_age: float = 0.0,
+                 name: str = "text", max_wait: float = 0.0):
+        # asyncio.Queue.__init__ calls _init(), which needs this.
+        self._max_wait = max_wait
+        super().__init__(maxsize, policy, max_age, name)
+
+    def _init(self, maxsize):
+        self._queue = FairScheduler(self._max_wait)
+
+    def _put(self, item):
+        self._queue.append(item)
+
+    def _get(self):
+        return self._queue.popleft()
+
+    def _fallback_victim(self, item):
+        victim = self._queue.lowest_oldest()
+        if getattr(item, "priority", 0) > getattr(victim, "priority", 0):
+            return None
+        return victim